@@ -8,9 +8,9 @@ from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from dotenv import load_dotenv
-import sqlite3
 import json
 import random
+import hashlib
 from datetime import datetime, timedelta
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
@@ -23,6 +23,11 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import logging
+from db_pool import ConnectionPool
+from question_bank import load_question_bank, DEFAULT_TAG_WEIGHT
+from question_pool import create_question_generator
+import session_traits
+import question_history
 
 # Load environment variables
 load_dotenv()
@@ -74,6 +79,10 @@ if not EMAIL_ADDRESS and os.environ.get('FLASK_ENV') == 'production':
 
 # Database configuration - SQLite (no installation needed!)
 DB_FILE = os.environ.get('DATABASE_URL', 'career_guidance.db')
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+
+# One bounded pool per worker process (WAL mode, tuned pragmas, busy timeout)
+db_pool = ConnectionPool(DB_FILE, max_connections=DB_POOL_SIZE)
 
 # Note: Emotion detection now runs client-side using TensorFlow.js (face-api.js)
 # Server-side emotion model loading removed to reduce memory usage and startup time
@@ -98,18 +107,16 @@ def get_rag_system():
     return rag_system
 
 def get_db_connection():
-    """Thread-safe database connection"""
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow a pooled connection; use as `with get_db_connection() as conn:`"""
+    return db_pool.connection()
 
 def init_database():
     """Initialize SQLite database with schema"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    # Create tables
-    cur.executescript('''
+    with get_db_connection() as conn:
+        # Create tables
+        conn.executescript('''
+        DROP TABLE IF EXISTS session_served_questions;
+        DROP TABLE IF EXISTS session_trait_totals;
         DROP TABLE IF EXISTS career_recommendations;
         DROP TABLE IF EXISTS game_answers;
         DROP TABLE IF EXISTS user_sessions;
@@ -170,28 +177,67 @@ def init_database():
         CREATE INDEX IF NOT EXISTS idx_game_answers_session ON game_answers(session_id);
         CREATE INDEX IF NOT EXISTS idx_game_answers_game_type ON game_answers(game_type);
         CREATE INDEX IF NOT EXISTS idx_sessions_created ON user_sessions(created_at);
-    ''')
-    
-    conn.commit()
-    conn.close()
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_game_answers_unique
+            ON game_answers(session_id, game_type, question_id);
+        ''')
+        conn.execute(session_traits.CREATE_TABLE_SQL)
+        conn.execute(question_history.CREATE_TABLE_SQL)
+        conn.commit()
     logger.info("Database initialized successfully!")
 
+def migrate_database():
+    """Bring an existing database up to the current schema (safe to re-run)"""
+    with get_db_connection() as conn:
+        has_unique = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_game_answers_unique'"
+        ).fetchone()
+        if not has_unique:
+            # Older databases may hold double-submitted answers; keep the first one
+            removed = conn.execute("""
+                DELETE FROM game_answers WHERE answer_id NOT IN (
+                    SELECT MIN(answer_id) FROM game_answers
+                    GROUP BY session_id, game_type, question_id
+                )
+            """).rowcount
+            if removed:
+                logger.warning(f"Removed {removed} duplicate game answers")
+            conn.execute("""
+                CREATE UNIQUE INDEX idx_game_answers_unique
+                ON game_answers(session_id, game_type, question_id)
+            """)
+            conn.commit()
+
+        has_totals = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'session_trait_totals'"
+        ).fetchone()
+        if not has_totals:
+            # First start with running totals: backfill them from existing answers
+            conn.execute(session_traits.CREATE_TABLE_SQL)
+            count = session_traits.rebuild_totals(conn)
+            conn.commit()
+            logger.info(f"Backfilled trait totals for {count} sessions")
+
+        conn.execute(question_history.CREATE_TABLE_SQL)
+        conn.commit()
+
 # Initialize database on startup
 if not os.path.exists(DB_FILE):
     logger.info("Creating new database...")
     init_database()
 else:
     logger.info(f"Using existing database: {DB_FILE}")
+    migrate_database()
 
-# Load datasets
-with open('tiny_transformer_lm/tiny_transformer_lm/data/generated/emotional_dataset.json', 'r') as f:
-    emotional_questions = json.load(f)
+GAME_TYPES = tuple(session_traits.TRAIT_KEYS)
+MAX_BATCH_ANSWERS = 200
 
-with open('tiny_transformer_lm/tiny_transformer_lm/data/generated/reasoning_dataset.json', 'r') as f:
-    reasoning_questions = json.load(f)
+# Question bank: memory-mapped compiled file (python question_bank.py build), else the JSON datasets
+question_bank = load_question_bank()
 
-with open('tiny_transformer_lm/tiny_transformer_lm/data/generated/academic_dataset.json', 'r') as f:
-    academic_questions = json.load(f)
+# Optional model-generated questions, topped up off the request path
+# (QUESTION_POOL_CHECKPOINT=<structured checkpoint>; needs torch). Started on
+# the first /api/questions request in each worker, never in the preloading master.
+question_generator = create_question_generator(question_bank, GAME_TYPES)
 
 # Career database with detailed paths for 10th/12th students
 CAREER_DATABASE = {
@@ -322,40 +368,38 @@ def google_auth():
         if not google_id or not email:
             return jsonify({'error': 'Invalid token data'}), 401
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Check if user already exists
-        cur.execute("SELECT user_id, name, email, picture_url FROM users WHERE google_id = ?", (google_id,))
-        user = cur.fetchone()
-        
-        if user:
-            # Update last_login
-            cur.execute("""
-                UPDATE users 
-                SET last_login = CURRENT_TIMESTAMP,
-                    name = ?,
-                    picture_url = ?
-                WHERE google_id = ?
-            """, (name, picture, google_id))
-            user_id = user['user_id']
-        else:
-            # Create new user with auth_type
-            cur.execute("""
-                INSERT INTO users (google_id, email, name, picture_url, auth_type)
-                VALUES (?, ?, ?, ?, 'google')
-            """, (google_id, email, name, picture))
-            user_id = cur.lastrowid
-        
-        conn.commit()
-        
-        # Get updated user data
-        cur.execute("SELECT user_id, google_id, email, name, picture_url FROM users WHERE user_id = ?", (user_id,))
-        user_data = dict(cur.fetchone())
-        
-        cur.close()
-        conn.close()
-        
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+
+            # Check if user already exists
+            cur.execute("SELECT user_id, name, email, picture_url FROM users WHERE google_id = ?", (google_id,))
+            user = cur.fetchone()
+
+            if user:
+                # Update last_login
+                cur.execute("""
+                    UPDATE users
+                    SET last_login = CURRENT_TIMESTAMP,
+                        name = ?,
+                        picture_url = ?
+                    WHERE google_id = ?
+                """, (name, picture, google_id))
+                user_id = user['user_id']
+            else:
+                # Create new user with auth_type
+                cur.execute("""
+                    INSERT INTO users (google_id, email, name, picture_url, auth_type)
+                    VALUES (?, ?, ?, ?, 'google')
+                """, (google_id, email, name, picture))
+                user_id = cur.lastrowid
+
+            conn.commit()
+
+            # Get updated user data
+            cur.execute("SELECT user_id, google_id, email, name, picture_url FROM users WHERE user_id = ?", (user_id,))
+            user_data = dict(cur.fetchone())
+            cur.close()
+
         # Store user info in session
         session['user_id'] = user_id
         session['user_email'] = email
@@ -405,13 +449,12 @@ def logout():
 def check_auth():
     """Check if user is authenticated"""
     if 'user_id' in session:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT user_id, email, name, picture_url FROM users WHERE user_id = ?", (session['user_id'],))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
-        
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT user_id, email, name, picture_url FROM users WHERE user_id = ?", (session['user_id'],))
+            user = cur.fetchone()
+            cur.close()
+
         if user:
             return jsonify({'authenticated': True, 'user': dict(user)})
     
@@ -432,32 +475,28 @@ def register():
         if not all([username, email, password]):
             return jsonify({'error': 'Missing required fields'}), 400
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Check if email already exists
-        cur.execute("SELECT user_id FROM users WHERE email = ?", (email,))
-        if cur.fetchone():
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+
+            # Check if email already exists
+            cur.execute("SELECT user_id FROM users WHERE email = ?", (email,))
+            if cur.fetchone():
+                return jsonify({'error': 'Email already registered'}), 400
+
+            # Insert new user (password stored as-is for simplicity - in production use hashing!)
+            cur.execute("""
+                INSERT INTO users (username, email, password, name, auth_type)
+                VALUES (?, ?, ?, ?, 'email')
+            """, (username, email, password, username))
+
+            user_id = cur.lastrowid
+            conn.commit()
+
+            # Get user data
+            cur.execute("SELECT user_id, email, username, name FROM users WHERE user_id = ?", (user_id,))
+            user_data = dict(cur.fetchone())
             cur.close()
-            conn.close()
-            return jsonify({'error': 'Email already registered'}), 400
-        
-        # Insert new user (password stored as-is for simplicity - in production use hashing!)
-        cur.execute("""
-            INSERT INTO users (username, email, password, name, auth_type)
-            VALUES (?, ?, ?, ?, 'email')
-        """, (username, email, password, username))
-        
-        user_id = cur.lastrowid
-        conn.commit()
-        
-        # Get user data
-        cur.execute("SELECT user_id, email, username, name FROM users WHERE user_id = ?", (user_id,))
-        user_data = dict(cur.fetchone())
-        
-        cur.close()
-        conn.close()
-        
+
         # Store in session
         session['user_id'] = user_id
         session['user_email'] = email
@@ -483,37 +522,34 @@ def login():
         if not all([email, password]):
             return jsonify({'error': 'Missing email or password'}), 400
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Find user by email
-        cur.execute("""
-            SELECT user_id, email, username, name, password, auth_type 
-            FROM users 
-            WHERE email = ? AND auth_type = 'email'
-        """, (email,))
-        
-        user = cur.fetchone()
-        
-        if not user:
-            cur.close()
-            conn.close()
-            return jsonify({'error': 'Account not found'}), 404
-        
-        # Check password (in production, use password hashing!)
-        if user['password'] != password:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+
+            # Find user by email
+            cur.execute("""
+                SELECT user_id, email, username, name, password, auth_type
+                FROM users
+                WHERE email = ? AND auth_type = 'email'
+            """, (email,))
+
+            user = cur.fetchone()
+
+            if not user:
+                return jsonify({'error': 'Account not found'}), 404
+
+            # Check password (in production, use password hashing!)
+            if user['password'] != password:
+                return jsonify({'error': 'Incorrect password'}), 401
+
+            # Update last login
+            cur.execute("""
+                UPDATE users
+                SET last_login = CURRENT_TIMESTAMP
+                WHERE user_id = ?
+            """, (user['user_id'],))
+            conn.commit()
             cur.close()
-            conn.close()
-            return jsonify({'error': 'Incorrect password'}), 401
-        
-        # Update last login
-        cur.execute("""
-            UPDATE users 
-            SET last_login = CURRENT_TIMESTAMP
-            WHERE user_id = ?
-        """, (user['user_id'],))
-        conn.commit()
-        
+
         # Get updated user data
         user_data = {
             'user_id': user['user_id'],
@@ -521,10 +557,7 @@ def login():
             'username': user['username'],
             'name': user['name']
         }
-        
-        cur.close()
-        conn.close()
-        
+
         # Store in session
         session['user_id'] = user['user_id']
         session['user_email'] = user['email']
@@ -595,16 +628,14 @@ def forgot_password():
         if not email:
             return jsonify({'error': 'Email is required'}), 400
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Check if email exists
-        cur.execute("SELECT user_id, username FROM users WHERE email = ? AND auth_type = 'email'", (email,))
-        user = cur.fetchone()
-        
-        cur.close()
-        conn.close()
-        
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+
+            # Check if email exists
+            cur.execute("SELECT user_id, username FROM users WHERE email = ? AND auth_type = 'email'", (email,))
+            user = cur.fetchone()
+            cur.close()
+
         if not user:
             return jsonify({'error': 'No account found with this email'}), 404
         
@@ -696,25 +727,22 @@ def reset_password():
             del otp_storage[email]
             return jsonify({'error': 'OTP has expired'}), 400
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Update password
-        cur.execute("""
-            UPDATE users 
-            SET password = ?
-            WHERE email = ? AND auth_type = 'email'
-        """, (new_password, email))
-        
-        if cur.rowcount == 0:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+
+            # Update password
+            cur.execute("""
+                UPDATE users
+                SET password = ?
+                WHERE email = ? AND auth_type = 'email'
+            """, (new_password, email))
+
+            if cur.rowcount == 0:
+                return jsonify({'error': 'User not found'}), 404
+
+            conn.commit()
             cur.close()
-            conn.close()
-            return jsonify({'error': 'User not found'}), 404
-        
-        conn.commit()
-        cur.close()
-        conn.close()
-        
+
         # Clear OTP from storage
         del otp_storage[email]
         
@@ -733,114 +761,228 @@ def reset_password():
 def create_session():
     """Create a new user session with face analysis data"""
     data = request.json
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        INSERT INTO user_sessions (user_name, face_emotion, face_confidence, face_analysis_data)
-        VALUES (?, ?, ?, ?)
-    """, (data.get('userName'), data.get('faceEmotion'), 
-          data.get('faceConfidence'), json.dumps(data.get('faceAnalysisData', {}))))
-    
-    session_id = cur.lastrowid
-    conn.commit()
-    cur.close()
-    conn.close()
-    
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+
+        cur.execute("""
+            INSERT INTO user_sessions (user_name, face_emotion, face_confidence, face_analysis_data)
+            VALUES (?, ?, ?, ?)
+        """, (data.get('userName'), data.get('faceEmotion'),
+              data.get('faceConfidence'), json.dumps(data.get('faceAnalysisData', {}))))
+
+        session_id = cur.lastrowid
+        conn.commit()
+        cur.close()
+
     return jsonify({'sessionId': session_id})
 
 @app.route('/api/questions/<game_type>', methods=['GET'])
 def get_questions(game_type):
-    """Get random questions for a specific game type"""
-    count = int(request.args.get('count', 10))
-    
-    if game_type == 'emotional':
-        questions = random.sample(emotional_questions, min(count, len(emotional_questions)))
-    elif game_type == 'reasoning':
-        questions = random.sample(reasoning_questions, min(count, len(reasoning_questions)))
-    elif game_type == 'academic':
-        questions = random.sample(academic_questions, min(count, len(academic_questions)))
-    else:
+    """
+    Get random questions for a specific game type.
+    Optional: session_id (no repeats within a session), difficulty=easy|medium, tags=stress,empathy (weight the draw
+    toward questions rated high on those traits), tagWeight=0..1
+    Unfiltered requests are served fresh generated questions first when the question pool is enabled;
+    the static bank fills the rest.
+    """
+    if game_type not in question_bank:
         return jsonify({'error': 'Invalid game type'}), 400
-    
-    return jsonify({'questions': questions})
+
+    count = request.args.get('count', 10, type=int)
+    difficulty = request.args.get('difficulty') or None
+    tags = [t for t in request.args.get('tags', '').split(',') if t]
+    tag_weight = min(max(request.args.get('tagWeight', DEFAULT_TAG_WEIGHT, type=float), 0.0), 1.0)
+
+    sample_kwargs = {'difficulty': difficulty, 'tags': tags, 'tag_weight': tag_weight}
+
+    # Generated questions have no difficulty/trait ratings, so filtered requests use the bank only
+    generated = []
+    if question_generator is not None and difficulty is None and not tags:
+        question_generator.start()  # starts it in this worker process on first use
+        generated = question_generator.pool.take(game_type, count)
+        count -= len(generated)
+
+    # With a session, never serve a question that session has already seen
+    session_id = request.args.get('session_id', type=int)
+    if count <= 0:
+        positions = []
+    elif session_id is not None:
+        with get_db_connection() as conn:
+            positions = question_history.sample_unseen(conn, question_bank, session_id, game_type,
+                                                       count, **sample_kwargs)
+            conn.commit()
+    else:
+        positions = question_bank.sample(game_type, count, **sample_kwargs)
+    return app.response_class(question_bank.questions_json(game_type, positions, generated),
+                              mimetype='application/json')
 
 @app.route('/api/answer/submit', methods=['POST'])
 def submit_answer():
     """Submit an answer to a question"""
-    data = request.json
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        INSERT INTO game_answers 
-        (session_id, game_type, question_id, question_text, selected_option, option_text, option_effects)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (data['sessionId'], data['gameType'], data['questionId'], 
-          data['questionText'], data['selectedOption'], data['optionText'], 
-          json.dumps(data.get('optionEffects', {}))))
-    
-    conn.commit()
-    cur.close()
-    conn.close()
-    
+    data = request.get_json(silent=True) or {}
+    try:
+        session_id = session_traits.to_id(data.get('sessionId'))
+        question_id = session_traits.to_id(data.get('questionId'))
+    except ValueError:
+        return jsonify({'error': 'sessionId and questionId must be integers'}), 400
+    if data.get('gameType') not in GAME_TYPES:
+        return jsonify({'error': 'A valid gameType is required'}), 400
+    if not isinstance(data.get('optionEffects', {}), dict):
+        return jsonify({'error': 'optionEffects must be an object'}), 400
+
+    with get_db_connection() as conn:
+        # Inserts the answer and updates the session's trait totals together;
+        # a retried answer for the same question is not counted twice
+        session_traits.record_answers(conn, session_id, [dict(data, questionId=question_id)])
+        conn.commit()
+
     return jsonify({'success': True})
 
+@app.route('/api/answer/submit-batch', methods=['POST'])
+def submit_answer_batch():
+    """Submit all answers of a game in one transaction (idempotent per question)"""
+    data = request.get_json(silent=True) or {}
+    answers = data.get('answers')
+
+    if not isinstance(answers, list):
+        return jsonify({'error': 'sessionId and an answers list are required'}), 400
+    try:
+        session_id = session_traits.to_id(data.get('sessionId'))
+    except ValueError:
+        return jsonify({'error': 'sessionId must be an integer'}), 400
+    if len(answers) > MAX_BATCH_ANSWERS:
+        return jsonify({'error': f'At most {MAX_BATCH_ANSWERS} answers per batch'}), 400
+
+    rows = []
+    for answer in answers:
+        if not isinstance(answer, dict):
+            return jsonify({'error': 'Each answer must be an object'}), 400
+        game_type = answer.get('gameType', data.get('gameType'))
+        try:
+            question_id = session_traits.to_id(answer.get('questionId'))
+        except ValueError:
+            question_id = None
+        if game_type not in GAME_TYPES or question_id is None:
+            return jsonify({'error': 'Each answer needs a valid gameType and an integer questionId'}), 400
+        if not isinstance(answer.get('optionEffects', {}), dict):
+            return jsonify({'error': 'optionEffects must be an object'}), 400
+        # Normalised here so "854" and 854 are the same question for the duplicate check
+        rows.append(dict(answer, gameType=game_type, questionId=question_id))
+
+    with get_db_connection() as conn:
+        # Inserted one by one (rowcount tells duplicates apart) inside one
+        # BEGIN IMMEDIATE transaction, with one commit (a single fsync) for the whole game
+        inserted = session_traits.record_answers(conn, session_id, rows)
+        conn.commit()
+
+    return jsonify({
+        'success': True,
+        'received': len(rows),
+        'inserted': inserted,
+        'duplicates': len(rows) - inserted
+    })
+
+def apply_face_emotion(face_emotion, emotional_scores):
+    """Factor the face scan emotion into the emotional scores (in place)"""
+    face_emotion = face_emotion.lower() if face_emotion else 'neutral'
+    if face_emotion in ['stressed', 'anxious']:
+        emotional_scores['stress'] -= 5
+    elif face_emotion in ['sad', 'depressed']:
+        emotional_scores['confidence'] -= 3
+    elif face_emotion in ['happy', 'joyful']:
+        emotional_scores['confidence'] += 3
+
+def scores_to_profile(emotional_scores, reasoning_scores, academic_scores):
+    """Convert raw trait totals to the high/medium/low profile format for RAG"""
+    def level(v):
+        return 'high' if v >= 3 else 'medium' if v >= 1 else 'low'
+    return {
+        'emotional_profile': {k: level(v) for k, v in emotional_scores.items()},
+        'reasoning_profile': {k: level(v) for k, v in reasoning_scores.items()},
+        'academic_profile': {k: level(v) for k, v in academic_scores.items()}
+    }
+
+def rag_to_matches(rag_recommendations):
+    """Shape RAG recommendations as career match dicts"""
+    return [{
+        'career': rec['career_name'],
+        'score': rec.get('match_score', 80),
+        'path': rec['student_guidance'],
+        'education': rec['education_path'],
+        'salary': rec['salary_range'],
+        'category': rec['category']
+    } for rec in rag_recommendations]
+
+def traditional_matches(emotional_scores, reasoning_scores, academic_scores, answer_count):
+    """Fallback rule-based matching against CAREER_DATABASE, best first"""
+    career_matches = []
+    for career, profile in CAREER_DATABASE.items():
+        score = 0
+
+        # Emotional, reasoning and academic match
+        for profile_key, scores in (('emotional_profile', emotional_scores),
+                                    ('reasoning_profile', reasoning_scores),
+                                    ('academic_profile', academic_scores)):
+            for key, level in profile[profile_key].items():
+                if key in scores:
+                    if level == 'high' and scores[key] >= 3:
+                        score += 5
+                    elif level == 'medium' and scores[key] >= 1:
+                        score += 3
+
+        # Engagement bonus
+        if answer_count >= 25:
+            score += 5
+        elif answer_count >= 15:
+            score += 3
+
+        career_matches.append({
+            'career': career,
+            'score': score,
+            'path': profile['path']
+        })
+
+    career_matches.sort(key=lambda x: x['score'], reverse=True)
+    return career_matches
+
+INSERT_RECOMMENDATION_SQL = """
+    INSERT INTO career_recommendations
+    (session_id, recommended_career, career_description, confidence_score,
+     emotional_score, reasoning_score, academic_score, career_path)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def recommendation_row(session_id, top_career, emotional_scores, reasoning_scores, academic_scores):
+    """Parameters for INSERT_RECOMMENDATION_SQL"""
+    return (session_id, top_career['career'],
+            f"Based on your profile analysis, {top_career['career']} is an excellent match for you!",
+            top_career.get('score', 80),
+            json.dumps(emotional_scores), json.dumps(reasoning_scores), json.dumps(academic_scores),
+            top_career['path'])
+
 @app.route('/api/career/recommend/<int:session_id>', methods=['POST'])
 def recommend_career(session_id):
     """Generate career recommendation based on all collected data using RAG"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Get session data
-        cur.execute("SELECT * FROM user_sessions WHERE session_id = ?", (session_id,))
-        session_row = cur.fetchone()
-        
-        if not session_row:
-            return jsonify({'error': 'Session not found', 'career': 'Unknown', 'description': 'Session not found'}), 404
-        
-        session = dict(session_row)
-        
-        # Get all answers
-        cur.execute("""
-            SELECT game_type, option_effects 
-            FROM game_answers 
-            WHERE session_id = ?
-        """, (session_id,))
-        answers = [dict(row) for row in cur.fetchall()]
-        
-        # Aggregate scores
-        emotional_scores = {"stress": 0, "confidence": 0, "empathy": 0, "risk": 0, "curiosity": 0}
-        reasoning_scores = {"logic": 0, "analysis": 0, "decision": 0, "risk_reasoning": 0, 
-                            "constraint": 0, "prediction": 0, "efficiency": 0, "abstraction": 0}
-        academic_scores = {"physics": 0, "chemistry": 0, "biology": 0, "mathematics": 0, 
-                           "computer_science": 0, "electronics": 0, "environment": 0, 
-                           "exam_focus": 0, "career_awareness": 0}
-        
-        for answer in answers:
-            effects = json.loads(answer['option_effects']) if answer['option_effects'] else {}
-            if answer['game_type'] == 'emotional':
-                for key, value in effects.items():
-                    if key in emotional_scores:
-                        emotional_scores[key] += value
-            elif answer['game_type'] == 'reasoning':
-                for key, value in effects.items():
-                    if key in reasoning_scores:
-                        reasoning_scores[key] += value
-            elif answer['game_type'] == 'academic':
-                for key, value in effects.items():
-                    if key in academic_scores:
-                        academic_scores[key] += value
-        
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+
+            # Get session data
+            cur.execute("SELECT * FROM user_sessions WHERE session_id = ?", (session_id,))
+            session_row = cur.fetchone()
+
+            if not session_row:
+                return jsonify({'error': 'Session not found', 'career': 'Unknown', 'description': 'Session not found'}), 404
+
+            session = dict(session_row)
+
+            # Running trait totals: one primary-key read, no per-answer parsing
+            emotional_scores, reasoning_scores, academic_scores, answer_count = \
+                session_traits.load_totals(conn, session_id)
+            cur.close()
+
         # Factor in face emotion
-        face_emotion = session['face_emotion'].lower() if session['face_emotion'] else 'neutral'
-        if face_emotion in ['stressed', 'anxious']:
-            emotional_scores['stress'] -= 5
-        elif face_emotion in ['sad', 'depressed']:
-            emotional_scores['confidence'] -= 3
-        elif face_emotion in ['happy', 'joyful']:
-            emotional_scores['confidence'] += 3
+        apply_face_emotion(session['face_emotion'], emotional_scores)
         
         print(f"\n[RAG] Career Recommendation for Session {session_id}")
         print(f"Emotional: {emotional_scores}")
@@ -857,111 +999,41 @@ def recommend_career(session_id):
         if current_rag:
             try:
                 # Convert scores to profile format for RAG
-                emotional_profile = {k: ('high' if v >= 3 else 'medium' if v >= 1 else 'low') 
-                                    for k, v in emotional_scores.items()}
-                reasoning_profile = {k: ('high' if v >= 3 else 'medium' if v >= 1 else 'low') 
-                                    for k, v in reasoning_scores.items()}
-                academic_profile = {k: ('high' if v >= 3 else 'medium' if v >= 1 else 'low') 
-                                   for k, v in academic_scores.items()}
-                
-                user_profile = {
-                    'emotional_profile': emotional_profile,
-                    'reasoning_profile': reasoning_profile,
-                    'academic_profile': academic_profile
-                }
+                user_profile = scores_to_profile(emotional_scores, reasoning_scores, academic_scores)
                 
                 # Get RAG recommendations
                 rag_recommendations = current_rag.get_career_recommendations(user_profile, top_k=5)
-
                 
                 print(f"[RAG] Found {len(rag_recommendations)} recommendations")
                 
                 if rag_recommendations:
                     for i, rec in enumerate(rag_recommendations, 1):
                         print(f"  {i}. {rec['career_name']} (Match: {rec.get('match_score', 'N/A')}%)")
-                        career_matches.append({
-                            'career': rec['career_name'],
-                            'score': rec.get('match_score', 80),
-                            'path': rec['student_guidance'],
-                            'education': rec['education_path'],
-                            'salary': rec['salary_range'],
-                            'category': rec['category']
-                        })
-                    
+                    career_matches = rag_to_matches(rag_recommendations)
                     top_career = career_matches[0]
             except Exception as e:
                 print(f"[RAG] Error: {e}. Falling back to traditional method.")
-                rag_system_failed = True
         
         # Fallback to traditional recommendation if RAG fails
         if not top_career:
             print("[Traditional] Using fallback recommendation system")
-            for career, profile in CAREER_DATABASE.items():
-                score = 0
-                details = []
-                
-                # Emotional match
-                for key, level in profile['emotional_profile'].items():
-                    if key in emotional_scores:
-                        if level == 'high' and emotional_scores[key] >= 3:
-                            score += 5
-                        elif level == 'medium' and emotional_scores[key] >= 1:
-                            score += 3
-                
-                # Reasoning match
-                for key, level in profile['reasoning_profile'].items():
-                    if key in reasoning_scores:
-                        if level == 'high' and reasoning_scores[key] >= 3:
-                            score += 5
-                        elif level == 'medium' and reasoning_scores[key] >= 1:
-                            score += 3
-                
-                # Academic match
-                for key, level in profile['academic_profile'].items():
-                    if key in academic_scores:
-                        if level == 'high' and academic_scores[key] >= 3:
-                            score += 5
-                        elif level == 'medium' and academic_scores[key] >= 1:
-                            score += 3
-                
-                # Engagement bonus
-                if len(answers) >= 25:
-                    score += 5
-                elif len(answers) >= 15:
-                    score += 3
-                
-                career_matches.append({
-                    'career': career,
-                    'score': score,
-                    'path': profile['path']
-                })
-            
-            career_matches.sort(key=lambda x: x['score'], reverse=True)
+            career_matches = traditional_matches(emotional_scores, reasoning_scores, academic_scores, answer_count)
             top_career = career_matches[0]
         
         print(f"\n[Final] Recommended: {top_career['career']} (Score: {top_career.get('score', 'N/A')})")
         
-        # Save recommendation
-        cur.execute("""
-            INSERT INTO career_recommendations 
-            (session_id, recommended_career, career_description, confidence_score, 
-             emotional_score, reasoning_score, academic_score, career_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (session_id, top_career['career'], 
-              f"Based on your profile analysis, {top_career['career']} is an excellent match for you!",
-              top_career.get('score', 80),
-              json.dumps(emotional_scores), json.dumps(reasoning_scores), json.dumps(academic_scores),
-              top_career['path']))
-        
-        # Update session as completed
-        cur.execute("""
-            UPDATE user_sessions SET completed_at = ? WHERE session_id = ?
-        """, (datetime.now().isoformat(), session_id))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
-        
+        with get_db_connection() as conn:
+            # Save recommendation
+            conn.execute(INSERT_RECOMMENDATION_SQL, recommendation_row(
+                session_id, top_career, emotional_scores, reasoning_scores, academic_scores))
+
+            # Update session as completed
+            conn.execute("""
+                UPDATE user_sessions SET completed_at = ? WHERE session_id = ?
+            """, (datetime.now().isoformat(), session_id))
+
+            conn.commit()
+
         return jsonify({
             'career': top_career['career'],
             'recommendedCareer': top_career['career'],
@@ -984,23 +1056,103 @@ def recommend_career(session_id):
             'description': 'Unable to generate recommendation. Please try again.'
         }), 500
 
+MAX_BATCH_SESSIONS = 10000
+
+@app.route('/api/career/recommend/batch', methods=['POST'])
+def recommend_career_batch():
+    """Recommend careers for many sessions at once (e.g. a whole class)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        session_ids = data.get('sessionIds')
+        top_k = data.get('topK', 5)
+
+        if not isinstance(session_ids, list) or not session_ids:
+            return jsonify({'error': 'sessionIds must be a non-empty list'}), 400
+        if isinstance(top_k, bool) or not isinstance(top_k, int) or top_k <= 0:
+            return jsonify({'error': 'topK must be a positive integer'}), 400
+        if len(session_ids) > MAX_BATCH_SESSIONS:
+            return jsonify({'error': f'At most {MAX_BATCH_SESSIONS} sessions per batch'}), 400
+        try:
+            session_ids = list(dict.fromkeys(int(sid) for sid in session_ids))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'sessionIds must be integers'}), 400
+
+        # One query for every session's face emotion and trait totals
+        with get_db_connection() as conn:
+            totals = session_traits.load_totals_many(conn, session_ids)
+
+        found = [sid for sid in session_ids if sid in totals]
+        for sid in found:
+            apply_face_emotion(totals[sid]['face_emotion'], totals[sid]['emotional'])
+
+        # Score the whole batch as one profiles x careers matrix operation
+        all_matches = None
+        current_rag = get_rag_system()
+        if current_rag and found:
+            try:
+                profiles = [scores_to_profile(totals[sid]['emotional'], totals[sid]['reasoning'],
+                                              totals[sid]['academic']) for sid in found]
+                batch = current_rag.get_career_recommendations_batch(profiles, top_k=top_k)
+                all_matches = [rag_to_matches(recs) for recs in batch]
+                method = 'RAG'
+            except Exception as e:
+                logger.error(f"Batch RAG scoring failed: {e}. Falling back to traditional method.")
+        if all_matches is None:
+            all_matches = [traditional_matches(totals[sid]['emotional'], totals[sid]['reasoning'],
+                                               totals[sid]['academic'], totals[sid]['answer_count'])[:top_k]
+                           for sid in found]
+            method = 'Traditional'
+
+        results = []
+        rows = []
+        for sid, career_matches in zip(found, all_matches):
+            entry = totals[sid]
+            top_career = career_matches[0] if career_matches else None
+            if top_career:
+                rows.append(recommendation_row(sid, top_career, entry['emotional'],
+                                               entry['reasoning'], entry['academic']))
+            results.append({
+                'sessionId': sid,
+                'career': top_career['career'] if top_career else None,
+                'confidenceScore': top_career.get('score', 80) if top_career else None,
+                'allMatches': career_matches
+            })
+
+        # Persist every recommendation in a single transaction
+        with get_db_connection() as conn:
+            conn.executemany(INSERT_RECOMMENDATION_SQL, rows)
+            completed_at = datetime.now().isoformat()
+            conn.executemany("""
+                UPDATE user_sessions SET completed_at = ? WHERE session_id = ?
+            """, [(completed_at, row[0]) for row in rows])
+            conn.commit()
+
+        return jsonify({
+            'success': True,
+            'results': results,
+            'notFound': [sid for sid in session_ids if sid not in totals],
+            'recommendation_method': method
+        })
+    except Exception as e:
+        logger.error(f"Error in batch career recommendation: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/session/<int:session_id>/summary', methods=['GET'])
 def get_session_summary(session_id):
     """Get complete session summary"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT us.*, cr.recommended_career, cr.career_path, cr.confidence_score
-        FROM user_sessions us
-        LEFT JOIN career_recommendations cr ON us.session_id = cr.session_id
-        WHERE us.session_id = ?
-    """, (session_id,))
-    
-    result = cur.fetchone()
-    cur.close()
-    conn.close()
-    
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT us.*, cr.recommended_career, cr.career_path, cr.confidence_score
+            FROM user_sessions us
+            LEFT JOIN career_recommendations cr ON us.session_id = cr.session_id
+            WHERE us.session_id = ?
+        """, (session_id,))
+
+        result = cur.fetchone()
+        cur.close()
+
     if result:
         # Convert tuple to dictionary
         columns = [description[0] for description in cur.description]
@@ -1053,18 +1205,19 @@ def serve_images(path):
 
 @app.route('/api/career/search', methods=['POST'])
 def search_careers():
-    """Search careers using RAG vector database"""
+    """Keyword (BM25) search over the career database"""
     try:
-        data = request.json
+        data = request.get_json(silent=True) or {}
         query = data.get('query', '')
         
         if not query:
             return jsonify({'error': 'Query is required'}), 400
         
-        if not rag_system:
+        current_rag = get_rag_system()
+        if not current_rag:
             return jsonify({'error': 'RAG system not available'}), 503
         
-        results = rag_system.search_careers_by_text(query, top_k=5)
+        results = current_rag.search_careers_by_text(query, top_k=5)
         
         return jsonify({
             'success': True,
@@ -1077,26 +1230,91 @@ def search_careers():
         return jsonify({'error': str(e)}), 500
 
 
+# The explore payload only depends on the static career list, so each
+# response body is serialized once and then served as bytes with an ETag
+EXPLORE_SAMPLES_PER_CATEGORY = 2
+EXPLORE_MAX_PER_PAGE = 50
+_explore_cache = {}  # (category, page, per_page) -> (body bytes, etag); existing categories/pages only
+_explore_by_category = None
+
+def explore_by_category(current_rag):
+    """careers_by_category(), built once (it copies every career)"""
+    global _explore_by_category
+    if _explore_by_category is None:
+        _explore_by_category = current_rag.careers_by_category()
+    return _explore_by_category
+
+def build_explore_body(current_rag, category=None, page=1, per_page=None):
+    """Serialized explore JSON and its ETag; None if the category/page doesn't exist"""
+    by_category = explore_by_category(current_rag)
+    if category is None:
+        # The overview has no paging: every ?page=/per_page= shares one entry
+        key = (None, None, None)
+    else:
+        careers = by_category.get(category)
+        if careers is None:
+            return None
+        per_page = per_page or len(careers)
+        pages = max(1, -(-len(careers) // per_page))
+        if page > pages:
+            return None
+        key = (category, page, per_page)
+
+    cached = _explore_cache.get(key)
+    if cached:
+        return cached
+
+    if category is None:
+        payload = {
+            'success': True,
+            'categories': list(by_category),
+            'sample_careers': [career for careers in by_category.values()
+                               for career in careers[:EXPLORE_SAMPLES_PER_CATEGORY]],
+            'careers_by_category': by_category
+        }
+    else:
+        payload = {
+            'success': True,
+            'category': category,
+            'page': page,
+            'per_page': per_page,
+            'pages': pages,
+            'total': len(careers),
+            'careers': careers[(page - 1) * per_page:page * per_page]
+        }
+
+    body = app.json.dumps(payload).encode('utf-8')
+    cached = _explore_cache[key] = (body, hashlib.sha1(body).hexdigest())
+    return cached
+
 @app.route('/api/career/explore', methods=['GET'])
 def explore_careers():
-    """Get all career categories and basic info from RAG"""
+    """
+    Career categories with sample careers, plus every career grouped by category.
+    ?category=<name>[&page=N&per_page=M] returns one (paginated) category.
+    Supports If-None-Match revalidation (304).
+    """
     try:
-        if not rag_system:
+        current_rag = get_rag_system()
+        if not current_rag:
             return jsonify({'error': 'RAG system not available'}), 503
-        
-        # Get sample careers from different categories
-        categories = ['Technology', 'Healthcare', 'Creative', 'Finance', 'Engineering', 'Education']
-        career_samples = []
-        
-        for category in categories:
-            results = rag_system.search_careers_by_text(f"careers in {category}", top_k=2)
-            career_samples.extend(results)
-        
-        return jsonify({
-            'success': True,
-            'categories': categories,
-            'sample_careers': career_samples
-        })
+
+        category = request.args.get('category')
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', type=int)
+        if page < 1 or (per_page is not None and not 1 <= per_page <= EXPLORE_MAX_PER_PAGE):
+            return jsonify({'error': f'page must be >= 1 and per_page between 1 and {EXPLORE_MAX_PER_PAGE}'}), 400
+
+        cached = build_explore_body(current_rag, category, page, per_page)
+        if cached is None:
+            return jsonify({'error': 'Category or page not found'}), 404
+
+        body, etag = cached
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = 3600
+        return response.make_conditional(request)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
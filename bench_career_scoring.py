@@ -0,0 +1,42 @@
+"""Micro-benchmark: vectorized career scoring vs the reference dict walk
+
+Usage: python bench_career_scoring.py [--profiles 5000] [--top-k 5]
+"""
+
+import time
+import random
+import argparse
+
+from career_rag import CareerRAG
+from test_career_vectorized import random_profile, reference_recommendations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', type=int, default=5000)
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    rag = CareerRAG()
+    rng = random.Random(0)
+    profiles = [random_profile(rng, rag) for _ in range(args.profiles)]
+
+    start = time.perf_counter()
+    for profile in profiles:
+        reference_recommendations(rag, profile, args.top_k)
+    reference = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for profile in profiles:
+        rag.get_career_recommendations(profile, top_k=args.top_k)
+    vectorized = time.perf_counter() - start
+
+    n = len(profiles)
+    print(f"Careers: {len(rag.careers_db)} | Profiles: {n} | top_k: {args.top_k}\n")
+    print(f"reference dict walk   {reference * 1e6 / n:8.1f} µs/profile")
+    print(f"vectorized (NumPy)    {vectorized * 1e6 / n:8.1f} µs/profile")
+    print(f"\nSpeedup: {reference / vectorized:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark pooled WAL connections vs the old per-request sqlite3.connect
+
+Drives /api/session/create and /api/answer/submit concurrently from a thread
+pool through the Flask test client and reports requests/sec for each mode.
+
+Usage: python bench_db_pool.py [--threads 8] [--requests 400]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Point the server at a throwaway database before it is imported
+BENCH_DIR = tempfile.mkdtemp(prefix="csnova_bench_")
+os.environ['DATABASE_URL'] = os.path.join(BENCH_DIR, 'bench.db')
+
+import api_server
+
+
+@contextmanager
+def legacy_connection():
+    """Old behaviour: fresh rollback-journal connection per request"""
+    conn = sqlite3.connect(api_server.DB_FILE, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def run_client(requests_per_thread):
+    """Returns (requests sent, requests that failed)"""
+    client = api_server.app.test_client()
+    sent = failed = 0
+    for i in range(requests_per_thread):
+        resp = client.post('/api/session/create', json={
+            'userName': f'bench-{i}',
+            'faceEmotion': 'neutral',
+            'faceConfidence': 0.9
+        })
+        sent += 1
+        if resp.status_code != 200:
+            failed += 1
+            continue
+        session_id = resp.get_json()['sessionId']
+        for q in range(4):
+            resp = client.post('/api/answer/submit', json={
+                'sessionId': session_id,
+                'gameType': 'emotional',
+                'questionId': q + 1,
+                'questionText': 'How do you feel when under time pressure?',
+                'selectedOption': 1,
+                'optionText': 'I stay calm and think through it',
+                'optionEffects': {'stress': 2, 'confidence': 2}
+            })
+            sent += 1
+            failed += resp.status_code != 200
+    return sent, failed
+
+
+def bench(label, threads, total_requests):
+    # 1 session + 4 answers per iteration
+    per_thread = max(1, total_requests // (threads * 5))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(run_client, [per_thread] * threads))
+    elapsed = time.perf_counter() - start
+    sent = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    ok = sent - failed
+    print(f"{label:<22} {ok:>6} ok / {failed:>4} failed in {elapsed:6.2f}s  ->  {ok / elapsed:8.1f} req/s")
+    return ok / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    # Rate limits would reject most of the benchmark traffic
+    for limiter in api_server.app.extensions.get('limiter', ()):
+        limiter.enabled = False
+
+    print(f"Database: {api_server.DB_FILE}")
+    print(f"Threads: {args.threads} | Requests per mode: ~{args.requests}\n")
+
+    pooled_get = api_server.get_db_connection
+
+    # Legacy mode runs on a rollback-journal database, as before the pool
+    api_server.db_pool.close_all()
+    with legacy_connection() as conn:
+        conn.execute("PRAGMA journal_mode = DELETE")
+    api_server.get_db_connection = legacy_connection
+    legacy_rps = bench("per-request connect", args.threads, args.requests)
+
+    api_server.get_db_connection = pooled_get
+    pooled_rps = bench("pooled WAL", args.threads, args.requests)
+
+    print(f"\nSpeedup: {pooled_rps / legacy_rps:.2f}x")
+    api_server.db_pool.close_all()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,66 @@
 
+import re
 import json
 import logging
+from bisect import bisect_left
+from collections import Counter
 from threading import Lock
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
+# Profile level -> numeric user score (anything else counts as 0)
+LEVEL_SCORES = {'high': 3, 'medium': 2, 'low': 1}
+
+# (profile key in the user profile, match key in the career database)
+TRAIT_NAMESPACES = (
+    ('emotional_profile', 'emotional_match'),
+    ('reasoning_profile', 'reasoning_match'),
+    ('academic_profile', 'academic_match'),
+)
+
+# Academic rule that rewards the average of all academic strengths
+ANY_ACADEMIC = 'any'
+
+# Raw score that maps to a 100% match
+MATCH_SCORE_SCALE = 30
+
+# Text search: indexed career fields and their term-frequency weights
+SEARCH_FIELDS = {
+    'name': 3.0,
+    'category': 3.0,
+    'description': 1.0,
+    'education_path': 1.0,
+    'student_guidance': 1.0,
+    'job_locations': 1.0,
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Query terms of at least this length also match longer indexed terms
+# ("engin" -> engineer, engineering); such matches count at a discount
+MIN_PREFIX_LEN = 3
+PREFIX_MATCH_WEIGHT = 0.7
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'i', 'in',
+    'is', 'it', 'me', 'my', 'of', 'on', 'or', 'the', 'to', 'with', 'you', 'your',
+    # every document is a career, so these carry no signal in a query
+    'career', 'job',
+})
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords; plural -s folded (careers -> career)"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if len(token) > 4 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
 class CareerRAG:
     _instance = None
     _lock = Lock()
@@ -26,6 +82,12 @@ class CareerRAG:
         
         # Load career database
         self.careers_db = self._load_career_database()
+
+        # Compile it once into a dense careers x traits weight matrix
+        self._compile_scoring_matrix()
+
+        # Inverted index for free-text career search
+        self._build_search_index()
         
         logger.info(f"✅ Loaded {len(self.careers_db)} careers instantly!")
         self._initialized = True
@@ -444,49 +506,200 @@ class CareerRAG:
             }
         ]
     
+    def _compile_scoring_matrix(self):
+        """
+        Build the careers x traits weight matrix used for scoring.
+        Traits are namespaced per profile (emotional/reasoning/academic); the
+        special academic `any` rule is kept as a separate weight vector since
+        it scores against the user's average academic strength.
+        """
+        self._trait_index = {}
+        for profile_key, match_key in TRAIT_NAMESPACES:
+            for career in self.careers_db:
+                for trait in career.get(match_key, {}):
+                    if match_key == 'academic_match' and trait == ANY_ACADEMIC:
+                        continue
+                    self._trait_index.setdefault((profile_key, trait), len(self._trait_index))
+
+        self._weights = np.zeros((len(self.careers_db), len(self._trait_index)), dtype=np.float64)
+        self._any_weights = np.zeros(len(self.careers_db), dtype=np.float64)
+        for row, career in enumerate(self.careers_db):
+            for profile_key, match_key in TRAIT_NAMESPACES:
+                for trait, weight in career.get(match_key, {}).items():
+                    if match_key == 'academic_match' and trait == ANY_ACADEMIC:
+                        self._any_weights[row] = weight
+                    else:
+                        self._weights[row, self._trait_index[(profile_key, trait)]] = weight
+
+        # Response payload per career, minus the per-request match_score
+        self._career_payloads = [{
+            'career_name': career['name'],
+            'category': career['category'],
+            'description': career['description'],
+            'education_path': career['education_path'],
+            'salary_range': career['salary_range'],
+            'student_guidance': career['student_guidance'],
+            'job_locations': career['job_locations'],
+        } for career in self.careers_db]
+
+        # Category -> career rows, in database order
+        self._category_index = {}
+        for row, career in enumerate(self.careers_db):
+            self._category_index.setdefault(career['category'], []).append(row)
+
+    def careers_by_category(self):
+        """{category: [career dicts]} in database order, for browsing"""
+        return {
+            category: [dict(self._career_payloads[row]) for row in rows]
+            for category, rows in self._category_index.items()
+        }
+
+    def _profile_vector(self, user_profile):
+        """Map a high/medium/low profile to (trait vector, average academic score)"""
+        vector = np.zeros(len(self._trait_index), dtype=np.float64)
+        for profile_key, _ in TRAIT_NAMESPACES:
+            for trait, level in user_profile.get(profile_key, {}).items():
+                col = self._trait_index.get((profile_key, trait))
+                if col is not None:
+                    vector[col] = LEVEL_SCORES.get(level, 0)
+
+        academic = user_profile.get('academic_profile', {})
+        academic_mean = sum(LEVEL_SCORES.get(level, 0) for level in academic.values()) / max(len(academic), 1)
+        return vector, academic_mean
+
+    def _top_k_indices(self, scores, top_k):
+        """
+        Indices of the top_k scores, highest first. Ties keep database order,
+        matching a stable descending sort, without sorting every career.
+        """
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return np.empty(0, dtype=np.intp)
+        kth = np.argpartition(-scores, top_k - 1)[top_k - 1]
+        candidates = np.flatnonzero(scores >= scores[kth])
+        order = np.argsort(-scores[candidates], kind='stable')
+        return candidates[order[:top_k]]
+
+    def _build_search_index(self):
+        """
+        Inverted index over SEARCH_FIELDS. BM25 depends only on term frequency
+        and document length, so each term's per-career score is precomputed
+        and a query is a few array lookups.
+        """
+        term_freqs = []
+        for career in self.careers_db:
+            tf = Counter()
+            for field, weight in SEARCH_FIELDS.items():
+                for token in tokenize(career.get(field, '')):
+                    tf[token] += weight
+            term_freqs.append(tf)
+
+        doc_lengths = np.array([sum(tf.values()) for tf in term_freqs], dtype=np.float64)
+        avg_length = doc_lengths.mean() if len(doc_lengths) else 1.0
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / avg_length)
+
+        postings = {}
+        for doc, tf in enumerate(term_freqs):
+            for term, freq in tf.items():
+                postings.setdefault(term, []).append((doc, freq))
+
+        n_docs = len(self.careers_db)
+        self._postings = {}
+        for term, entries in postings.items():
+            docs = np.array([doc for doc, _ in entries], dtype=np.intp)
+            freqs = np.array([freq for _, freq in entries], dtype=np.float64)
+            idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            self._postings[term] = (docs, idf * freqs * (BM25_K1 + 1) / (freqs + length_norm[docs]))
+        self._vocabulary = sorted(self._postings)
+
+    def _expand_term(self, term):
+        """(indexed term, weight) pairs a query term matches: exact plus prefixes"""
+        matches = [(term, 1.0)] if term in self._postings else []
+        if len(term) >= MIN_PREFIX_LEN:
+            i = bisect_left(self._vocabulary, term)
+            while i < len(self._vocabulary) and self._vocabulary[i].startswith(term):
+                if self._vocabulary[i] != term:
+                    matches.append((self._vocabulary[i], PREFIX_MATCH_WEIGHT))
+                i += 1
+        return matches
+
+    def search_careers_by_text(self, query, top_k=5):
+        """
+        BM25 keyword search over career names, categories, descriptions,
+        education paths, guidance and job locations.
+        Returns career dicts with a relevance_score, best match first.
+        """
+        scores = np.zeros(len(self.careers_db), dtype=np.float64)
+        for term in dict.fromkeys(tokenize(query)):
+            # A query term counts once per career, via its best-matching index term
+            term_scores = np.zeros_like(scores)
+            for indexed, weight in self._expand_term(term):
+                docs, contrib = self._postings[indexed]
+                term_scores[docs] = np.maximum(term_scores[docs], contrib * weight)
+            scores += term_scores
+
+        results = []
+        for idx in self._top_k_indices(scores, top_k):
+            if scores[idx] <= 0:
+                break
+            result = dict(self._career_payloads[idx])
+            result['relevance_score'] = round(float(scores[idx]), 4)
+            results.append(result)
+        return results
+
     def get_career_recommendations(self, user_profile, top_k=3):
         """
         Get career recommendations using fast rule-based matching
         Returns same format as RAG for compatibility
         """
         logger.debug(f"Generating recommendations for profile: {user_profile}")
-        
-        # Convert profiles to scores
-        emotional_scores = self._convert_profile_to_scores(user_profile.get('emotional_profile', {}))
-        reasoning_scores = self._convert_profile_to_scores(user_profile.get('reasoning_profile', {}))
-        academic_scores = self._convert_profile_to_scores(user_profile.get('academic_profile', {}))
-        
-        # Score each career
-        career_scores = []
-        for career in self.careers_db:
-            score = self._calculate_match_score(
-                career,
-                emotional_scores,
-                reasoning_scores,
-                academic_scores
-            )
-            career_scores.append((career, score))
-        
-        # Sort by score descending
-        career_scores.sort(key=lambda x: x[1], reverse=True)
-        
-        # Return top K
+
+        vector, academic_mean = self._profile_vector(user_profile)
+        # Integer trait terms are exact in float64; the `any` term is added last
+        scores = self._weights @ vector + self._any_weights * academic_mean
+
         recommendations = []
-        for career, score in career_scores[:top_k]:
-            recommendations.append({
-                'career_name': career['name'],
-                'category': career['category'],
-                'description': career['description'],
-                'education_path': career['education_path'],
-                'salary_range': career['salary_range'],
-                'student_guidance': career['student_guidance'],
-                'job_locations': career['job_locations'],
-                'match_score': int(score * 100 / 30)  # Normalize to 0-100
-            })
-        
-        logger.info(f"Top recommendation: {recommendations[0]['career_name']} ({recommendations[0]['match_score']}%)")
+        for idx in self._top_k_indices(scores, top_k):
+            recommendation = dict(self._career_payloads[idx])
+            recommendation['match_score'] = int(scores[idx] * 100 / MATCH_SCORE_SCALE)  # Normalize to 0-100
+            recommendations.append(recommendation)
+
+        if recommendations:
+            logger.info(f"Top recommendation: {recommendations[0]['career_name']} ({recommendations[0]['match_score']}%)")
         return recommendations
-    
+
+    def get_career_recommendations_batch(self, user_profiles, top_k=3):
+        """
+        Recommendations for many profiles at once: one profiles x careers
+        matrix product instead of a scoring pass per profile.
+        Returns a list (one per profile) in get_career_recommendations format.
+        """
+        if not user_profiles:
+            return []
+
+        vectors, academic_means = zip(*(self._profile_vector(p) for p in user_profiles))
+        profile_matrix = np.vstack(vectors)
+        scores = profile_matrix @ self._weights.T + np.outer(academic_means, self._any_weights)
+
+        # Stable sort per row so ties keep database order, as in the single call
+        top_k = min(top_k, scores.shape[1])
+        top = np.argsort(-scores, axis=1, kind='stable')[:, :max(top_k, 0)]
+        match_scores = (np.take_along_axis(scores, top, axis=1) * 100 / MATCH_SCORE_SCALE).astype(int)
+
+        batch = []
+        for indices, row_scores in zip(top.tolist(), match_scores.tolist()):
+            recommendations = []
+            for idx, match_score in zip(indices, row_scores):
+                recommendation = dict(self._career_payloads[idx])
+                recommendation['match_score'] = match_score
+                recommendations.append(recommendation)
+            batch.append(recommendations)
+
+        logger.info(f"Scored {len(batch)} profiles against {len(self.careers_db)} careers")
+        return batch
+
+    # Reference (per-career dict walk) scoring, kept for parity tests/benchmarks
+
     def _convert_profile_to_scores(self, profile_dict):
         """Convert high/medium/low to numeric scores"""
         scores = {}
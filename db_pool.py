@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Pragmas applied to every pooled connection. WAL lets readers run alongside
+# a writer; NORMAL sync is durable across app crashes in WAL mode.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,        # negative = KiB, so ~16 MB page cache
+    "mmap_size": 134217728,      # 128 MB memory-mapped I/O
+    "temp_store": "MEMORY",
+}
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up in time"""
+
+
+class ConnectionPool:
+    """Bounded per-process pool of SQLite connections, one per thread"""
+
+    def __init__(self, db_file, max_connections=8, busy_timeout_ms=5000,
+                 acquire_timeout=30.0, pragmas=None):
+        self.db_file = db_file
+        self.max_connections = max_connections
+        self.busy_timeout_ms = busy_timeout_ms
+        self.acquire_timeout = acquire_timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self._reset()
+
+    def _reset(self):
+        """(Re)create pool state - also used after a fork"""
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._idle = []
+        self._local = threading.local()
+
+    def _check_fork(self):
+        # gunicorn --preload forks workers after import; never share
+        # connections opened in the parent across processes.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise PoolTimeout(
+                f"No database connection available after {self.acquire_timeout}s"
+            )
+        try:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop()
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, conn):
+        try:
+            # Anything left uncommitted (early returns, exceptions) is rolled
+            # back so the connection never carries a lock back into the pool.
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding broken database connection: {e}")
+            conn.close()
+            conn = None
+        if conn is not None:
+            with self._lock:
+                self._idle.append(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Lend a connection to the calling thread; always returned to the pool"""
+        self._check_fork()
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            # Nested use inside the same thread shares the outer connection
+            yield held
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    def close_all(self):
+        """Close every idle connection (e.g. on shutdown or in tests)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
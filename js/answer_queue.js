@@ -0,0 +1,61 @@
+// ============================================================================
+// ANSWER BATCHING
+// Shared by the three game pages (game.js, game2.js, game3.js)
+// ============================================================================
+
+// Answers are buffered locally and sent in one request when the game ends.
+// getSessionId is called at send time, since a page may only learn its
+// session id after loading.
+function createAnswerQueue(gameType, getSessionId) {
+  let pendingAnswers = [];
+
+  function payload() {
+    return JSON.stringify({
+      sessionId: getSessionId(),
+      gameType: gameType,
+      answers: pendingAnswers,
+    });
+  }
+
+  function queue(question, originalIndex, selectedOption) {
+    pendingAnswers.push({
+      questionId: question.id,
+      questionText: question.question,
+      selectedOption: originalIndex,
+      optionText: selectedOption.text || selectedOption,
+      optionEffects: selectedOption.effects || {},
+    });
+  }
+
+  // Flush buffered answers; safe to retry since the server ignores duplicates
+  async function flush() {
+    if (pendingAnswers.length === 0) return;
+    const body = payload();
+    const batch = pendingAnswers;
+    pendingAnswers = [];
+    try {
+      const response = await fetch("/api/answer/submit-batch", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: body,
+        keepalive: true,
+      });
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    } catch (error) {
+      console.error("Failed to save answers:", error);
+      // Keep them for the next flush (or the pagehide beacon)
+      pendingAnswers = batch.concat(pendingAnswers);
+    }
+  }
+
+  // Don't lose answers if the tab is closed mid-game
+  window.addEventListener("pagehide", () => {
+    if (pendingAnswers.length === 0) return;
+    const blob = new Blob([payload()], { type: "application/json" });
+    if (navigator.sendBeacon("/api/answer/submit-batch", blob)) {
+      pendingAnswers = [];
+    }
+  });
+
+  return { queue, flush };
+}
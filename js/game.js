@@ -56,7 +56,9 @@ function toggleMusic() {
 // Fetch emotional questions from Flask API
 async function loadQuestions() {
   try {
-    const response = await fetch("/api/questions/emotional?count=10");
+    const response = await fetch(
+      `/api/questions/emotional?count=10&session_id=${sessionId}`,
+    );
     const data = await response.json();
     questions = data.questions;
     console.log(
@@ -77,6 +79,13 @@ async function loadQuestions() {
   }
 }
 
+// ============================================================================
+// ANSWER BATCHING
+// ============================================================================
+
+// Answers are buffered and sent in one batch at game end (js/answer_queue.js)
+const answerQueue = createAnswerQueue("emotional", () => sessionId);
+
 // ============================================================================
 // INITIALIZATION
 // ============================================================================
@@ -1288,24 +1297,8 @@ window.selectAnswer = async function (index) {
     console.log("📊 Answer effects:", selectedOption.effects);
   }
 
-  // Save answer to Flask API
-  try {
-    await fetch("/api/answer/submit", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({
-        sessionId: sessionId,
-        gameType: "emotional",
-        questionId: currentQuestion.id,
-        questionText: currentQuestion.question,
-        selectedOption: originalIndex,
-        optionText: selectedOption.text || selectedOption,
-        optionEffects: selectedOption.effects || {},
-      }),
-    });
-  } catch (error) {
-    console.error("Failed to save answer:", error);
-  }
+  // Buffer the answer; flushed to the Flask API in one batch at game end
+  answerQueue.queue(currentQuestion, originalIndex, selectedOption);
 
   setTimeout(() => {
     document.getElementById("questionPopup").style.display = "none";
@@ -1648,6 +1641,7 @@ function createSplash(position) {
 
 function endGame(victory) {
   gameState = "ended";
+  answerQueue.flush();
 
   const gameOver = document.getElementById("gameOver");
   const title = document.getElementById("gameOverTitle");
@@ -83,6 +83,13 @@ async function loadQuestions() {
   }
 }
 
+// ============================================================================
+// ANSWER BATCHING
+// ============================================================================
+
+// Answers are buffered and sent in one batch at game end (js/answer_queue.js)
+const answerQueue = createAnswerQueue("reasoning", () => sessionId);
+
 // ============================================================================
 // INITIALIZATION
 // ============================================================================
@@ -1506,24 +1513,8 @@ async function selectAnswer(index) {
     health -= 10;
   }
 
-  // Save answer to Flask API
-  try {
-    await fetch("/api/answer/submit", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({
-        sessionId: sessionId,
-        gameType: "reasoning",
-        questionId: currentQuestion.id,
-        questionText: currentQuestion.question,
-        selectedOption: originalIndex,
-        optionText: selectedOption.text || selectedOption,
-        optionEffects: selectedOption.effects || {},
-      }),
-    });
-  } catch (error) {
-    console.error("Failed to save answer:", error);
-  }
+  // Buffer the answer; flushed to the Flask API in one batch at game end
+  answerQueue.queue(currentQuestion, originalIndex, selectedOption);
 
   document.getElementById("questionPopup").classList.remove("active");
   questionActive = false;
@@ -1537,6 +1528,7 @@ async function selectAnswer(index) {
 
 function gameOver(won) {
   gameState = "gameover";
+  answerQueue.flush();
 
   const gameOverEl = document.getElementById("gameOver");
   const titleEl = document.getElementById("gameOverTitle");
@@ -82,6 +82,13 @@ async function loadQuestions() {
   }
 }
 
+// ============================================================================
+// ANSWER BATCHING
+// ============================================================================
+
+// Answers are buffered and sent in one batch at game end (js/answer_queue.js)
+const answerQueue = createAnswerQueue("academic", () => sessionId);
+
 // ============================================================================
 // INITIALIZATION
 // ============================================================================
@@ -1414,24 +1421,8 @@ async function selectAnswer(index) {
     health -= 10;
   }
 
-  // Save answer to Flask API
-  try {
-    await fetch("/api/answer/submit", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({
-        sessionId: sessionId,
-        gameType: "academic",
-        questionId: currentQuestion.id,
-        questionText: currentQuestion.question,
-        selectedOption: originalIndex,
-        optionText: selectedOption.text || selectedOption,
-        optionEffects: selectedOption.effects || {},
-      }),
-    });
-  } catch (error) {
-    console.error("Failed to save answer:", error);
-  }
+  // Buffer the answer; flushed to the Flask API in one batch at game end
+  answerQueue.queue(currentQuestion, originalIndex, selectedOption);
 
   document.getElementById("questionPopup").classList.remove("active");
   questionActive = false;
@@ -1458,9 +1449,10 @@ function gameOver(won) {
     const btnRestart = document.querySelector(".btn-restart");
     if (btnRestart) btnRestart.textContent = "✓ ALL MISSIONS COMPLETE";
 
-    // Fetch career recommendation
-    fetchCareerRecommendation();
+    // Save buffered answers first so the recommendation sees all of them
+    answerQueue.flush().then(fetchCareerRecommendation);
   } else {
+    answerQueue.flush();
     titleEl.textContent = "MISSION FAILED";
     textEl.textContent = "Your tank was destroyed. Try again!";
     gameOverEl.classList.add("defeat");
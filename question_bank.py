@@ -0,0 +1,321 @@
+"""
+Pre-indexed question bank for the three games.
+
+Questions are indexed once by level (game type), difficulty and every tag
+rated "high" in their `tags`/`eq` field. Each question is serialized once,
+so a response is a join of cached JSON fragments. Sampling cost depends on
+the number of questions asked for, not on the size of the bank.
+
+`python question_bank.py build` compiles the datasets into one binary file
+(fragment blob + offset tables + position pools). The server mmaps it, so
+workers share the pages through the OS cache, nothing goes through
+json.load at startup, and only served questions are ever touched.
+
+Usage:
+    python question_bank.py build   # compile data/generated/*.json -> question_bank.qbk
+    python question_bank.py info    # summarize the compiled bank
+"""
+
+import os
+import sys
+import json
+import mmap
+import random
+import struct
+import logging
+import argparse
+from array import array
+
+logger = logging.getLogger(__name__)
+
+QUESTION_FILES = {
+    'emotional': 'tiny_transformer_lm/tiny_transformer_lm/data/generated/emotional_dataset.json',
+    'reasoning': 'tiny_transformer_lm/tiny_transformer_lm/data/generated/reasoning_dataset.json',
+    'academic': 'tiny_transformer_lm/tiny_transformer_lm/data/generated/academic_dataset.json',
+}
+COMPILED_FILE = 'tiny_transformer_lm/tiny_transformer_lm/data/generated/question_bank.qbk'
+
+# Compiled layout: MAGIC, u32 header length, JSON header, then 8-byte aligned
+# sections per level: u32 fragment offsets (count + 1), i32 ids, u32 pools,
+# and the UTF-8 fragment blob. Header offsets are absolute file positions.
+MAGIC = b'CSQBANK1'
+_HEADER_LEN = struct.Struct('<I')
+
+# Tag rating that puts a question in that tag's pool
+INDEXED_TAG_LEVEL = 'high'
+
+# Share of draws taken from the requested tag pools (the rest are uniform)
+DEFAULT_TAG_WEIGHT = 0.75
+
+# Rejection-sampling budget per requested question before falling back
+MAX_DRAWS_PER_QUESTION = 16
+
+
+def question_tags(question):
+    """Trait ratings of a question: `eq` for emotional, `tags` for the others"""
+    return question.get('tags') or question.get('eq') or {}
+
+
+def serialize_question(question):
+    """Response fragment for one question (same key order/escaping as jsonify)"""
+    return json.dumps(question, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def index_pools(questions):
+    """{(difficulty, tag): [positions]}; None is the "any" bucket for both"""
+    pools = {}
+    for pos, question in enumerate(questions):
+        high_tags = [tag for tag, rating in question_tags(question).items()
+                     if rating == INDEXED_TAG_LEVEL]
+        for difficulty in (None, question.get('difficulty')):
+            pools.setdefault((difficulty, None), []).append(pos)
+            for tag in high_tags:
+                pools.setdefault((difficulty, tag), []).append(pos)
+    return pools
+
+
+def load_datasets(paths=None):
+    """{level: [question dict]} from the generated JSON datasets"""
+    questions_by_level = {}
+    for level, path in (paths or QUESTION_FILES).items():
+        with open(path, 'r') as f:
+            questions_by_level[level] = json.load(f)
+    return questions_by_level
+
+
+def _source_stamps(paths):
+    """Size/mtime of each dataset, recorded at build time to detect stale banks"""
+    stamps = {}
+    for level, path in paths.items():
+        st = os.stat(path)
+        stamps[level] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    return stamps
+
+
+def compile_bank(questions_by_level, out_path, sources=None):
+    """Write the compiled bank file; returns its size in bytes"""
+    header = {'byteorder': sys.byteorder, 'sources': sources or {}, 'levels': {}}
+    sections = []  # (level, kind, payload bytes, extra)
+    for level, questions in questions_by_level.items():
+        fragments = [serialize_question(q) for q in questions]
+        offsets = array('I', [0])
+        for fragment in fragments:
+            offsets.append(offsets[-1] + len(fragment))
+        sections.append((level, 'offsets', offsets.tobytes(), None))
+        sections.append((level, 'ids', array('i', [q['id'] for q in questions]).tobytes(), None))
+        for key, positions in index_pools(questions).items():
+            sections.append((level, 'pool', array('I', positions).tobytes(), key))
+        sections.append((level, 'fragments', b''.join(fragments), None))
+        header['levels'][level] = {'count': len(questions), 'pools': []}
+
+    def align(n):
+        return (n + 7) & ~7
+
+    # Header size depends on the offsets inside it: lay out until stable
+    data_start = 0
+    while True:
+        pos = data_start
+        for level, kind, payload, key in sections:
+            entry = header['levels'][level]
+            if kind == 'pool':
+                entry['pools'].append([key[0], key[1], pos, len(payload) // 4])
+            else:
+                entry[kind] = pos
+            pos = align(pos + len(payload))
+        header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+        needed = align(len(MAGIC) + _HEADER_LEN.size + len(header_bytes))
+        if needed == data_start:
+            break
+        data_start = needed
+        for entry in header['levels'].values():
+            entry['pools'] = []
+
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + _HEADER_LEN.pack(len(header_bytes)) + header_bytes)
+        for _, _, payload, _ in sections:
+            f.write(b'\0' * (align(f.tell()) - f.tell()))
+            f.write(payload)
+        size = f.tell()
+    os.replace(tmp_path, out_path)
+    return size
+
+
+class _FragmentView:
+    """Sequence of question fragments sliced out of the mapped blob"""
+
+    def __init__(self, buf, offsets, start):
+        self._buf = buf
+        self._offsets = offsets
+        self._start = start
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, pos):
+        return self._buf[self._start + self._offsets[pos]:self._start + self._offsets[pos + 1]]
+
+
+class QuestionBank:
+    """Questions per level with (difficulty, tag) -> position pools"""
+
+    def __init__(self, questions_by_level):
+        """In-memory bank from {level: [question dict, ...]}"""
+        self._fragments = {}
+        self._ids = {}
+        self._pools = {}
+        for level, questions in questions_by_level.items():
+            self._fragments[level] = [serialize_question(q) for q in questions]
+            self._ids[level] = [q['id'] for q in questions]
+            self._pools[level] = index_pools(questions)
+
+    @classmethod
+    def from_files(cls, paths=None):
+        """Parse the generated JSON datasets ({level: json path})"""
+        return cls(load_datasets(paths))
+
+    @classmethod
+    def open_compiled(cls, path=COMPILED_FILE):
+        """
+        Memory-map a compiled bank. Pools, ids and offsets are zero-copy
+        views; a question's bytes are only read when it is served.
+        """
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a compiled question bank")
+        header_start = len(MAGIC) + _HEADER_LEN.size
+        (header_len,) = _HEADER_LEN.unpack_from(mm, len(MAGIC))
+        header = json.loads(mm[header_start:header_start + header_len])
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was built on a {header['byteorder']}-endian machine")
+
+        view = memoryview(mm)
+
+        def table(offset, count, typecode):
+            return view[offset:offset + 4 * count].cast(typecode)
+
+        bank = cls.__new__(cls)
+        bank._mmap = mm
+        bank.header = header
+        bank._fragments = {}
+        bank._ids = {}
+        bank._pools = {}
+        for level, entry in header['levels'].items():
+            count = entry['count']
+            bank._fragments[level] = _FragmentView(mm, table(entry['offsets'], count + 1, 'I'),
+                                                   entry['fragments'])
+            bank._ids[level] = table(entry['ids'], count, 'i')
+            bank._pools[level] = {
+                (difficulty, tag): table(offset, n, 'I')
+                for difficulty, tag, offset, n in entry['pools']
+            }
+        return bank
+
+    def __contains__(self, level):
+        return level in self._fragments
+
+    def size(self, level):
+        return len(self._fragments[level])
+
+    def difficulties(self, level):
+        return sorted(d for d, tag in self._pools[level] if d is not None and tag is None)
+
+    def tags(self, level):
+        return sorted({tag for _, tag in self._pools[level] if tag is not None})
+
+    def pool(self, level, difficulty=None, tag=None):
+        """Positions of the questions matching difficulty/tag (None = any)"""
+        return self._pools[level].get((difficulty, tag), [])
+
+    def sample(self, level, count, difficulty=None, tags=(), tag_weight=DEFAULT_TAG_WEIGHT,
+               exclude=None, rng=random):
+        """
+        Up to `count` distinct question positions of `level`, optionally
+        restricted to a difficulty. With `tags`, a `tag_weight` share of the
+        draws comes from questions rated high on one of those tags.
+        `exclude(pos)` rejects positions (e.g. questions already served);
+        fewer than `count` come back if too few questions are left.
+        """
+        base = self.pool(level, difficulty)
+        count = min(count, len(base))
+        if count <= 0:
+            return []
+
+        tagged = [p for p in (self.pool(level, difficulty, tag) for tag in tags) if p]
+        if not tagged and exclude is None:
+            return rng.sample(base, count)
+
+        chosen = []
+        seen = set()
+        for _ in range(count * MAX_DRAWS_PER_QUESTION):
+            pool = tagged[rng.randrange(len(tagged))] if tagged and rng.random() < tag_weight else base
+            pos = pool[rng.randrange(len(pool))]
+            if pos not in seen:
+                seen.add(pos)
+                if exclude is not None and exclude(pos):
+                    continue
+                chosen.append(pos)
+                if len(chosen) == count:
+                    return chosen
+
+        # Most of the pool is taken or excluded: top up from what is left
+        rest = [pos for pos in base if pos not in seen and (exclude is None or not exclude(pos))]
+        return chosen + rng.sample(rest, min(len(rest), count - len(chosen)))
+
+    def question_id(self, level, pos):
+        return self._ids[level][pos]
+
+    def question(self, level, pos):
+        """Decoded question dict"""
+        return json.loads(self._fragments[level][pos])
+
+    def questions_json(self, level, positions, extra=()):
+        """
+        `{"questions": [...]}` response body (bytes) from the cached fragments,
+        after any `extra` serialized questions (e.g. generated ones)
+        """
+        fragments = self._fragments[level]
+        return b'{"questions":[' + b','.join([*extra, *(fragments[pos] for pos in positions)]) + b']}'
+
+
+def load_question_bank(compiled_path=COMPILED_FILE, paths=None):
+    """
+    The server's bank: the compiled file when it is up to date with the
+    datasets, otherwise (with a warning) the JSON datasets parsed in memory.
+    """
+    paths = paths or QUESTION_FILES
+    if os.path.exists(compiled_path):
+        try:
+            bank = QuestionBank.open_compiled(compiled_path)
+            if bank.header['sources'] == _source_stamps(paths):
+                logger.info(f"Question bank memory-mapped from {compiled_path}")
+                return bank
+            logger.warning(f"{compiled_path} is older than the datasets; run: python question_bank.py build")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not open compiled question bank: {e}")
+    else:
+        logger.warning(f"No compiled question bank; run: python question_bank.py build")
+    return QuestionBank.from_files(paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile or inspect the question bank")
+    parser.add_argument('command', choices=['build', 'info'])
+    parser.add_argument('--out', default=COMPILED_FILE)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        size = compile_bank(load_datasets(), args.out, sources=_source_stamps(QUESTION_FILES))
+        print(f"✅ Compiled question bank: {args.out} ({size / 1024:.0f} KB)")
+        return 0
+
+    bank = QuestionBank.open_compiled(args.out)
+    for level in bank.header['levels']:
+        print(f"{level:<10} {bank.size(level):>5} questions | difficulties: {bank.difficulties(level)} "
+              f"| high tags: {bank.tags(level)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
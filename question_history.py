@@ -0,0 +1,84 @@
+"""
+Per-session record of the questions already served, so a reloaded game
+never repeats a question.
+
+Stored as one bitmap per (session, game type) in SQLite: bit N is set once
+question id N has been served. A 2,000-question bank costs 250 bytes per
+session and game, and every worker process sees the same history.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS session_served_questions (
+        session_id INTEGER NOT NULL,
+        game_type TEXT NOT NULL,
+        served BLOB NOT NULL,
+        PRIMARY KEY (session_id, game_type),
+        FOREIGN KEY (session_id) REFERENCES user_sessions(session_id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO session_served_questions (session_id, game_type, served)
+    VALUES (?, ?, ?)
+    ON CONFLICT(session_id, game_type) DO UPDATE SET served = excluded.served
+"""
+
+
+def has_bit(bitmap, n):
+    byte = n >> 3
+    return byte < len(bitmap) and bool(bitmap[byte] & (1 << (n & 7)))
+
+
+def set_bit(bitmap, n):
+    """Set bit n, growing the bytearray as needed"""
+    byte = n >> 3
+    if byte >= len(bitmap):
+        bitmap.extend(bytes(byte + 1 - len(bitmap)))
+    bitmap[byte] |= 1 << (n & 7)
+
+
+def load_served(conn, session_id, game_type):
+    """Bitmap of question ids already served to this session for this game"""
+    row = conn.execute(
+        "SELECT served FROM session_served_questions WHERE session_id = ? AND game_type = ?",
+        (session_id, game_type)
+    ).fetchone()
+    return bytearray(row[0]) if row else bytearray()
+
+
+def save_served(conn, session_id, game_type, bitmap):
+    """Store the bitmap; the caller commits"""
+    conn.execute(_UPSERT_SQL, (session_id, game_type, bytes(bitmap)))
+
+
+def sample_unseen(conn, bank, session_id, game_type, count, **sample_kwargs):
+    """
+    Sample `count` questions this session has not been served yet and mark
+    them served, atomically. Once every matching question has been served
+    the history for that game starts over. Returns bank positions; the
+    caller commits.
+    """
+    # Take the write lock first so concurrent loads can't both pick the same ids
+    conn.execute("BEGIN IMMEDIATE")
+    served = load_served(conn, session_id, game_type)
+
+    def seen(pos):
+        return has_bit(served, bank.question_id(game_type, pos))
+
+    positions = bank.sample(game_type, count, exclude=seen, **sample_kwargs)
+    if len(positions) < count and served:
+        # Every matching question has been served: start a new cycle and
+        # top up with questions not already in this response
+        logger.info(f"Session {session_id} has seen every {game_type} question; starting over")
+        served = bytearray()
+        chosen = set(positions)
+        positions += bank.sample(game_type, count - len(positions), exclude=chosen.__contains__, **sample_kwargs)
+
+    for pos in positions:
+        set_bit(served, bank.question_id(game_type, pos))
+    save_served(conn, session_id, game_type, served)
+    return positions
@@ -0,0 +1,283 @@
+"""
+Background pool of model-generated questions for /api/questions.
+
+A worker thread runs the tiny structured LM (tiny_transformer_lm) in
+batches, parses every block with parse_block, keeps the ones that pass
+validation and pushes them into a bounded buffer per level as ready-made
+JSON fragments. A request only pops fragments, so model latency is never
+on the request path; when a level's buffer runs dry the caller serves the
+static question bank instead.
+
+Optional: enabled with QUESTION_POOL_CHECKPOINT=<structured checkpoint>.
+Generation needs torch and tokenizers, which are not in requirements.txt.
+"""
+
+import os
+import re
+import sys
+import time
+import zlib
+import logging
+import threading
+from collections import deque
+
+from question_bank import serialize_question
+
+LM_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tiny_transformer_lm', 'tiny_transformer_lm')
+sys.path.append(LM_ROOT)
+
+from inference.structured_blocks import block_prompt, parse_block  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER_FILE = os.path.join(LM_ROOT, 'tokenizer', 'tokenizer.json')
+
+# Fresh questions kept ready per level
+POOL_CAPACITY = 256
+
+# Prompts decoded together per generation batch
+GENERATION_BATCH = 32
+MAX_NEW_TOKENS = 96            # constrained blocks end within 85 tokens (segment caps)
+
+# Torch intra-op threads (process-wide; only the generator uses torch), so
+# generation doesn't starve the request threads
+GENERATOR_THREADS = 1
+
+# Generated questions get ids above every static id (crc32 of the question),
+# so retried answers still dedupe and nothing collides with the bank
+GENERATED_ID_BASE = 1_000_000_000
+
+NUM_OPTIONS = 4
+MIN_QUESTION_WORDS = 4
+
+# Longest pause after failed batches, or batches in which no block passed validation
+MAX_BACKOFF_SECONDS = 30
+
+# Generated questions remembered for de-duplication before the set is reset
+MAX_RECENT_QUESTIONS = 20_000
+
+
+def tidy_text(text):
+    """Undo the tokenizer's spacing around punctuation ("real - life ?" -> "real-life?")"""
+    text = re.sub(r"\s+([?.,!;:])", r"\1", " ".join(text.split()))
+    return re.sub(r"\s*([-'/])\s*", r"\1", text)
+
+
+class BlockValidator:
+    """
+    Turns a decoded block into a question dict, or None when the block is
+    unusable: a question of a few words with a "?", not already in the
+    static bank or generated before, and exactly the level's known options
+    (which carry the trait effects scoring needs).
+    """
+
+    def __init__(self, bank, tokenizer, levels):
+        self._tokenizer = tokenizer
+        self._options = {}
+        self._known_questions = {}
+        self._recent = set()
+        for level in levels:
+            options = {}
+            questions = set()
+            for pos in range(bank.size(level)):
+                question = bank.question(level, pos)
+                questions.add(self.key(question['question']))
+                for option in question['options']:
+                    options.setdefault(self.key(option['text']), option)
+            self._options[level] = options
+            self._known_questions[level] = questions
+
+    def key(self, text):
+        """Text as it comes back from the model (encode/decode round trip)"""
+        return self._tokenizer.decode(self._tokenizer.encode(text).ids)
+
+    def validate(self, level, text):
+        question_text, option_texts = parse_block(text)
+        question_key = " ".join(question_text.split())
+        if len(question_key.split()) < MIN_QUESTION_WORDS or "?" not in question_key:
+            return None
+        if question_key in self._known_questions[level] or question_key in self._recent:
+            return None
+
+        known = self._options[level]
+        options = [known.get(" ".join(option.split())) for option in option_texts]
+        if len(options) != NUM_OPTIONS or None in options:
+            return None
+        if len({option['text'] for option in options}) != NUM_OPTIONS:
+            return None
+
+        if len(self._recent) >= MAX_RECENT_QUESTIONS:
+            self._recent.clear()
+        self._recent.add(question_key)
+        return {
+            'id': GENERATED_ID_BASE + zlib.crc32(f"{level}:{question_key}".encode('utf-8')),
+            'level': level,
+            'question': tidy_text(question_text),
+            'options': options,
+            'generated': True,
+        }
+
+
+class QuestionPool:
+    """Bounded FIFO buffers of serialized questions, one per level"""
+
+    def __init__(self, levels, capacity=POOL_CAPACITY):
+        self.capacity = capacity
+        self._buffers = {level: deque(maxlen=capacity) for level in levels}
+        self._space = threading.Condition()
+
+    @property
+    def levels(self):
+        return list(self._buffers)
+
+    def take(self, level, count):
+        """Up to `count` question fragments of `level`; never waits"""
+        buffer = self._buffers.get(level)
+        taken = []
+        while buffer and len(taken) < count:
+            try:
+                taken.append(buffer.popleft())
+            except IndexError:  # emptied by another request thread
+                break
+        if taken:
+            with self._space:
+                self._space.notify_all()
+        return taken
+
+    def put(self, level, question):
+        """Queue a validated question dict; False when the level is full"""
+        buffer = self._buffers[level]
+        if len(buffer) >= self.capacity:
+            return False
+        buffer.append(serialize_question(question))
+        return True
+
+    def missing(self, level):
+        return self.capacity - len(self._buffers[level])
+
+    def next_level(self, after=None):
+        """
+        Next level with free slots, round-robin from `after`, or None when
+        every buffer is full (a level the model can't fill doesn't starve the rest)
+        """
+        levels = self.levels
+        start = levels.index(after) + 1 if after in self._buffers else 0
+        for level in levels[start:] + levels[:start]:
+            if self.missing(level) > 0:
+                return level
+        return None
+
+    def wait_for_space(self, timeout=None):
+        with self._space:
+            return self._space.wait_for(lambda: self.next_level() is not None, timeout)
+
+    def stats(self):
+        return {level: len(buffer) for level, buffer in self._buffers.items()}
+
+
+class QuestionGenerator:
+    """Worker thread that keeps a QuestionPool topped up from the model"""
+
+    def __init__(self, pool, bank, checkpoint_path, tokenizer_path=TOKENIZER_FILE,
+                 batch_size=GENERATION_BATCH, num_threads=GENERATOR_THREADS):
+        self.pool = pool
+        self._bank = bank
+        self._checkpoint_path = checkpoint_path
+        self._tokenizer_path = tokenizer_path
+        self._batch_size = batch_size
+        self._num_threads = num_threads
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+
+    def start(self):
+        """
+        Start the worker in this process; later calls are no-ops. Called
+        lazily from the request path, so under gunicorn --preload the master
+        never loads torch or fills buffers, and each forked worker starts
+        its own thread with its own (empty) buffers.
+        """
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='question-generator', daemon=True)
+            self._thread.start()
+
+    def _load(self):
+        import torch
+        from tokenizers import Tokenizer
+        from model.tiny_transformer import TinyTransformerLM
+
+        torch.set_num_threads(self._num_threads)
+        self._tokenizer = Tokenizer.from_file(self._tokenizer_path)
+        self._model = TinyTransformerLM.from_checkpoint(self._checkpoint_path, map_location='cpu')
+        if not self._model.causal:
+            # Legacy checkpoints (no saved config) load bidirectional; KV-cached generation refuses them
+            raise ValueError(f"{self._checkpoint_path} is a bidirectional (causal=False) checkpoint; "
+                             "retrain it with CAUSAL = True (training/train_structured.py)")
+        self._model.eval()
+        self._validator = BlockValidator(self._bank, self._tokenizer, self.pool.levels)
+
+    def _run(self):
+        try:
+            self._load()
+        except Exception as e:
+            logger.error(f"Question generator disabled: {e}")
+            return
+        logger.info(f"Question generator running ({self._checkpoint_path})")
+        level = None
+        empty_rounds = failures = 0
+        while True:
+            level = self.pool.next_level(after=level)
+            if level is None:
+                self.pool.wait_for_space()
+                continue
+            try:
+                kept = self.fill(level, min(self._batch_size, self.pool.missing(level)))
+            except Exception:
+                # Keep the worker alive through transient errors, retrying with backoff
+                delay = min(2 ** failures, MAX_BACKOFF_SECONDS)
+                failures += 1
+                logger.exception(f"Question generation failed; retrying in {delay}s")
+                time.sleep(delay)
+                continue
+            failures = 0
+            # A model that keeps writing invalid blocks for every level
+            # shouldn't spin a CPU core: back off exponentially
+            empty_rounds = 0 if kept else empty_rounds + 1
+            if empty_rounds >= len(self.pool.levels):
+                time.sleep(min(2 ** (empty_rounds - len(self.pool.levels)), MAX_BACKOFF_SECONDS))
+
+    def fill(self, level, count):
+        """Generate `count` blocks for `level` in one batch; returns how many were kept"""
+        from inference.batch_generate import generate_batch
+
+        blocks = generate_batch(self._model, self._tokenizer, [block_prompt(level)] * count,
+                                max_new_tokens=MAX_NEW_TOKENS, constrained=True)
+        kept = 0
+        for block in blocks:
+            question = self._validator.validate(level, block)
+            if question is not None and self.pool.put(level, question):
+                kept += 1
+        self.accepted += kept
+        self.rejected += count - kept
+        return kept
+
+
+def create_question_generator(bank, levels, checkpoint_path=None):
+    """
+    The server's generator, not yet started (see QuestionGenerator.start),
+    or None when QUESTION_POOL_CHECKPOINT is unset or the checkpoint is
+    missing. Loading happens on the worker thread.
+    """
+    checkpoint_path = checkpoint_path or os.environ.get('QUESTION_POOL_CHECKPOINT')
+    if not checkpoint_path:
+        return None
+    if not os.path.exists(checkpoint_path):
+        logger.warning(f"QUESTION_POOL_CHECKPOINT not found: {checkpoint_path}; serving static questions only")
+        return None
+    capacity = int(os.environ.get('QUESTION_POOL_SIZE', POOL_CAPACITY))
+    return QuestionGenerator(QuestionPool(levels, capacity), bank, checkpoint_path)
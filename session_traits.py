@@ -0,0 +1,232 @@
+"""
+Per-session running trait totals.
+
+Every answer insert adds its option effects to one `session_trait_totals`
+row in the same transaction, so a recommendation is a single primary-key
+read instead of re-parsing every answer.
+
+Usage:
+    python session_traits.py rebuild   # backfill / recompute from game_answers
+    python session_traits.py check     # compare stored totals with a full recompute
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Traits tracked per game type (same keys the recommendation engine reads)
+TRAIT_KEYS = {
+    'emotional': ("stress", "confidence", "empathy", "risk", "curiosity"),
+    'reasoning': ("logic", "analysis", "decision", "risk_reasoning",
+                  "constraint", "prediction", "efficiency", "abstraction"),
+    'academic': ("physics", "chemistry", "biology", "mathematics",
+                 "computer_science", "electronics", "environment",
+                 "exam_focus", "career_awareness"),
+}
+
+# Column per (game type, trait), e.g. emotional_stress
+TRAIT_COLUMNS = [f"{game}_{trait}" for game, traits in TRAIT_KEYS.items() for trait in traits]
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS session_trait_totals (
+        session_id INTEGER PRIMARY KEY,
+        answer_count INTEGER NOT NULL DEFAULT 0,
+        {columns},
+        FOREIGN KEY (session_id) REFERENCES user_sessions(session_id) ON DELETE CASCADE
+    )
+""".format(columns=",\n        ".join(f"{col} INTEGER NOT NULL DEFAULT 0" for col in TRAIT_COLUMNS))
+
+_UPSERT_SQL = """
+    INSERT INTO session_trait_totals (session_id, answer_count, {columns})
+    VALUES (?, ?, {placeholders})
+    ON CONFLICT(session_id) DO UPDATE SET
+        answer_count = answer_count + excluded.answer_count,
+        {updates}
+""".format(
+    columns=", ".join(TRAIT_COLUMNS),
+    placeholders=", ".join("?" for _ in TRAIT_COLUMNS),
+    updates=",\n        ".join(f"{col} = {col} + excluded.{col}" for col in TRAIT_COLUMNS)
+)
+
+_INSERT_ANSWER_SQL = """
+    INSERT OR IGNORE INTO game_answers
+    (session_id, game_type, question_id, question_text, selected_option, option_text, option_effects)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _empty_totals():
+    return dict.fromkeys(TRAIT_COLUMNS, 0)
+
+
+def _add_effects(totals, game_type, effects):
+    """Add one answer's option effects into a flat column -> total dict"""
+    traits = TRAIT_KEYS.get(game_type, ())
+    for key, value in effects.items():
+        if key in traits and isinstance(value, (int, float)) and not isinstance(value, bool):
+            totals[f"{game_type}_{key}"] += value
+
+
+def to_id(value):
+    """An integer id from request JSON (854 or "854"); ValueError for anything else"""
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"Invalid id: {value!r}")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid id: {value!r}") from None
+
+
+def record_answers(conn, session_id, answers):
+    """
+    Insert answers for one session and fold their effects into the totals.
+
+    answers: iterable of dicts with gameType, questionId, questionText,
+    selectedOption, optionText and optionEffects (a dict). sessionId and
+    questionId may arrive as ints or numeric strings; anything else raises
+    ValueError before the database is touched.
+    Answers already stored for the same (game type, question id) are skipped
+    by the unique index, and only rows actually inserted add their effects,
+    so retries never double-count. Runs inside one write transaction; the
+    caller commits. Returns the number of answers actually inserted.
+    """
+    session_id = to_id(session_id)
+    answers = [dict(answer, questionId=to_id(answer['questionId'])) for answer in answers]
+
+    # Take the write lock up front so the inserts and the totals update are atomic
+    conn.execute("BEGIN IMMEDIATE")
+    inserted = 0
+    totals = _empty_totals()
+    for answer in answers:
+        effects = answer.get('optionEffects') or {}
+        cursor = conn.execute(_INSERT_ANSWER_SQL, (
+            session_id, answer['gameType'], answer['questionId'],
+            answer.get('questionText', ''), answer.get('selectedOption', 0),
+            answer.get('optionText', ''), json.dumps(effects)
+        ))
+        if cursor.rowcount == 1:  # 0 = already stored (INSERT OR IGNORE)
+            inserted += 1
+            _add_effects(totals, answer['gameType'], effects)
+
+    if inserted:
+        conn.execute(_UPSERT_SQL, (session_id, inserted, *(totals[col] for col in TRAIT_COLUMNS)))
+    return inserted
+
+
+def load_totals(conn, session_id):
+    """
+    Read a session's totals with one primary-key lookup.
+    Returns (emotional_scores, reasoning_scores, academic_scores, answer_count).
+    """
+    row = conn.execute(
+        f"SELECT answer_count, {', '.join(TRAIT_COLUMNS)} FROM session_trait_totals WHERE session_id = ?",
+        (session_id,)
+    ).fetchone()
+    answer_count = row[0] if row else 0
+    values = iter(row[1:] if row else [0] * len(TRAIT_COLUMNS))
+    scores = {game: {trait: next(values) for trait in traits} for game, traits in TRAIT_KEYS.items()}
+    return scores['emotional'], scores['reasoning'], scores['academic'], answer_count
+
+
+def load_totals_many(conn, session_ids):
+    """
+    Read face emotion and totals for many sessions in one query.
+    Returns {session_id: {'face_emotion', 'emotional', 'reasoning', 'academic',
+    'answer_count'}}; unknown session ids are simply absent.
+    """
+    columns = ', '.join(f"t.{col}" for col in TRAIT_COLUMNS)
+    rows = conn.execute(f"""
+        SELECT s.session_id, s.face_emotion, t.answer_count, {columns}
+        FROM user_sessions s
+        LEFT JOIN session_trait_totals t ON t.session_id = s.session_id
+        WHERE s.session_id IN (SELECT value FROM json_each(?))
+    """, (json.dumps(list(session_ids)),))
+
+    result = {}
+    for row in rows:
+        values = iter(v or 0 for v in row[3:])
+        scores = {game: {trait: next(values) for trait in traits} for game, traits in TRAIT_KEYS.items()}
+        result[row[0]] = dict(scores, face_emotion=row[1], answer_count=row[2] or 0)
+    return result
+
+
+def recompute_totals(conn, session_ids=None):
+    """Full recompute from game_answers: {session_id: (answer_count, totals)}"""
+    sql = "SELECT session_id, game_type, option_effects FROM game_answers"
+    params = ()
+    if session_ids is not None:
+        session_ids = list(session_ids)
+        sql += f" WHERE session_id IN ({', '.join('?' for _ in session_ids)})"
+        params = session_ids
+
+    counts = defaultdict(int)
+    totals = defaultdict(_empty_totals)
+    for session_id, game_type, option_effects in conn.execute(sql, params):
+        counts[session_id] += 1
+        effects = json.loads(option_effects) if option_effects else {}
+        _add_effects(totals[session_id], game_type, effects)
+    return {sid: (counts[sid], totals[sid]) for sid in counts}
+
+
+def rebuild_totals(conn):
+    """Backfill: replace every stored total with a full recompute. Caller commits."""
+    recomputed = recompute_totals(conn)
+    conn.execute("DELETE FROM session_trait_totals")
+    conn.executemany(
+        f"INSERT INTO session_trait_totals (session_id, answer_count, {', '.join(TRAIT_COLUMNS)}) "
+        f"VALUES (?, ?, {', '.join('?' for _ in TRAIT_COLUMNS)})",
+        [(sid, count, *(totals[col] for col in TRAIT_COLUMNS))
+         for sid, (count, totals) in recomputed.items()]
+    )
+    return len(recomputed)
+
+
+def check_totals(conn):
+    """Compare stored totals with a full recompute; returns mismatching session ids"""
+    recomputed = recompute_totals(conn)
+    stored = {
+        row[0]: (row[1], dict(zip(TRAIT_COLUMNS, row[2:])))
+        for row in conn.execute(
+            f"SELECT session_id, answer_count, {', '.join(TRAIT_COLUMNS)} FROM session_trait_totals"
+        )
+    }
+    empty = (0, _empty_totals())
+    return sorted(
+        sid for sid in set(recomputed) | set(stored)
+        if recomputed.get(sid, empty) != stored.get(sid, empty)
+    )
+
+
+def main(argv=None):
+    from db_pool import ConnectionPool
+
+    parser = argparse.ArgumentParser(description="Maintain per-session trait totals")
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    parser.add_argument('--db', default=os.environ.get('DATABASE_URL', 'career_guidance.db'))
+    args = parser.parse_args(argv)
+
+    pool = ConnectionPool(args.db, max_connections=1)
+    with pool.connection() as conn:
+        conn.execute(CREATE_TABLE_SQL)
+        if args.command == 'rebuild':
+            count = rebuild_totals(conn)
+            conn.commit()
+            print(f"✅ Rebuilt trait totals for {count} sessions")
+            return 0
+
+        mismatches = check_totals(conn)
+        if mismatches:
+            print(f"❌ {len(mismatches)} sessions out of sync: {mismatches[:20]}")
+            print("   Run: python session_traits.py rebuild")
+            return 1
+        print("✅ Stored trait totals match a full recompute")
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
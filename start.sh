@@ -11,6 +11,10 @@ python --version
 echo "📦 Installing dependencies..."
 pip install -q -r requirements.txt
 
+# Compile the question bank (memory-mapped by every worker)
+echo "📚 Compiling question bank..."
+python question_bank.py build
+
 # Set production environment
 export FLASK_ENV=production
 
@@ -0,0 +1,141 @@
+"""Endpoint tests for the answer, career explore and batch recommendation routes (Flask test client, temporary database)"""
+
+import os
+import tempfile
+
+# api_server opens DATABASE_URL at import
+os.environ["DATABASE_URL"] = os.path.join(tempfile.mkdtemp(), "test_career_guidance.db")
+
+import api_server
+import session_traits
+
+for _limiter in api_server.app.extensions["limiter"]:
+    _limiter.enabled = False
+
+client = api_server.app.test_client()
+
+
+def new_session():
+    return client.post("/api/session/create", json={"userName": "test"}).get_json()["sessionId"]
+
+
+def submit_batch(session_id, answers, game_type="emotional"):
+    return client.post("/api/answer/submit-batch",
+                       json={"sessionId": session_id, "gameType": game_type, "answers": answers})
+
+
+def answer(question_id, **effects):
+    return {"questionId": question_id, "questionText": "q", "selectedOption": 1,
+            "optionText": "o", "optionEffects": effects}
+
+
+def totals_in_sync():
+    with api_server.get_db_connection() as conn:
+        return session_traits.check_totals(conn) == []
+
+
+def stored_totals(session_id):
+    with api_server.get_db_connection() as conn:
+        return session_traits.load_totals(conn, session_id)
+
+
+def test_retried_batch_is_not_counted_twice():
+    session_id = new_session()
+    answers = [answer(1, stress=2), answer(2, empathy=1), answer(3, risk=1)]
+    assert submit_batch(session_id, answers).get_json()["inserted"] == 3
+
+    retry = submit_batch(session_id, answers).get_json()
+    assert retry["inserted"] == 0 and retry["duplicates"] == 3
+    emotional, _, _, count = stored_totals(session_id)
+    assert count == 3 and emotional["stress"] == 2
+    assert totals_in_sync()
+
+
+def test_duplicate_within_one_batch():
+    session_id = new_session()
+    response = submit_batch(session_id, [answer(5, stress=2), answer(5, stress=2), answer(6, risk=1)]).get_json()
+    assert response["received"] == 3 and response["inserted"] == 2 and response["duplicates"] == 1
+    assert stored_totals(session_id)[0]["stress"] == 2
+    assert totals_in_sync()
+
+
+def test_string_ids_are_the_same_answer():
+    session_id = new_session()
+    assert submit_batch(session_id, [answer(854, stress=2)]).get_json()["inserted"] == 1
+    retry = submit_batch(str(session_id), [answer("854", stress=2), answer("855", stress=1)]).get_json()
+    assert retry["inserted"] == 1
+    assert stored_totals(session_id)[0]["stress"] == 3
+    assert totals_in_sync()
+
+    # Single-answer endpoint: same question, string ids
+    response = client.post("/api/answer/submit", json=dict(
+        answer("855", stress=1), sessionId=str(session_id), gameType="emotional"))
+    assert response.status_code == 200
+    assert stored_totals(session_id)[3] == 2
+    assert totals_in_sync()
+
+
+def test_invalid_ids_are_rejected():
+    session_id = new_session()
+    assert submit_batch("abc", [answer(1)]).status_code == 400
+    assert submit_batch(session_id, [answer("1x")]).status_code == 400
+    assert submit_batch(session_id, [answer(1.5)]).status_code == 400
+    assert submit_batch(session_id, [answer(None)]).status_code == 400
+    assert client.post("/api/answer/submit", json=dict(
+        answer("abc"), sessionId=session_id, gameType="emotional")).status_code == 400
+    assert client.post("/api/answer/submit", json=dict(answer(1), gameType="emotional")).status_code == 400
+    assert stored_totals(session_id)[3] == 0
+
+
+def test_explore_cache_is_bounded_by_categories():
+    api_server._explore_cache.clear()
+    overview = client.get("/api/career/explore")
+    assert overview.status_code == 200
+    for page in range(2, 40):
+        response = client.get(f"/api/career/explore?page={page}&per_page=5")
+        assert response.status_code == 200 and response.get_data() == overview.get_data()
+    assert list(api_server._explore_cache) == [(None, None, None)]
+
+    category = overview.get_json()["categories"][0]
+    assert client.get(f"/api/career/explore?category={category}").status_code == 200
+    assert client.get(f"/api/career/explore?category={category}&page=1000&per_page=1").status_code == 404
+    assert client.get("/api/career/explore?category=No such category").status_code == 404
+    assert len(api_server._explore_cache) == 2
+
+
+def recommend_batch(body):
+    return client.post("/api/career/recommend/batch", json=body)
+
+
+def test_batch_recommendation():
+    session_ids = [new_session(), new_session()]
+    submit_batch(session_ids[0], [answer(1, stress=3, curiosity=3), answer(2, confidence=3)])
+
+    response = recommend_batch({"sessionIds": session_ids + [session_ids[0], 10 ** 9], "topK": 3})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [r["sessionId"] for r in data["results"]] == session_ids  # deduplicated, request order
+    assert data["notFound"] == [10 ** 9]
+    for result in data["results"]:
+        assert 1 <= len(result["allMatches"]) <= 3
+        assert result["career"] == result["allMatches"][0]["career"]
+
+
+def test_batch_recommendation_rejects_bad_input():
+    session_id = new_session()
+    for body in ({"sessionIds": []}, {"sessionIds": "1"}, {"sessionIds": ["x"]},
+                 {"sessionIds": [session_id], "topK": 0}, {"sessionIds": [session_id], "topK": -2},
+                 {"sessionIds": [session_id], "topK": "5"}, {"sessionIds": [session_id], "topK": 2.5},
+                 {"sessionIds": [session_id], "topK": True}):
+        assert recommend_batch(body).status_code == 400, body
+
+
+if __name__ == "__main__":
+    test_retried_batch_is_not_counted_twice()
+    test_duplicate_within_one_batch()
+    test_string_ids_are_the_same_answer()
+    test_invalid_ids_are_rejected()
+    test_explore_cache_is_bounded_by_categories()
+    test_batch_recommendation()
+    test_batch_recommendation_rejects_bad_input()
+    print("✅ API endpoint tests passed")
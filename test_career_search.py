@@ -0,0 +1,70 @@
+"""Tests for BM25 keyword search over the career database"""
+
+from career_rag import CareerRAG, tokenize
+
+
+def names(results):
+    return [r['career_name'] for r in results]
+
+
+def test_tokenize():
+    assert tokenize("Careers in the Engineering field!") == ['engineering', 'field']
+    assert tokenize("Doctors, nurses & class") == ['doctor', 'nurse', 'class']
+
+
+def test_exact_name_ranks_first():
+    rag = CareerRAG()
+    assert names(rag.search_careers_by_text("software developer", top_k=3))[0] == "Software Developer"
+    assert names(rag.search_careers_by_text("doctor medicine", top_k=3))[0] == "Doctor (MBBS)"
+
+
+def test_category_query():
+    rag = CareerRAG()
+    for category in ['Technology', 'Healthcare', 'Creative', 'Finance', 'Engineering', 'Education']:
+        results = rag.search_careers_by_text(f"careers in {category}", top_k=2)
+        assert results and all(r['category'] == category for r in results), (category, names(results))
+
+
+def test_prefix_matching():
+    rag = CareerRAG()
+    results = rag.search_careers_by_text("engin", top_k=5)
+    assert len(results) == 5
+    assert all('Engineer' in name for name in names(results))
+
+
+def test_results_shape_and_order():
+    rag = CareerRAG()
+    results = rag.search_careers_by_text("design art creative", top_k=4)
+    assert 0 < len(results) <= 4
+    scores = [r['relevance_score'] for r in results]
+    assert scores == sorted(scores, reverse=True)
+    for key in ('career_name', 'category', 'description', 'education_path',
+                'salary_range', 'student_guidance', 'job_locations'):
+        assert key in results[0]
+
+
+def test_no_match_returns_empty():
+    rag = CareerRAG()
+    assert rag.search_careers_by_text("zzzqqq", top_k=5) == []
+    assert rag.search_careers_by_text("the and of", top_k=5) == []
+    assert rag.search_careers_by_text("", top_k=5) == []
+
+
+def test_careers_by_category():
+    rag = CareerRAG()
+    by_category = rag.careers_by_category()
+    assert sum(len(careers) for careers in by_category.values()) == len(rag.careers_db)
+    assert names(by_category['Technology'])[:2] == ["Software Developer", "Data Scientist"]
+    for category, careers in by_category.items():
+        assert all(c['category'] == category for c in careers)
+
+
+if __name__ == "__main__":
+    test_tokenize()
+    test_exact_name_ranks_first()
+    test_category_query()
+    test_prefix_matching()
+    test_results_shape_and_order()
+    test_no_match_returns_empty()
+    test_careers_by_category()
+    print("✅ Career text search tests passed")
@@ -0,0 +1,70 @@
+"""Parity test: vectorized career scoring vs the reference dict-walk scoring"""
+
+import random
+
+from career_rag import CareerRAG, TRAIT_NAMESPACES
+
+LEVELS = ['high', 'medium', 'low', 'unknown']
+
+
+def reference_recommendations(rag, user_profile, top_k):
+    """The original per-career scoring loop and full sort"""
+    emotional = rag._convert_profile_to_scores(user_profile.get('emotional_profile', {}))
+    reasoning = rag._convert_profile_to_scores(user_profile.get('reasoning_profile', {}))
+    academic = rag._convert_profile_to_scores(user_profile.get('academic_profile', {}))
+
+    career_scores = [
+        (career, rag._calculate_match_score(career, emotional, reasoning, academic))
+        for career in rag.careers_db
+    ]
+    career_scores.sort(key=lambda x: x[1], reverse=True)
+    return [(career['name'], int(score * 100 / 30)) for career, score in career_scores[:top_k]]
+
+
+def random_profile(rng, rag):
+    """Random profile over the traits careers use, plus a few they don't"""
+    profile = {}
+    for profile_key, match_key in TRAIT_NAMESPACES:
+        traits = sorted({t for c in rag.careers_db for t in c.get(match_key, {})} - {'any'})
+        traits += ['stress', 'risk_reasoning', 'career_awareness', 'not_a_trait']
+        chosen = rng.sample(traits, rng.randint(0, min(12, len(traits))))
+        profile[profile_key] = {trait: rng.choice(LEVELS) for trait in chosen}
+    return profile
+
+
+def test_vectorized_matches_reference():
+    rag = CareerRAG()
+    rng = random.Random(2026)
+    for _ in range(2000):
+        profile = random_profile(rng, rag)
+        top_k = rng.choice([1, 3, 5, 10, len(rag.careers_db), len(rag.careers_db) + 5])
+        expected = reference_recommendations(rag, profile, top_k)
+        actual = [(r['career_name'], r['match_score'])
+                  for r in rag.get_career_recommendations(profile, top_k=top_k)]
+        assert actual == expected, (profile, top_k, actual, expected)
+
+
+def test_ties_keep_database_order():
+    rag = CareerRAG()
+    # Empty profile: every career scores 0, so ranking is database order
+    names = [r['career_name'] for r in rag.get_career_recommendations({}, top_k=5)]
+    assert names == [c['name'] for c in rag.careers_db[:5]]
+
+
+def test_batch_matches_single():
+    rag = CareerRAG()
+    rng = random.Random(7)
+    profiles = [random_profile(rng, rag) for _ in range(500)] + [{}]
+    for top_k in (1, 5, len(rag.careers_db) + 5):
+        batch = rag.get_career_recommendations_batch(profiles, top_k=top_k)
+        assert len(batch) == len(profiles)
+        for profile, recs in zip(profiles, batch):
+            assert recs == rag.get_career_recommendations(profile, top_k=top_k)
+    assert rag.get_career_recommendations_batch([], top_k=5) == []
+
+
+if __name__ == "__main__":
+    test_vectorized_matches_reference()
+    test_ties_keep_database_order()
+    test_batch_matches_single()
+    print("✅ Vectorized scoring matches the reference implementation")
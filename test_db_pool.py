@@ -0,0 +1,140 @@
+"""Tests for the pooled SQLite connection layer"""
+
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+def make_pool(max_connections=2, **kwargs):
+    path = os.path.join(tempfile.mkdtemp(), "pool.db")
+    pool = ConnectionPool(path, max_connections=max_connections, **kwargs)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items (value INTEGER)")
+        conn.commit()
+    return pool
+
+
+def count_items(pool):
+    with pool.connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+
+def test_connection_is_rolled_back_and_returned():
+    pool = make_pool(max_connections=1, acquire_timeout=1.0)
+
+    def route_that_raises():
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO items VALUES (1)")
+            raise RuntimeError("handler failed")
+
+    def route_that_returns_early():
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO items VALUES (2)")
+            return "early"
+
+    with pytest.raises(RuntimeError):
+        route_that_raises()
+    assert route_that_returns_early() == "early"
+
+    # Nothing committed, the single slot is free again and its connection is idle
+    assert count_items(pool) == 0
+    assert len(pool._idle) == 1 and not pool._idle[0].in_transaction
+
+
+def test_nested_use_shares_the_connection():
+    pool = make_pool(max_connections=1, acquire_timeout=0.1)
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+
+
+def test_pool_is_reset_after_fork():
+    pool = make_pool()
+    with pool.connection() as parent_conn:
+        pass
+    assert pool._idle == [parent_conn]
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            with pool.connection() as conn:
+                conn.execute("INSERT INTO items VALUES (1)")
+                conn.commit()
+                ok = conn is not parent_conn and pool._pid == os.getpid()
+            os.write(write_fd, b"1" if ok else b"0")
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    result = os.read(read_fd, 1)
+    os.waitpid(pid, 0)
+    os.close(read_fd)
+
+    assert result == b"1"
+    assert pool._idle == [parent_conn]  # the parent's pool is untouched
+    assert count_items(pool) == 1
+
+
+def test_pool_stays_bounded_under_concurrent_threads():
+    pool = make_pool(max_connections=3)
+    pool.close_all()
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+    connections = set()
+
+    def worker():
+        for _ in range(5):
+            with pool.connection() as conn:
+                with lock:
+                    connections.add(id(conn))
+                    state["active"] += 1
+                    state["peak"] = max(state["peak"], state["active"])
+                conn.execute("SELECT COUNT(*) FROM items").fetchone()
+                time.sleep(0.002)
+                with lock:
+                    state["active"] -= 1
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert state["peak"] <= 3
+    assert len(connections) <= 3 and len(pool._idle) <= 3
+
+
+def test_acquire_times_out_when_exhausted():
+    pool = make_pool(max_connections=1, acquire_timeout=0.05)
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    try:
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+    finally:
+        release.set()
+        thread.join()
+
+
+if __name__ == "__main__":
+    test_connection_is_rolled_back_and_returned()
+    test_nested_use_shares_the_connection()
+    test_pool_is_reset_after_fork()
+    test_pool_stays_bounded_under_concurrent_threads()
+    test_acquire_times_out_when_exhausted()
+    print("✅ Connection pool tests passed")
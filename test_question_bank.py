@@ -0,0 +1,123 @@
+"""Tests for the pre-indexed question bank"""
+
+import os
+import json
+import random
+import tempfile
+
+from question_bank import QuestionBank, compile_bank, load_question_bank
+
+
+def make_question(qid, difficulty, **tags):
+    return {
+        "id": qid,
+        "level": "reasoning",
+        "difficulty": difficulty,
+        "tags": {"logic": "low", "analysis": "low", **tags},
+        "question": f"Question {qid}?",
+        "options": [{"text": "A", "effects": {"logic": 1}}],
+    }
+
+
+def make_questions():
+    questions = [make_question(i, "easy") for i in range(100)]
+    questions += [make_question(100 + i, "medium", logic="high") for i in range(10)]
+    questions += [make_question(110 + i, "medium") for i in range(90)]
+    return {"reasoning": questions}
+
+
+def make_bank():
+    return QuestionBank(make_questions())
+
+
+def test_pools():
+    bank = make_bank()
+    assert "reasoning" in bank and "emotional" not in bank
+    assert bank.size("reasoning") == 200
+    assert bank.difficulties("reasoning") == ["easy", "medium"]
+    assert bank.tags("reasoning") == ["logic"]
+    assert len(bank.pool("reasoning", "medium")) == 100
+    assert len(bank.pool("reasoning", tag="logic")) == 10
+    assert bank.pool("reasoning", "easy", "logic") == []
+
+
+def test_sample_is_distinct_and_filtered():
+    bank = make_bank()
+    rng = random.Random(1)
+    for count in (1, 10, 100, 150):
+        positions = bank.sample("reasoning", count, difficulty="medium", rng=rng)
+        assert len(positions) == min(count, 100)
+        assert len(set(positions)) == len(positions)
+        assert all(bank.question("reasoning", p)["difficulty"] == "medium" for p in positions)
+    assert bank.sample("reasoning", 5, difficulty="hard") == []
+
+
+def test_tag_weighting():
+    bank = make_bank()
+    rng = random.Random(2)
+    hits = total = 0
+    for _ in range(200):
+        positions = bank.sample("reasoning", 5, difficulty="medium", tags=["logic"], tag_weight=0.8, rng=rng)
+        assert len(set(positions)) == 5
+        hits += sum(bank.question("reasoning", p)["tags"]["logic"] == "high" for p in positions)
+        total += len(positions)
+    # 10% of the medium pool is tagged; weighting should push well past that
+    assert hits / total > 0.5
+
+    # Asking for the whole pool still returns every question exactly once
+    positions = bank.sample("reasoning", 100, difficulty="medium", tags=["logic"], rng=rng)
+    assert sorted(positions) == sorted(bank.pool("reasoning", "medium"))
+
+
+def test_questions_json():
+    bank = make_bank()
+    body = json.loads(bank.questions_json("reasoning", [3, 150]))
+    assert [q["id"] for q in body["questions"]] == [3, 150]
+    assert json.loads(bank.questions_json("reasoning", [])) == {"questions": []}
+
+
+def test_compiled_bank_matches_in_memory():
+    questions = make_questions()
+    memory = QuestionBank(questions)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bank.qbk")
+        compile_bank(questions, path)
+        compiled = QuestionBank.open_compiled(path)
+
+        assert compiled.size("reasoning") == memory.size("reasoning")
+        assert compiled.tags("reasoning") == memory.tags("reasoning")
+        assert compiled.difficulties("reasoning") == memory.difficulties("reasoning")
+        assert list(compiled.pool("reasoning", "medium", "logic")) == memory.pool("reasoning", "medium", "logic")
+        assert compiled.question("reasoning", 150) == questions["reasoning"][150]
+        assert compiled.question_id("reasoning", 150) == 150
+        positions = [0, 42, 199]
+        assert compiled.questions_json("reasoning", positions) == memory.questions_json("reasoning", positions)
+
+        rng_a, rng_b = random.Random(5), random.Random(5)
+        for _ in range(20):
+            assert (compiled.sample("reasoning", 7, tags=["logic"], rng=rng_a)
+                    == memory.sample("reasoning", 7, tags=["logic"], rng=rng_b))
+
+
+def test_stale_compiled_bank_falls_back_to_json():
+    questions = make_questions()
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "reasoning.json")
+        with open(source, "w") as f:
+            json.dump(questions["reasoning"], f)
+        compiled = os.path.join(tmp, "bank.qbk")
+        # No recorded sources -> treated as stale
+        compile_bank(questions, compiled)
+        bank = load_question_bank(compiled, {"reasoning": source})
+        assert not hasattr(bank, "header")
+        assert bank.size("reasoning") == 200
+
+
+if __name__ == "__main__":
+    test_pools()
+    test_sample_is_distinct_and_filtered()
+    test_tag_weighting()
+    test_questions_json()
+    test_compiled_bank_matches_in_memory()
+    test_stale_compiled_bank_falls_back_to_json()
+    print("✅ Question bank tests passed")
@@ -0,0 +1,69 @@
+"""Tests for per-session no-repeat question sampling"""
+
+import random
+import sqlite3
+
+import question_history
+from question_history import has_bit, set_bit
+from test_question_bank import make_bank
+
+
+def make_conn():
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.execute("CREATE TABLE user_sessions (session_id INTEGER PRIMARY KEY)")
+    conn.execute(question_history.CREATE_TABLE_SQL)
+    return conn
+
+
+def test_bitmap():
+    bitmap = bytearray()
+    for n in (0, 7, 8, 1999):
+        set_bit(bitmap, n)
+    assert len(bitmap) == 250
+    assert all(has_bit(bitmap, n) for n in (0, 7, 8, 1999))
+    assert not any(has_bit(bitmap, n) for n in (1, 9, 1998, 5000))
+
+
+def test_no_repeats_until_exhausted():
+    bank = make_bank()
+    conn = make_conn()
+    rng = random.Random(3)
+    served = set()
+    for _ in range(20):
+        positions = question_history.sample_unseen(conn, bank, 1, "reasoning", 10, rng=rng)
+        conn.execute("COMMIT")
+        ids = {bank.question_id("reasoning", p) for p in positions}
+        assert len(ids) == 10 and not ids & served
+        served |= ids
+    assert len(served) == bank.size("reasoning")
+
+    # Everything served: a new cycle starts instead of returning nothing
+    positions = question_history.sample_unseen(conn, bank, 1, "reasoning", 10, rng=rng)
+    conn.execute("COMMIT")
+    assert len(set(positions)) == 10
+
+    # Other sessions are unaffected
+    assert question_history.load_served(conn, 2, "reasoning") == bytearray()
+
+
+def test_exhausted_tag_pool_falls_back_to_unseen():
+    bank = make_bank()
+    conn = make_conn()
+    rng = random.Random(4)
+    # Only 10 medium "logic" questions: the third call must top up from
+    # other unseen medium questions rather than repeat
+    served = set()
+    for _ in range(3):
+        positions = question_history.sample_unseen(conn, bank, 1, "reasoning", 4, rng=rng,
+                                                   difficulty="medium", tags=["logic"], tag_weight=1.0)
+        conn.execute("COMMIT")
+        assert len(set(positions)) == 4 and not set(positions) & served
+        served |= set(positions)
+    assert set(bank.pool("reasoning", "medium", "logic")) <= served
+
+
+if __name__ == "__main__":
+    test_bitmap()
+    test_no_repeats_until_exhausted()
+    test_exhausted_tag_pool_falls_back_to_unseen()
+    print("✅ Question history tests passed")
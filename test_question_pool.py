@@ -0,0 +1,196 @@
+"""Tests for the background pool of generated questions"""
+
+import os
+import json
+import tempfile
+import threading
+
+import pytest
+from tokenizers import Tokenizer
+
+import question_pool
+
+from question_bank import QuestionBank
+from question_pool import (BlockValidator, QuestionPool, QuestionGenerator, TOKENIZER_FILE,
+                           GENERATED_ID_BASE, block_prompt, create_question_generator)
+
+OPTIONS = [
+    {"text": "I panic or feel overwhelmed", "effects": {"stress": -2}},
+    {"text": "I stay calm and think through it", "effects": {"stress": 2}},
+    {"text": "I act quickly and take risks", "effects": {"risk": 2}},
+    {"text": "I look for help or support", "effects": {"empathy": 2}},
+]
+
+
+def make_bank():
+    questions = [{
+        "id": 1,
+        "level": "emotional",
+        "difficulty": "easy",
+        "eq": {"stress": "high"},
+        "question": "How do you decide when under time pressure?",
+        "options": OPTIONS,
+    }]
+    return QuestionBank({"emotional": questions})
+
+
+def block(question, options):
+    """A block the way generate_batch decodes it: tokens joined by spaces"""
+    tags = ["<OPTION_A>", "<OPTION_B>", "<OPTION_C>", "<OPTION_D>"]
+    parts = [f"{tag} {text}" for tag, text in zip(tags, options)]
+    return f"<LEVEL> emotional <QUESTION> {question} " + " ".join(parts) + " <END>"
+
+
+def make_validator():
+    return BlockValidator(make_bank(), Tokenizer.from_file(TOKENIZER_FILE), ["emotional"])
+
+
+def test_validator_accepts_fresh_questions():
+    validator = make_validator()
+    texts = [o["text"] for o in OPTIONS]
+    question = validator.validate("emotional", block("How do you react when a high - stakes plan changes ? at school", texts[::-1]))
+
+    assert question["question"] == "How do you react when a high-stakes plan changes? at school"
+    assert question["options"] == OPTIONS[::-1]   # effects come from the bank
+    assert question["id"] > GENERATED_ID_BASE and question["generated"] is True
+
+    # Each question is only accepted once
+    assert validator.validate("emotional", block("How do you react when a high - stakes plan changes ? at school", texts)) is None
+
+
+def test_validator_rejects_bad_blocks():
+    validator = make_validator()
+    texts = [o["text"] for o in OPTIONS]
+    bad = [
+        block("How do you decide when under time pressure ?", texts),       # already in the bank
+        block("How do you react when plans change", texts),                 # no question mark
+        block("Why ?", texts),                                              # too short
+        block("How do you react when plans change ?", texts[:3]),           # missing option
+        block("How do you react when plans change ?", texts[:3] + ["I sleep"]),  # unknown option
+        block("How do you react when plans change ?", texts[:3] + texts[:1]),    # repeated option
+    ]
+    assert [validator.validate("emotional", b) for b in bad] == [None] * len(bad)
+
+
+def test_pool_is_bounded_and_fifo():
+    pool = QuestionPool(["emotional", "academic"], capacity=3)
+    for i in range(4):
+        pool.put("emotional", {"id": i})
+    assert pool.stats() == {"emotional": 3, "academic": 0}
+    assert pool.next_level() == "academic"
+    assert pool.next_level(after="academic") == "academic"
+
+    taken = pool.take("emotional", 2)
+    assert [json.loads(f)["id"] for f in taken] == [0, 1]
+    assert pool.take("emotional", 5) == [pool_fragment(2)]
+    assert pool.take("academic", 5) == []
+    assert pool.take("unknown", 5) == []
+
+
+def pool_fragment(qid):
+    pool = QuestionPool(["emotional"])
+    pool.put("emotional", {"id": qid})
+    return pool.take("emotional", 1)[0]
+
+
+def test_questions_json_puts_generated_first():
+    bank = make_bank()
+    body = json.loads(bank.questions_json("emotional", [0], [pool_fragment(7)]))
+    assert [q["id"] for q in body["questions"]] == [7, 1]
+
+
+def test_fill_generates_one_batch():
+    import torch
+    from model.tiny_transformer import TinyTransformerLM
+
+    tokenizer = Tokenizer.from_file(TOKENIZER_FILE)
+    torch.manual_seed(0)
+    generator = QuestionGenerator(QuestionPool(["emotional"]), make_bank(), checkpoint_path=None)
+    generator._tokenizer = tokenizer
+    generator._model = TinyTransformerLM(vocab_size=tokenizer.get_vocab_size()).eval()
+    generator._validator = make_validator()
+
+    kept = generator.fill("emotional", 4)
+    # An untrained model rarely writes a valid block; every draw is still accounted for
+    assert generator.accepted == kept == generator.pool.stats()["emotional"]
+    assert generator.accepted + generator.rejected == 4
+    assert block_prompt("emotional").startswith("<LEVEL> emotional")
+
+
+def test_generator_starts_lazily_once_per_process():
+    with tempfile.NamedTemporaryFile(suffix=".pt") as checkpoint:
+        generator = create_question_generator(make_bank(), ["emotional"], checkpoint.name)
+    # Created at import time of api_server, but nothing runs until a worker asks
+    assert generator is not None and generator._thread is None
+
+    runs = []
+    generator._run = lambda: runs.append(os.getpid())
+    threads = [threading.Thread(target=generator.start) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    generator._thread.join()
+    assert runs == [os.getpid()]
+
+    # A forked worker (another pid) starts its own thread
+    generator._pid = -1
+    generator.start()
+    generator._thread.join()
+    assert len(runs) == 2
+
+
+class StopGenerator(BaseException):
+    """Ends QuestionGenerator._run() in a test (it only catches Exception)"""
+
+
+def test_generator_backs_off_and_keeps_running_after_errors():
+    generator = QuestionGenerator(QuestionPool(["emotional"], capacity=4), make_bank(), checkpoint_path=None)
+    generator._load = lambda: None
+    outcomes = [RuntimeError("transient"), RuntimeError("transient"), 1, RuntimeError("again"), StopGenerator()]
+
+    def fill(level, count):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    generator.fill = fill
+    delays = []
+    sleep, question_pool.time.sleep = question_pool.time.sleep, delays.append
+    try:
+        with pytest.raises(StopGenerator):
+            generator._run()
+    finally:
+        question_pool.time.sleep = sleep
+    # 1s, 2s, then reset by the successful batch
+    assert delays == [1, 2, 1] and outcomes == []
+
+
+def test_bidirectional_checkpoint_disables_generator():
+    import torch
+    from model.tiny_transformer import TinyTransformerLM
+
+    tokenizer = Tokenizer.from_file(TOKENIZER_FILE)
+    model = TinyTransformerLM(vocab_size=tokenizer.get_vocab_size())
+    with tempfile.TemporaryDirectory() as tmp:
+        # Written before causal training: weights only, loads with causal=False
+        path = os.path.join(tmp, "legacy.pt")
+        torch.save({"epoch": 5, "model_state_dict": model.state_dict()}, path)
+        generator = QuestionGenerator(QuestionPool(["emotional"]), make_bank(), checkpoint_path=path)
+        with pytest.raises(ValueError, match="causal=False"):
+            generator._load()
+        generator._run()  # logs and returns instead of failing on the first batch
+    assert generator.accepted == generator.rejected == 0
+
+
+if __name__ == "__main__":
+    test_validator_accepts_fresh_questions()
+    test_validator_rejects_bad_blocks()
+    test_pool_is_bounded_and_fifo()
+    test_questions_json_puts_generated_first()
+    test_fill_generates_one_batch()
+    test_generator_starts_lazily_once_per_process()
+    test_generator_backs_off_and_keeps_running_after_errors()
+    test_bidirectional_checkpoint_disables_generator()
+    print("✅ Question pool tests passed")
@@ -0,0 +1,70 @@
+"""Tests for incrementally maintained per-session trait totals"""
+
+import sqlite3
+
+import pytest
+
+import session_traits
+
+
+def make_conn():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE user_sessions (session_id INTEGER PRIMARY KEY, face_emotion TEXT);
+        CREATE TABLE game_answers (
+            answer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER,
+            game_type TEXT NOT NULL,
+            question_id INTEGER NOT NULL,
+            question_text TEXT NOT NULL,
+            selected_option INTEGER NOT NULL,
+            option_text TEXT NOT NULL,
+            option_effects TEXT
+        );
+        CREATE UNIQUE INDEX idx_game_answers_unique ON game_answers(session_id, game_type, question_id);
+        INSERT INTO user_sessions (session_id) VALUES (1);
+    """)
+    conn.execute(session_traits.CREATE_TABLE_SQL)
+    return conn
+
+
+def answer(question_id, **effects):
+    return {"gameType": "emotional", "questionId": question_id, "optionEffects": effects}
+
+
+def test_totals_follow_inserted_answers():
+    conn = make_conn()
+    assert session_traits.record_answers(conn, 1, [answer(1, stress=2), answer(2, stress=1, empathy=3)]) == 2
+    conn.commit()
+    emotional, _, _, count = session_traits.load_totals(conn, 1)
+    assert count == 2 and emotional["stress"] == 3 and emotional["empathy"] == 3
+    assert session_traits.check_totals(conn) == []
+
+
+def test_retries_and_string_ids_are_not_counted_twice():
+    conn = make_conn()
+    session_traits.record_answers(conn, 1, [answer(854, stress=2)])
+    conn.commit()
+
+    # A retry with string ids, and the same question twice within one batch
+    assert session_traits.record_answers(conn, "1", [answer("854", stress=2), answer(7, risk=1), answer("7", risk=1)]) == 1
+    conn.commit()
+    emotional, _, _, count = session_traits.load_totals(conn, 1)
+    assert count == 2 and emotional["stress"] == 2 and emotional["risk"] == 1
+    assert session_traits.check_totals(conn) == []
+
+
+def test_invalid_ids_raise_before_writing():
+    conn = make_conn()
+    for session_id, question_id in ((1, "abc"), (1, None), (1, 1.5), ("x", 1), (True, 1)):
+        with pytest.raises(ValueError):
+            session_traits.record_answers(conn, session_id, [answer(question_id, stress=1)])
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM game_answers").fetchone()[0] == 0
+
+
+if __name__ == "__main__":
+    test_totals_follow_inserted_answers()
+    test_retries_and_string_ids_are_not_counted_twice()
+    test_invalid_ids_raise_before_writing()
+    print("✅ Session trait total tests passed")
@@ -0,0 +1,207 @@
+"""
+Held-out evaluation of a tiny LM checkpoint (or compiled artifact):
+
+- perplexity on a deterministic validation split (every HOLDOUT_EVERY-th
+  sample) of final_dataset.json and structured_corpus.txt, which the
+  training scripts never train on (training/batching.py split_dataset())
+- generation speed at batch size 1: prefill and decode tokens/sec,
+  p50 / p95 latency per generated question
+- share of sampled blocks parse_block() reads as a complete question with
+  four options (free sampling, and with the block grammar)
+
+Generation needs the KV cache, so it is only measured for causal models;
+for a legacy bidirectional checkpoint those metrics are marked skipped and
+the perplexity is still recorded.
+
+evaluate() returns everything as one JSON-ready dict;
+scripts/evaluate.py writes it to eval_results/ and compares two runs.
+"""
+
+import math
+import time
+import platform
+from datetime import datetime, timezone
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from training.dataset import QuestionDataset
+from training.structured_dataset import StructuredDataset
+from training.batching import HOLDOUT_EVERY, split_dataset, make_loader  # the split the training scripts hold out
+from inference.batch_generate import generate_batch_ids, sample_next, stop_token_ids, TEMPERATURE, TOP_K
+from inference.constrained import StructuredGrammar, block_prompt
+from inference.structured_blocks import parse_block
+
+# ================= CONFIG =================
+QUESTIONS_PATH = "data/final/final_dataset.json"
+CORPUS_PATH = "data/structured/structured_corpus.txt"
+TOKENIZER_PATH = "tokenizer/tokenizer.json"
+EVAL_BATCH_SIZE = 32
+GENERATED_QUESTIONS = 30   # per run, spread over LEVELS
+MAX_NEW_TOKENS = 96
+LEVELS = ("emotional", "reasoning", "academic")
+SEED = 0
+REGRESSION_TOLERANCE = 0.02  # relative change compare() still treats as noise
+
+
+@torch.inference_mode()
+def perplexity(model, dataset, batch_size=EVAL_BATCH_SIZE, device="cpu"):
+    """Token-level perplexity over `dataset`, in length-bucketed batches padded per batch"""
+    if hasattr(model, "eval"):
+        model.eval()
+    loader = make_loader(dataset, batch_size, mode="bucket", shuffle=False)
+    criterion = nn.CrossEntropyLoss(ignore_index=dataset.pad_id, reduction="sum")
+    # Summed on-device, one host sync at the end
+    total_loss = torch.zeros((), dtype=torch.float64, device=device)
+    total_tokens = torch.zeros((), dtype=torch.long, device=device)
+    for x, y, _ in loader:
+        x, y = x.to(device), y.to(device)
+        logits = model(x)
+        total_loss += criterion(logits.reshape(-1, logits.size(-1)).float(), y.reshape(-1))
+        total_tokens += (y != dataset.pad_id).sum()
+    return math.exp(total_loss.item() / total_tokens.item())
+
+
+def is_complete_block(text):
+    """parse_block() finds a question and four non-empty options"""
+    question, options = parse_block(text)
+    return bool(question) and len(options) == 4 and all(options)
+
+
+@torch.inference_mode()
+def generation_speed(model, tokenizer, questions=GENERATED_QUESTIONS, max_new_tokens=MAX_NEW_TOKENS,
+                     temperature=TEMPERATURE, top_k=TOP_K, seed=SEED):
+    """
+    One question at a time (the latency a caller sees): prefill the level
+    prompt, then KV-cached decode steps until <END>. Returns timings and the
+    decoded blocks.
+    """
+    stop = set(stop_token_ids(tokenizer, ("<END>",)))
+    generator = torch.Generator().manual_seed(seed)
+    prefill_tokens = decode_tokens = 0
+    prefill_seconds = decode_seconds = 0.0
+    latencies, texts = [], []
+
+    for i in range(questions):
+        prompt_ids = tokenizer.encode(block_prompt(LEVELS[i % len(LEVELS)])).ids
+        budget = min(max_new_tokens, model.max_len - len(prompt_ids))
+
+        start = time.perf_counter()
+        cache = model.new_cache(batch_size=1)
+        logits = model.forward_cached(torch.tensor([prompt_ids]), cache)[:, -1]
+        prefilled = time.perf_counter()
+
+        new_ids = []
+        for step in range(budget):
+            next_id = sample_next(logits, temperature, top_k, generator)
+            token = next_id.item()
+            new_ids.append(token)
+            if token in stop or step + 1 == budget:
+                break
+            logits = model.forward_cached(next_id[:, None], cache)[:, -1]
+        done = time.perf_counter()
+
+        prefill_tokens += len(prompt_ids)
+        prefill_seconds += prefilled - start
+        # The first new token comes from the prefill logits; every later one costs a step
+        decode_tokens += len(new_ids) - 1
+        decode_seconds += done - prefilled
+        latencies.append(done - start)
+        texts.append(tokenizer.decode(prompt_ids + new_ids, skip_special_tokens=False))
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "questions": questions,
+        "prefill_tokens_per_sec": prefill_tokens / prefill_seconds,
+        "decode_tokens_per_sec": decode_tokens / decode_seconds if decode_seconds else None,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies_ms, 50)),
+            "p95": float(np.percentile(latencies_ms, 95)),
+            "mean": float(latencies_ms.mean()),
+        },
+        "mean_new_tokens": (decode_tokens + questions) / questions,
+    }, texts
+
+
+@torch.inference_mode()
+def constrained_blocks(model, tokenizer, questions=GENERATED_QUESTIONS, max_new_tokens=MAX_NEW_TOKENS, seed=SEED):
+    """Blocks sampled in one batch under the block grammar"""
+    prompt_ids = [tokenizer.encode(block_prompt(LEVELS[i % len(LEVELS)])).ids for i in range(questions)]
+    grammar = StructuredGrammar(tokenizer, prompt_ids, device=model.device)
+    outputs = generate_batch_ids(
+        model, prompt_ids, stop_token_ids(tokenizer, ("<END>",)), pad_id=tokenizer.token_to_id("[PAD]"),
+        max_new_tokens=max_new_tokens, generator=torch.Generator().manual_seed(seed), grammar=grammar
+    )
+    return [tokenizer.decode(p + o, skip_special_tokens=False) for p, o in zip(prompt_ids, outputs)]
+
+
+def evaluate(model, tokenizer, name, questions=GENERATED_QUESTIONS, device="cpu"):
+    """Every metric above for one model, as a JSON-ready dict"""
+    results = {
+        "model": name,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "torch": torch.__version__,
+            "python": platform.python_version(),
+            "threads": torch.get_num_threads(),
+            "device": str(device),
+        },
+        "config": getattr(model, "config", None),
+        "split": {"holdout_every": HOLDOUT_EVERY},
+        "perplexity": {},
+    }
+
+    max_length = model.max_len
+    for key, dataset_cls, path in (
+        ("questions", QuestionDataset, QUESTIONS_PATH),
+        ("structured", StructuredDataset, CORPUS_PATH),
+    ):
+        _, validation = split_dataset(dataset_cls(path, TOKENIZER_PATH, max_length=max_length))
+        results["perplexity"][key] = perplexity(model, validation, device=device)
+        results["split"][f"{key}_samples"] = len(validation)
+
+    if not model.causal:
+        skipped = {"skipped": "bidirectional model (causal=False); cached generation needs a causal model"}
+        results["generation"] = dict(skipped)
+        results["parse_rate"] = dict(skipped)
+        return results
+
+    speed, texts = generation_speed(model, tokenizer, questions)
+    results["generation"] = speed
+    results["parse_rate"] = {"sampled": sum(map(is_complete_block, texts)) / len(texts)}
+    blocks = constrained_blocks(model, tokenizer, questions)
+    results["parse_rate"]["constrained"] = sum(map(is_complete_block, blocks)) / len(blocks)
+    return results
+
+
+# Metric paths compared between runs, and whether higher is better
+TRACKED_METRICS = (
+    (("perplexity", "questions"), False),
+    (("perplexity", "structured"), False),
+    (("generation", "prefill_tokens_per_sec"), True),
+    (("generation", "decode_tokens_per_sec"), True),
+    (("generation", "latency_ms", "p50"), False),
+    (("generation", "latency_ms", "p95"), False),
+    (("parse_rate", "sampled"), True),
+    (("parse_rate", "constrained"), True),
+)
+
+
+def compare(baseline, current, tolerance=REGRESSION_TOLERANCE):
+    """
+    [(metric, baseline, current, relative change, got worse)] for the metrics
+    both runs have; worse = changed the wrong way by more than `tolerance`
+    """
+    rows = []
+    for path, higher_is_better in TRACKED_METRICS:
+        old, new = baseline, current
+        for key in path:
+            old = old.get(key) if isinstance(old, dict) else None
+            new = new.get(key) if isinstance(new, dict) else None
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = change < -tolerance if higher_is_better else change > tolerance
+        rows.append((".".join(path), old, new, change, worse))
+    return rows
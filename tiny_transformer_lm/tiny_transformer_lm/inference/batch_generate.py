@@ -0,0 +1,122 @@
+import torch
+import torch.nn.functional as F
+
+from inference.constrained import StructuredGrammar
+
+# ================= CONFIG =================
+TEMPERATURE = 0.7
+TOP_K = 30
+
+# Stop tokens per generation style
+STRUCTURED_STOP_TOKENS = ("<END>",)
+QUESTION_STOP_TOKENS = ("?", ".")
+
+
+def stop_token_ids(tokenizer, stop_tokens):
+    """Ids of the stop tokens the vocabulary actually has"""
+    ids = (tokenizer.token_to_id(token) for token in stop_tokens)
+    return [i for i in ids if i is not None]
+
+
+def left_pad(prompt_ids, pad_id, device):
+    """(input_ids, attention_mask) with every prompt right-aligned"""
+    width = max(len(ids) for ids in prompt_ids)
+    input_ids = torch.full((len(prompt_ids), width), pad_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(prompt_ids), width), dtype=torch.long)
+    for row, ids in enumerate(prompt_ids):
+        input_ids[row, width - len(ids):] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[row, width - len(ids):] = 1
+    return input_ids.to(device), attention_mask.to(device)
+
+
+def sample_next(logits, temperature, top_k, generator=None):
+    """One token per row from (batch, vocab) logits; temperature 0 = greedy"""
+    if temperature <= 0:
+        return logits.argmax(dim=-1)
+    logits = logits / temperature
+    if top_k:
+        topk_logits, topk_indices = torch.topk(logits, min(top_k, logits.size(-1)), dim=-1)
+        picks = torch.multinomial(F.softmax(topk_logits, dim=-1), 1, generator=generator)
+        return topk_indices.gather(-1, picks).squeeze(-1)
+    return torch.multinomial(F.softmax(logits, dim=-1), 1, generator=generator).squeeze(-1)
+
+
+@torch.no_grad()
+def generate_batch_ids(
+    model,
+    prompt_ids,
+    stop_ids,
+    pad_id=0,
+    max_new_tokens=200,
+    temperature=TEMPERATURE,
+    top_k=TOP_K,
+    generator=None,
+    grammar=None
+):
+    """
+    Decode many prompts together: left-pad, prefill once, then one KV-cached
+    step per token for the whole batch. A row that emits a stop id (kept in
+    its output) is compacted out of the batch and cache, so later steps only
+    pay for live rows. grammar (e.g. StructuredGrammar) masks the logits
+    before every draw. Returns the new token ids per prompt.
+    """
+    device = model.device
+    input_ids, attention_mask = left_pad(prompt_ids, pad_id, device)
+    max_new_tokens = min(max_new_tokens, model.max_len - input_ids.size(1))
+    stop = set(stop_ids)
+
+    cache = model.new_cache(batch_size=len(prompt_ids))
+    logits = model.forward_cached(input_ids, cache, attention_mask)[:, -1]
+
+    outputs = [[] for _ in prompt_ids]
+    live = list(range(len(prompt_ids)))   # prompt index of each cache row
+    for step in range(max_new_tokens):
+        if grammar is not None:
+            logits = grammar.mask_logits(logits)
+        next_ids = sample_next(logits, temperature, top_k, generator)
+        if grammar is not None:
+            grammar.advance(next_ids)
+
+        # One host sync per step for the whole batch
+        tokens = next_ids.tolist()
+        for row, token in zip(live, tokens):
+            outputs[row].append(token)
+
+        keep = [i for i, token in enumerate(tokens) if token not in stop]
+        if len(keep) < len(tokens):
+            if not keep:
+                break
+            live = [live[i] for i in keep]
+            keep = torch.tensor(keep, device=device)
+            cache.select(keep)
+            if grammar is not None:
+                grammar.select(keep)
+            next_ids = next_ids.index_select(0, keep)
+
+        if step + 1 < max_new_tokens:
+            logits = model.forward_cached(next_ids[:, None], cache)[:, -1]
+
+    return outputs
+
+
+def generate_batch(model, tokenizer, prompts, stop_tokens=STRUCTURED_STOP_TOKENS, constrained=False, **kwargs):
+    """
+    Batched generate_structured(): decoded prompt + continuation per prompt,
+    with the structure tokens (<QUESTION>, <OPTION_A>, ...) kept for parse_block.
+    constrained=True enforces the block format (see inference/constrained.py);
+    prompts should then end at or inside a segment, e.g. block_prompt(level).
+    """
+    prompt_ids = [tokenizer.encode(prompt).ids for prompt in prompts]
+    if constrained:
+        kwargs["grammar"] = StructuredGrammar(tokenizer, prompt_ids, device=model.device)
+    outputs = generate_batch_ids(
+        model,
+        prompt_ids,
+        stop_token_ids(tokenizer, stop_tokens),
+        pad_id=tokenizer.token_to_id("[PAD]"),
+        **kwargs
+    )
+    return [
+        tokenizer.decode(ids + new_ids, skip_special_tokens=False)
+        for ids, new_ids in zip(prompt_ids, outputs)
+    ]
@@ -0,0 +1,270 @@
+"""
+Compiled inference artifact for TinyTransformerLM.
+
+export_compiled() turns a model into a TorchScript file: the KV-cached
+decoding step as one traced graph, with every Linear (attention
+projections, feed-forward, lm_head) dynamically quantized to int8.
+CompiledLM loads it without the model code and is a drop-in for the eager
+model at inference: new_cache() / forward_cached() with left-padded
+batches, cache select() / prefix() / fill_prefix(), whole-sequence calls
+with an attention_mask, and a device attribute.
+
+    python scripts/export_model.py --checkpoint checkpoints_structured/structured_epoch_5.pt
+
+The artifact records the size/mtime of the checkpoint it was exported from;
+load_model() falls back to that checkpoint (with a warning) once it changes.
+"""
+
+import os
+import copy
+import json
+import logging
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from model.tiny_transformer import TinyTransformerLM
+
+# Bumped when the traced step's inputs change; older artifacts must be re-exported
+ARTIFACT_VERSION = 3
+
+logger = logging.getLogger(__name__)
+
+
+def source_stamp(path):
+    """Size/mtime of a checkpoint, recorded at export time to detect stale artifacts"""
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class CachedDecoder(nn.Module):
+    """
+    forward_cached() as a traceable module. The cache is passed in as plain
+    tensors (num_layers, batch, heads, max_len, head_dim) preallocated like
+    KVCache's buffers; the new keys/values are written into them in place
+    after the cached prefix, so a decode step copies nothing but its own
+    token. key_valid covers the cached prefix plus the new tokens (False at
+    padding), which also sets where they go. Attention projections are
+    standalone nn.Linear layers so dynamic quantization covers them as well.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        model = copy.deepcopy(model).eval()
+        embed_dim = model.token_embedding.embedding_dim
+        self.num_heads = model.num_heads
+        self.norm_first = model.transformer.layers[0].norm_first
+
+        self.token_embedding = model.token_embedding
+        self.position_embedding = model.position_embedding
+        self.in_proj = nn.ModuleList()
+        self.out_proj = nn.ModuleList()
+        for layer in model.transformer.layers:
+            attn = layer.self_attn
+            in_proj = nn.Linear(embed_dim, 3 * embed_dim)
+            in_proj.weight.data.copy_(attn.in_proj_weight)
+            in_proj.bias.data.copy_(attn.in_proj_bias)
+            out_proj = nn.Linear(embed_dim, embed_dim)
+            out_proj.load_state_dict(attn.out_proj.state_dict())
+            self.in_proj.append(in_proj)
+            self.out_proj.append(out_proj)
+        self.linear1 = nn.ModuleList(layer.linear1 for layer in model.transformer.layers)
+        self.linear2 = nn.ModuleList(layer.linear2 for layer in model.transformer.layers)
+        self.norm1 = nn.ModuleList(layer.norm1 for layer in model.transformer.layers)
+        self.norm2 = nn.ModuleList(layer.norm2 for layer in model.transformer.layers)
+        self.activation = model.transformer.layers[0].activation
+        self.norm = model.transformer.norm if model.transformer.norm is not None else nn.Identity()
+        self.lm_head = model.lm_head
+
+    def _attention(self, index, x, key_buffer, value_buffer, slots, mask):
+        batch_size, new_len, embed_dim = x.shape
+        head_dim = embed_dim // self.num_heads
+        q, k, v = self.in_proj[index](x).chunk(3, dim=-1)
+        q, k, v = (
+            t.view(batch_size, new_len, self.num_heads, head_dim).transpose(1, 2)
+            for t in (q, k, v)
+        )
+        # In-place write into the layer's buffer (a view), then attend over the filled part
+        end = mask.size(-1)
+        keys = key_buffer[index].index_copy_(2, slots, k).narrow(2, 0, end)
+        values = value_buffer[index].index_copy_(2, slots, v).narrow(2, 0, end)
+        out = F.scaled_dot_product_attention(q, keys, values, attn_mask=mask)
+        out = out.transpose(1, 2).reshape(batch_size, new_len, embed_dim)
+        return self.out_proj[index](out)
+
+    def forward(self, input_ids, key_buffer, value_buffer, positions, key_valid):
+        """
+        key_buffer / value_buffer: (num_layers, batch, heads, max_len, head_dim), updated in place
+        positions: (batch, new_len) position ids of the new tokens
+        key_valid: (batch, cached + new_len) False at padding, which no token attends to
+        """
+        start = key_valid.size(1) - input_ids.size(1)
+        x = self.token_embedding(input_ids) + self.position_embedding(positions)
+
+        # Causal over the whole cache minus padding (same as KVCache's mask), built
+        # from sizes so it traces for any length. A padding query still attends to
+        # itself, so no row is fully masked (NaN).
+        query_index = torch.arange(input_ids.size(1), device=input_ids.device) + start
+        key_index = torch.arange(key_valid.size(1), device=input_ids.device)
+        causal = key_index[None, :] <= query_index[:, None]
+        own = key_index[None, :] == query_index[:, None]
+        mask = ((causal & key_valid[:, None, :]) | own).unsqueeze(1)
+
+        for index in range(len(self.in_proj)):
+            linear1, linear2 = self.linear1[index], self.linear2[index]
+            norm1, norm2 = self.norm1[index], self.norm2[index]
+            if self.norm_first:
+                x = x + self._attention(index, norm1(x), key_buffer, value_buffer, query_index, mask)
+                x = x + linear2(self.activation(linear1(norm2(x))))
+            else:
+                x = norm1(x + self._attention(index, x, key_buffer, value_buffer, query_index, mask))
+                x = norm2(x + linear2(self.activation(linear1(x))))
+
+        return self.lm_head(self.norm(x))
+
+
+def export_compiled(model, path, quantize=True, source=None):
+    """
+    Trace the model's cached decoding step (int8 dynamic quantization of
+    every Linear unless quantize=False) and save it with its config and the
+    source_stamp() of `source`, the checkpoint the model was loaded from.
+    Only causal models: the cached step is exact for causal attention.
+    """
+    if not model.causal:
+        raise ValueError("Only causal models can be exported (cached decoding is causal)")
+    decoder = CachedDecoder(model)
+    if quantize:
+        decoder = torch.ao.quantization.quantize_dynamic(decoder, {nn.Linear}, dtype=torch.qint8)
+
+    num_layers = len(model.transformer.layers)
+    head_dim = model.token_embedding.embedding_dim // model.num_heads
+    # 3 cached tokens + 5 new ones; every length is read from the inputs' sizes
+    buffer = torch.zeros(num_layers, 1, model.num_heads, model.max_len, head_dim)
+    example = (torch.zeros(1, 5, dtype=torch.long), buffer, buffer.clone(),
+               torch.arange(3, 8)[None], torch.ones(1, 8, dtype=torch.bool))
+    with torch.no_grad():
+        traced = torch.jit.trace(decoder, example, check_trace=False)
+
+    config = dict(model.config, quantized=quantize, head_dim=head_dim, artifact_version=ARTIFACT_VERSION,
+                  source=source_stamp(source) if source else None)
+    torch.jit.save(traced, path, _extra_files={"config.json": json.dumps(config)})
+    return config
+
+
+class CompiledCache:
+    """
+    Preallocated key/value buffers for CompiledLM.forward_cached(), one
+    (num_layers, batch, heads, max_len, head_dim) tensor each, plus the
+    padding bookkeeping KVCache does (which positions are real, real tokens
+    per row). Same methods as KVCache.
+    """
+
+    def __init__(self, num_layers, batch_size, num_heads, head_dim, max_len, device, dtype):
+        shape = (num_layers, batch_size, num_heads, max_len, head_dim)
+        self.keys = torch.zeros(shape, device=device, dtype=dtype)
+        self.values = torch.zeros(shape, device=device, dtype=dtype)
+        self.valid = torch.zeros(batch_size, max_len, dtype=torch.bool, device=device)
+        self.real_tokens = torch.zeros(batch_size, dtype=torch.long, device=device)
+        self.length = 0
+        self.max_len = max_len
+
+    @property
+    def batch_size(self):
+        return self.valid.size(0)
+
+    def prefix(self):
+        """Per-layer compact copies of the cached keys/values (follows KVCache.prefix)"""
+        keys = [k[:, :, :self.length].clone() for k in self.keys]
+        values = [v[:, :, :self.length].clone() for v in self.values]
+        return keys, values
+
+    def fill_prefix(self, keys, values):
+        """Start every row from a padding-free prefix taken with prefix() (follows KVCache.fill_prefix)"""
+        length = keys[0].size(2)
+        self.keys[:, :, :, :length] = torch.stack(keys)
+        self.values[:, :, :, :length] = torch.stack(values)
+        self.valid[:, :length] = True
+        self.real_tokens.fill_(length)
+        self.length = length
+
+    def truncate(self, length):
+        """Forget every position from `length` on (follows KVCache.truncate)"""
+        self.valid[:, length:] = False
+        self.real_tokens = self.valid[:, :length].sum(dim=1)
+        self.length = length
+
+    def select(self, rows):
+        """Keep only the given batch rows (follows KVCache.select)"""
+        self.keys = self.keys.index_select(1, rows)
+        self.values = self.values.index_select(1, rows)
+        self.valid = self.valid.index_select(0, rows)
+        self.real_tokens = self.real_tokens.index_select(0, rows)
+
+
+class CompiledLM:
+    """A saved artifact with the eager model's inference calls"""
+
+    def __init__(self, path, map_location="cpu"):
+        extra_files = {"config.json": ""}
+        self.module = torch.jit.load(path, map_location=map_location, _extra_files=extra_files)
+        self.module.eval()
+        self.config = json.loads(extra_files["config.json"])
+        if self.config.get("artifact_version") != ARTIFACT_VERSION:
+            raise ValueError(f"{path} was exported by an older version; re-export it with scripts/export_model.py")
+        self.max_len = self.config["max_len"]
+        self.causal = True
+        self.device = torch.device(map_location)
+
+    def new_cache(self, batch_size, device=None, dtype=None):
+        return CompiledCache(
+            self.config["num_layers"], batch_size, self.config["num_heads"], self.config["head_dim"],
+            self.max_len, device or self.device, dtype or torch.float32
+        )
+
+    @torch.no_grad()
+    def forward_cached(self, input_ids, cache, attention_mask=None):
+        """Same contract as TinyTransformerLM.forward_cached (0 in attention_mask = padding)"""
+        start, end = cache.length, cache.length + input_ids.size(1)
+        if end > cache.max_len:
+            raise ValueError(f"Sequence would exceed max_len={cache.max_len}")
+        valid = (attention_mask.bool() if attention_mask is not None
+                 else torch.ones_like(input_ids, dtype=torch.bool))
+        cache.valid[:, start:end] = valid
+        # Position = number of real tokens before this one in its row
+        positions = (cache.real_tokens[:, None] + valid.cumsum(dim=1) - 1).clamp(min=0)
+        cache.real_tokens += valid.sum(dim=1)
+        # The buffers are written in place; cache.valid[:, :end] is a view, not a copy
+        logits = self.module(input_ids, cache.keys, cache.values, positions, cache.valid[:, :end])
+        cache.length = end
+        return logits
+
+    @torch.no_grad()
+    def __call__(self, input_ids, attention_mask=None):
+        """
+        Causal logits for whole sequences (batch_size, seq_len, vocab_size);
+        attention_mask 0 marks right padding, as in TinyTransformerLM.forward
+        """
+        return self.forward_cached(input_ids, self.new_cache(input_ids.size(0)), attention_mask)
+
+
+def load_model(checkpoint_path, artifact_path=None, device="cpu"):
+    """
+    The compiled artifact when one exists at artifact_path, was exported from
+    the checkpoint as it is now and device is the CPU (int8 kernels are
+    CPU-only), else the eager model from the checkpoint
+    """
+    device = torch.device(device)
+    if artifact_path and os.path.exists(artifact_path) and device.type == "cpu":
+        compiled = CompiledLM(artifact_path)
+        if not (checkpoint_path and os.path.exists(checkpoint_path)):
+            return compiled
+        if compiled.config.get("source") == source_stamp(checkpoint_path):
+            return compiled
+        logger.warning(
+            f"{artifact_path} was not exported from {checkpoint_path} as it is now; using the checkpoint. "
+            f"Re-export with: python scripts/export_model.py --checkpoint {checkpoint_path} --out {artifact_path}"
+        )
+    # Older checkpoints (no saved config) load as the original bidirectional model
+    model = TinyTransformerLM.from_checkpoint(checkpoint_path, map_location=device)
+    return model.to(device).eval()
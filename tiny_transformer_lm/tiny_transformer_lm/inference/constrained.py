@@ -0,0 +1,87 @@
+"""
+Grammar-constrained decoding for the structured block format:
+
+    <LEVEL> level <QUESTION> text <OPTION_A> text ... <OPTION_D> text <END>
+
+StructuredGrammar is a token-level state machine (one state per row of a
+batch) that masks logits before sampling, so every finished block has all
+segments, in order, each with text and within its length cap.
+"""
+
+import torch
+
+from inference.structured_blocks import block_prompt  # noqa: F401 (re-exported)
+
+# ================= CONFIG =================
+SEGMENTS = ("<LEVEL>", "<QUESTION>", "<OPTION_A>", "<OPTION_B>", "<OPTION_C>", "<OPTION_D>")
+END_TOKEN = "<END>"
+
+# Content tokens allowed per segment (corpus maxima: 1, 25 and 6-7)
+SEGMENT_CAPS = {
+    "<LEVEL>": 1,
+    "<QUESTION>": 32,
+    "<OPTION_A>": 12,
+    "<OPTION_B>": 12,
+    "<OPTION_C>": 12,
+    "<OPTION_D>": 12,
+}
+
+
+class StructuredGrammar:
+    """
+    State 0 is before <LEVEL>, state k is inside SEGMENTS[k - 1] and the
+    last state is after <END>. In a segment a row may emit content tokens
+    until the segment's cap, and the next tag once the segment has at least
+    one content token; <END> is forced when <OPTION_D>'s text hits its cap.
+    """
+
+    def __init__(self, tokenizer, prompt_ids, caps=SEGMENT_CAPS, device="cpu"):
+        tags = [tokenizer.token_to_id(tag) for tag in SEGMENTS + (END_TOKEN,)]
+        if None in tags:
+            raise ValueError("Tokenizer has no structure tokens (<LEVEL>, <QUESTION>, ...)")
+
+        # Content = anything but special tokens ([PAD], [UNK] and the tags)
+        self.content = torch.ones(tokenizer.get_vocab_size(), dtype=torch.bool, device=device)
+        self.content[list(tokenizer.get_added_tokens_decoder())] = False
+
+        # Per state: the tag that ends it, its content cap and minimum length
+        self.next_tag = torch.tensor(tags + [tags[-1]], device=device)
+        self.caps = torch.tensor([0] + [caps[s] for s in SEGMENTS] + [0], device=device)
+        self.min_tokens = torch.tensor([0] + [1] * len(SEGMENTS) + [0], device=device)
+        self.done_state = len(SEGMENTS) + 1
+
+        # Prompts are taken as given (they may end mid-segment)
+        states, lengths = [], []
+        for ids in prompt_ids:
+            state, length = 0, 0
+            for token in ids:
+                if state < self.done_state and token == tags[state]:
+                    state, length = state + 1, 0
+                elif state > 0:
+                    length += 1
+            states.append(state)
+            lengths.append(length)
+        self.state = torch.tensor(states, device=device)
+        self.length = torch.tensor(lengths, device=device)
+
+    @property
+    def done(self):
+        return self.state == self.done_state
+
+    def mask_logits(self, logits):
+        """(batch, vocab) logits with every token the grammar forbids at -inf"""
+        allowed = self.content[None, :] & (self.length < self.caps[self.state])[:, None]
+        rows = torch.arange(logits.size(0), device=logits.device)
+        allowed[rows, self.next_tag[self.state]] = self.length >= self.min_tokens[self.state]
+        return logits.masked_fill(~allowed, float("-inf"))
+
+    def advance(self, token_ids):
+        """Move every row past its sampled token (batch,)"""
+        is_tag = token_ids == self.next_tag[self.state]
+        self.state = torch.where(is_tag, (self.state + 1).clamp(max=self.done_state), self.state)
+        self.length = torch.where(is_tag, torch.zeros_like(self.length), self.length + 1)
+
+    def select(self, rows):
+        """Keep only the given batch rows (follows KVCache.select)"""
+        self.state = self.state.index_select(0, rows)
+        self.length = self.length.index_select(0, rows)
@@ -9,7 +9,7 @@ import torch
 import torch.nn.functional as F
 from tokenizers import Tokenizer
 
-from model.tiny_transformer import TinyTransformerLM
+from inference.compiled_lm import load_model
 from inference.option_selector import OptionSelector
 
 
@@ -19,33 +19,34 @@ DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 tokenizer = Tokenizer.from_file("tokenizer/tokenizer.json")
 vocab_size = tokenizer.get_vocab_size()
 
-model = TinyTransformerLM(vocab_size=vocab_size)
-checkpoint = torch.load("checkpoints/tiny_transformer_epoch_5.pt", map_location=DEVICE)
-model.load_state_dict(checkpoint["model_state_dict"])
-model.to(DEVICE)
-model.eval()
+# int8 TorchScript artifact from scripts/export_model.py when present (CPU)
+model = load_model("checkpoints/tiny_transformer_epoch_5.pt", "checkpoints/tiny_transformer_int8.pt", DEVICE)
 
 def generate_question(base_prompt, max_new_tokens=20):
     encoding = tokenizer.encode(base_prompt)
+    generated = list(encoding.ids)
     input_ids = torch.tensor([encoding.ids], dtype=torch.long).to(DEVICE)
 
+    # Prefill the prompt once, then feed one token per step through the KV cache
+    cache = model.new_cache(batch_size=1)
+    max_new_tokens = min(max_new_tokens, model.max_len - len(generated))
+    logits = model.forward_cached(input_ids, cache)
+
     for _ in range(max_new_tokens):
-        with torch.no_grad():
-            logits = model(input_ids)
-            next_token_logits = logits[0, -1] / 0.7
-            probs = F.softmax(next_token_logits, dim=-1)
-            next_token_id = torch.multinomial(probs, 1).item()
-
-        input_ids = torch.cat(
-            [input_ids, torch.tensor([[next_token_id]], device=DEVICE)],
-            dim=1
-        )
+        next_token_logits = logits[0, -1] / 0.7
+        probs = F.softmax(next_token_logits, dim=-1)
+        next_token_id = torch.multinomial(probs, 1).item()
+        generated.append(next_token_id)
 
         token = tokenizer.decode([next_token_id]).strip()
         if token in ["?", "."]:
             break
 
-    return tokenizer.decode(input_ids[0].tolist())
+        logits = model.forward_cached(
+            torch.tensor([[next_token_id]], device=DEVICE), cache
+        )
+
+    return tokenizer.decode(generated)
 
 def serve_question(level):
     prompts = {
@@ -6,14 +6,21 @@ import torch
 import torch.nn.functional as F
 from tokenizers import Tokenizer
 
-from model.tiny_transformer import TinyTransformerLM
+from inference.compiled_lm import load_model
+from inference.structured_blocks import parse_block
+from inference.constrained import StructuredGrammar, block_prompt
+from inference.speculative import NGramDraft, speculative_generate
 
 # ================= CONFIG =================
 CHECKPOINT_PATH = "checkpoints_structured/structured_epoch_5.pt"
+ARTIFACT_PATH = "checkpoints_structured/structured_int8.pt"
 MAX_NEW_TOKENS = 200
 TEMPERATURE = 0.7
 TOP_K = 30
 MAX_LEN = 256
+CONSTRAINED = True         # enforce the block format while sampling (inference/constrained.py)
+SPECULATIVE = True         # n-gram drafts verified several tokens per forward pass (inference/speculative.py)
+CORPUS_PATH = "data/structured/structured_corpus.txt"
 
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -24,40 +31,61 @@ vocab_size = tokenizer.get_vocab_size()
 END_ID = tokenizer.token_to_id("<END>")
 
 # ================= LOAD MODEL =================
-model = TinyTransformerLM(
-    vocab_size=vocab_size,
-    max_len=MAX_LEN
-)
-checkpoint = torch.load(CHECKPOINT_PATH, map_location=DEVICE)
-model.load_state_dict(checkpoint["model_state_dict"])
-model.to(DEVICE)
-model.eval()
+# int8 TorchScript artifact from scripts/export_model.py when present (CPU)
+model = load_model(CHECKPOINT_PATH, ARTIFACT_PATH, DEVICE)
 
 # ================= GENERATION =================
-def generate_structured(prompt):
+draft = None
+
+
+def get_draft():
+    """n-gram draft table of the training corpus, built on first use"""
+    global draft
+    if draft is None:
+        draft = NGramDraft.from_corpus(CORPUS_PATH, "tokenizer/tokenizer.json")
+    return draft
+
+
+def generate_structured(prompt, constrained=CONSTRAINED, speculative=SPECULATIVE):
     encoding = tokenizer.encode(prompt)
+    generated = list(encoding.ids)
     input_ids = torch.tensor([encoding.ids], device=DEVICE)
+    grammar = StructuredGrammar(tokenizer, [encoding.ids], device=DEVICE) if constrained else None
+
+    if speculative:
+        # Same sampling distribution, fewer sequential forward passes
+        generated += speculative_generate(
+            model, encoding.ids, get_draft(), [END_ID], min(MAX_NEW_TOKENS, MAX_LEN - len(generated)),
+            temperature=TEMPERATURE, top_k=TOP_K, grammar=grammar, device=DEVICE
+        )
+    else:
+        # Prefill the prompt once, then feed one token per step through the KV cache
+        cache = model.new_cache(batch_size=1)
+        max_new_tokens = min(MAX_NEW_TOKENS, MAX_LEN - len(generated))
+        logits = model.forward_cached(input_ids, cache)
 
-    for _ in range(MAX_NEW_TOKENS):
-        with torch.no_grad():
-            logits = model(input_ids)
+        for _ in range(max_new_tokens):
             next_logits = logits[0, -1] / TEMPERATURE
+            if grammar is not None:
+                # Only tokens that keep the block well-formed (tags in order, capped segments)
+                next_logits = grammar.mask_logits(next_logits[None])[0]
 
             topk_logits, topk_indices = torch.topk(next_logits, TOP_K)
             probs = F.softmax(topk_logits, dim=-1)
             next_pos = torch.multinomial(probs, 1).item()
             next_id = topk_indices[next_pos].item()
+            generated.append(next_id)
+            if grammar is not None:
+                grammar.advance(torch.tensor([next_id], device=DEVICE))
 
-        input_ids = torch.cat(
-            [input_ids, torch.tensor([[next_id]], device=DEVICE)],
-            dim=1
-        )
+            # HARD STOP
+            if next_id == END_ID:
+                break
 
-        # HARD STOP
-        if next_id == END_ID:
-            break
+            logits = model.forward_cached(torch.tensor([[next_id]], device=DEVICE), cache)
 
-    decoded = tokenizer.decode(input_ids[0].tolist())
+    # Keep the structure tokens: parse_block splits on them
+    decoded = tokenizer.decode(generated, skip_special_tokens=False)
 
     # Safety trim
     if "<END>" in decoded:
@@ -65,38 +93,14 @@ def generate_structured(prompt):
 
     return decoded
 
-# ================= PARSER =================
-def parse_block(text):
-    question = ""
-    options = []
-
-    # Extract question
-    if "<QUESTION>" in text:
-        q = text.split("<QUESTION>", 1)[1]
-        for tag in ["<OPTION_A>", "<OPTION_B>", "<OPTION_C>", "<OPTION_D>"]:
-            if tag in q:
-                q = q.split(tag, 1)[0]
-                break
-        question = q.strip()
-
-    # Extract options
-    for tag in ["<OPTION_A>", "<OPTION_B>", "<OPTION_C>", "<OPTION_D>"]:
-        if tag in text:
-            part = text.split(tag, 1)[1]
-            for stop in ["<OPTION_A>", "<OPTION_B>", "<OPTION_C>", "<OPTION_D>", "<END>"]:
-                if stop in part:
-                    part = part.split(stop, 1)[0]
-            options.append(part.strip())
-
-    return question, options
-
 # ================= RUN =================
 if __name__ == "__main__":
     print("\nChoose level: emotional / reasoning / academic")
     level = input(">> ").strip()
 
     # 🔒 STRONG STRUCTURED PROMPT (CRITICAL)
-    prompt = (
+    # Constrained mode: the grammar fills every segment, so stop at <QUESTION>
+    prompt = block_prompt(level) if CONSTRAINED else (
         f"<LEVEL> {level}\n"
         f"<QUESTION> "
         f"<OPTION_A> "
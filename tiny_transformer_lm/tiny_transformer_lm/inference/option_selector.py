@@ -1,41 +1,169 @@
+from collections import OrderedDict
+
 import torch
 import torch.nn.functional as F
 from tokenizers import Tokenizer
 from model.tiny_transformer import TinyTransformerLM
 
+# Memory for cached question prefixes (keys/values + next-token logits)
+PREFIX_CACHE_BYTES = 16 * 1024 * 1024
+
+
+def right_pad(rows, pad_id, device):
+    """(ids, lengths) for token id lists padded on the right"""
+    width = max(1, max(len(row) for row in rows))
+    ids = torch.full((len(rows), width), pad_id, dtype=torch.long)
+    for i, row in enumerate(rows):
+        ids[i, :len(row)] = torch.tensor(row, dtype=torch.long)
+    lengths = torch.tensor([len(row) for row in rows])
+    return ids.to(device), lengths.to(device)
+
+
+class PrefixCache:
+    """
+    LRU cache of encoded question prefixes, keyed by their token ids.
+    Each entry holds the question's per-layer keys/values and the logits
+    for the token after it; least recently used entries are evicted once
+    the total size goes over max_bytes.
+    """
+
+    def __init__(self, max_bytes=PREFIX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def entry_bytes(entry):
+        keys, values, logits = entry
+        return sum(t.nbytes for t in keys + values) + logits.nbytes
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        size = self.entry_bytes(entry)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.nbytes -= self.entry_bytes(self.entries.pop(key))
+        self.entries[key] = entry
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= self.entry_bytes(evicted)
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+
 class OptionSelector:
-    def __init__(self, model, tokenizer, device):
+    def __init__(self, model, tokenizer, device, pad_id=0, prefix_cache_bytes=PREFIX_CACHE_BYTES):
         self.model = model
         self.tokenizer = tokenizer
         self.device = device
+        self.pad_id = pad_id
+        # Question prefixes are reused only by causal models, where the
+        # question's keys/values don't depend on the option that follows
+        self.prefix_cache = PrefixCache(prefix_cache_bytes) if prefix_cache_bytes else None
 
-    def score_option(self, question, option_text):
+    @torch.no_grad()
+    def score_options(self, question, option_texts, normalize=False):
         """
-        Score how well an option fits a question
-        using negative log-likelihood.
+        Log-likelihood of each option's tokens given the question, for all
+        options in one padded forward pass. The question is encoded once and
+        shared; normalize=True divides by option length (mean log-prob per
+        token) so long options aren't penalized for having more tokens.
+        Returns a (num_options,) tensor.
         """
-        combined = question + " " + option_text
-        encoding = self.tokenizer.encode(combined)
+        question_ids = self.tokenizer.encode(question).ids
+        option_ids = [self.tokenizer.encode(text).ids for text in option_texts]
+
+        longest = len(question_ids) + max(len(ids) for ids in option_ids)
+        if (self.prefix_cache is not None and self.model.causal
+                and question_ids and longest <= self.model.max_len):
+            token_scores, option_mask = self._score_from_prefix(question_ids, option_ids)
+        else:
+            token_scores, option_mask = self._score_full(question_ids, option_ids)
+        scores = token_scores.masked_fill(~option_mask, 0.0).sum(dim=1)
+
+        if normalize:
+            scores = scores / option_mask.sum(dim=1).clamp(min=1)
+        return scores
+
+    def _question_prefix(self, question_ids):
+        """Cached (keys, values, next-token logits) for the question"""
+        key = tuple(question_ids)
+        entry = self.prefix_cache.get(key)
+        if entry is None:
+            cache = self.model.new_cache(batch_size=1)
+            logits = self.model.forward_cached(torch.tensor([question_ids], device=self.device), cache)
+            entry = (*cache.prefix(), logits[0, -1])
+            self.prefix_cache.put(key, entry)
+        return entry
+
+    def _score_from_prefix(self, question_ids, option_ids):
+        """Extend the cached question with every option at once (causal models)"""
+        keys, values, question_logits = self._question_prefix(question_ids)
+        ids, lengths = right_pad(option_ids, self.pad_id, self.device)
+        num_options, width = ids.shape
+
+        # Option token j is predicted from the question (j = 0) or from
+        # option token j - 1; the last token is only ever a target
+        logits = question_logits.expand(num_options, 1, -1)
+        if width > 1:
+            cache = self.model.new_cache(batch_size=num_options)
+            cache.fill_prefix(keys, values)
+            positions = torch.arange(width - 1, device=self.device)
+            attention_mask = (positions < lengths[:, None]).long()
+            step_logits = self.model.forward_cached(ids[:, :-1], cache, attention_mask)
+            logits = torch.cat([logits, step_logits], dim=1)
 
-        ids = torch.tensor([encoding.ids], device=self.device)
-        input_ids = ids[:, :-1]
-        target_ids = ids[:, 1:]
+        log_probs = F.log_softmax(logits, dim=-1)
+        token_scores = log_probs.gather(-1, ids[:, :, None]).squeeze(-1)
+        option_mask = torch.arange(width, device=self.device) < lengths[:, None]
+        return token_scores, option_mask
 
-        with torch.no_grad():
-            logits = self.model(input_ids)
-            log_probs = F.log_softmax(logits, dim=-1)
+    def _score_full(self, question_ids, option_ids):
+        # The tokenizer splits on whitespace, so question + " " + option
+        # encodes to exactly question_ids + option_ids
+        rows = [question_ids + ids for ids in option_ids]
+        ids, lengths = right_pad(rows, self.pad_id, self.device)
 
-        score = 0.0
-        for i in range(target_ids.size(1)):
-            score += log_probs[0, i, target_ids[0, i]].item()
+        # Each row's last token is only a target, never an input, so it is
+        # masked too (matters for bidirectional checkpoints)
+        positions = torch.arange(ids.size(1), device=self.device)
+        attention_mask = (positions[:-1] < lengths[:, None] - 1).long()
 
-        return score
+        logits = self.model(ids[:, :-1], attention_mask=attention_mask)
+        log_probs = F.log_softmax(logits, dim=-1)
+        token_scores = log_probs.gather(-1, ids[:, 1:, None]).squeeze(-1)
+
+        # Target position t predicts token t + 1: keep only option tokens
+        targets = positions[1:]
+        option_mask = (targets >= len(question_ids)) & (targets < lengths[:, None])
+        return token_scores, option_mask
+
+    def score_option(self, question, option_text, normalize=False):
+        """
+        Score how well an option fits a question
+        using its log-likelihood given the question.
+        """
+        return self.score_options(question, [option_text], normalize)[0].item()
 
-    def select_best(self, question, options, top_k=4):
-        scored = []
-        for opt in options:
-            s = self.score_option(question, opt["text"])
-            scored.append((s, opt))
+    def select_best(self, question, options, top_k=4, normalize=False):
+        if not options:
+            return []
+        scores = self.score_options(question, [opt["text"] for opt in options], normalize)
 
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [opt for _, opt in scored[:top_k]]
+        # Stable: ties keep the options' original order
+        order = torch.sort(scores, descending=True, stable=True).indices[:top_k]
+        return [options[i] for i in order.tolist()]
@@ -0,0 +1,190 @@
+"""
+Speculative decoding with an n-gram draft.
+
+Structured blocks repeat themselves (the same tags, level names and option
+texts thousands of times), so a table of the most frequent next token
+after every 1..n-1 token context of the training corpus guesses long runs
+of the continuation. Each step feeds the pending token plus up to
+max_draft drafted tokens through the model in one cached forward pass and
+keeps the drafted tokens the model agrees with:
+
+- greedy (temperature 0): a drafted token is kept while it is the argmax,
+  so the output is exactly that of plain greedy decoding
+- sampling: a drafted token d is kept with probability p(d), else the token
+  is drawn from p with d removed; for a deterministic draft this samples
+  exactly from p (speculative sampling with a point-mass proposal)
+
+Rejected positions are dropped from the KV cache (KVCache.truncate), and
+the token drawn at the first rejection (or after the last accepted draft)
+becomes the next pending token, so every forward pass yields at least one
+token and usually several.
+"""
+
+from collections import Counter, defaultdict
+
+import torch
+import torch.nn.functional as F
+
+from inference.batch_generate import TEMPERATURE, TOP_K
+from training.token_corpus import load_token_corpus, read_blocks
+
+# ================= CONFIG =================
+NGRAM_ORDER = 4            # contexts of up to 3 tokens
+MAX_DRAFT = 8              # drafted tokens verified per forward pass
+MIN_COUNT = 2              # contexts seen fewer times don't draft
+
+
+class NGramDraft:
+    """Most frequent next token per context of 1..order-1 tokens; longest matching context wins"""
+
+    def __init__(self, order=NGRAM_ORDER, min_count=MIN_COUNT):
+        self.order = order
+        self.min_count = min_count
+        self.tables = [{} for _ in range(order)]   # tables[n]: n-token context -> next token
+
+    @classmethod
+    def from_sequences(cls, sequences, order=NGRAM_ORDER, min_count=MIN_COUNT):
+        """Build from token id sequences, e.g. a TokenCorpus (training/token_corpus.py)"""
+        draft = cls(order, min_count)
+        counts = [defaultdict(Counter) for _ in range(order)]
+        for sequence in sequences:
+            ids = tuple(int(i) for i in sequence)
+            for end in range(1, len(ids)):
+                for n in range(1, min(order - 1, end) + 1):
+                    counts[n][ids[end - n:end]][ids[end]] += 1
+        for n in range(1, order):
+            for context, next_counts in counts[n].items():
+                token, count = next_counts.most_common(1)[0]
+                if count >= min_count:
+                    draft.tables[n][context] = token
+        return draft
+
+    @classmethod
+    def from_corpus(cls, corpus_path, tokenizer_path, read_texts=read_blocks, **kwargs):
+        """Build from the pre-tokenized training corpus (tokenized first if needed)"""
+        corpus = load_token_corpus(corpus_path, tokenizer_path, read_texts)
+        return cls.from_sequences((corpus[i] for i in range(len(corpus))), **kwargs)
+
+    def next_token(self, context):
+        for n in range(min(self.order - 1, len(context)), 0, -1):
+            token = self.tables[n].get(tuple(context[-n:]))
+            if token is not None:
+                return token
+        return None
+
+    def propose(self, context, max_tokens):
+        """Up to max_tokens drafted continuation ids of `context` (a list of ids)"""
+        context = list(context[-(self.order - 1):])
+        proposal = []
+        while len(proposal) < max_tokens:
+            token = self.next_token(context)
+            if token is None:
+                break
+            proposal.append(token)
+            context = context[1:] + [token] if len(context) == self.order - 1 else context + [token]
+        return proposal
+
+
+def next_token_probs(logits, temperature, top_k):
+    """(vocab,) sampling distribution for one position: temperature, then top-k"""
+    logits = logits / temperature
+    if top_k:
+        kth = torch.topk(logits, min(top_k, logits.size(-1))).values[-1]
+        logits = logits.masked_fill(logits < kth, float("-inf"))
+    return F.softmax(logits, dim=-1)
+
+
+def verify_token(probs, draft_token, generator=None):
+    """
+    Speculative sampling for a point-mass draft: (True, draft_token) with
+    probability probs[draft_token], else (False, a token drawn from probs
+    without draft_token)
+    """
+    accept = probs[draft_token].item()
+    if torch.rand(1, generator=generator, device=probs.device).item() < accept:
+        return True, draft_token
+    residual = probs.clone()
+    residual[draft_token] = 0
+    return False, torch.multinomial(residual, 1, generator=generator).item()
+
+
+@torch.no_grad()
+def speculative_generate(
+    model,
+    prompt_ids,
+    draft,
+    stop_ids,
+    max_new_tokens=200,
+    temperature=TEMPERATURE,
+    top_k=TOP_K,
+    max_draft=MAX_DRAFT,
+    generator=None,
+    grammar=None,
+    device="cpu",
+    stats=None
+):
+    """
+    New token ids for one prompt (ending with a stop id when one was drawn).
+    Works with the eager model and CompiledLM. grammar (a one-row
+    StructuredGrammar) masks every verified position, as in
+    generate_batch_ids. stats, a dict, receives forward pass / draft counts.
+    """
+    max_new_tokens = min(max_new_tokens, model.max_len - len(prompt_ids))
+    stop = set(stop_ids)
+    stats = {} if stats is None else stats
+    stats.update(forward_passes=0, drafted=0, accepted=0)
+
+    cache = model.new_cache(batch_size=1)
+    if len(prompt_ids) > 1:
+        model.forward_cached(torch.tensor([prompt_ids[:-1]], device=device), cache)
+        stats["forward_passes"] += 1
+    # The pending token is in the output but not yet in the cache
+    context, pending, output = list(prompt_ids[:-1]), prompt_ids[-1], []
+
+    while len(output) < max_new_tokens:
+        context.append(pending)
+        budget = max_new_tokens - len(output) - 1
+        proposal = draft.propose(context, min(max_draft, budget)) if budget > 0 else []
+
+        start = cache.length
+        logits = model.forward_cached(torch.tensor([[pending] + proposal], device=device), cache)[0]
+        stats["forward_passes"] += 1
+        stats["drafted"] += len(proposal)
+
+        # Position i scores the token after input i: proposal[i], or a new token after the last one
+        new_tokens = []
+        for position in range(len(proposal) + 1):
+            position_logits = logits[position]
+            if grammar is not None:
+                position_logits = grammar.mask_logits(position_logits[None])[0]
+            if position < len(proposal):
+                if temperature <= 0:
+                    token = position_logits.argmax().item()
+                    accepted = token == proposal[position]
+                else:
+                    probs = next_token_probs(position_logits, temperature, top_k)
+                    accepted, token = verify_token(probs, proposal[position], generator)
+            else:
+                accepted = False
+                if temperature <= 0:
+                    token = position_logits.argmax().item()
+                else:
+                    probs = next_token_probs(position_logits, temperature, top_k)
+                    token = torch.multinomial(probs, 1, generator=generator).item()
+
+            new_tokens.append(token)
+            stats["accepted"] += accepted
+            if grammar is not None:
+                grammar.advance(torch.tensor([token], device=grammar.state.device))
+            if token in stop or not accepted:
+                break
+
+        # Keep the pending token and the accepted drafts; the last new token is the next pending one
+        cache.truncate(start + len(new_tokens))
+        context.extend(new_tokens[:-1])
+        output.extend(new_tokens)
+        pending = new_tokens[-1]
+        if pending in stop:
+            break
+
+    return output[:max_new_tokens]
@@ -0,0 +1,34 @@
+"""
+Parsing of generated structured blocks:
+<LEVEL> ... <QUESTION> ... <OPTION_A> ... <OPTION_D> ... <END>
+Kept free of torch/tokenizers so the web server can import it.
+"""
+
+def block_prompt(level):
+    """Corpus layout up to <QUESTION>: the model writes the rest of the block"""
+    return f"<LEVEL> {level}\n<QUESTION>"
+
+
+def parse_block(text):
+    question = ""
+    options = []
+
+    # Extract question
+    if "<QUESTION>" in text:
+        q = text.split("<QUESTION>", 1)[1]
+        for tag in ["<OPTION_A>", "<OPTION_B>", "<OPTION_C>", "<OPTION_D>"]:
+            if tag in q:
+                q = q.split(tag, 1)[0]
+                break
+        question = q.strip()
+
+    # Extract options
+    for tag in ["<OPTION_A>", "<OPTION_B>", "<OPTION_C>", "<OPTION_D>"]:
+        if tag in text:
+            part = text.split(tag, 1)[1]
+            for stop in ["<OPTION_A>", "<OPTION_B>", "<OPTION_C>", "<OPTION_D>", "<END>"]:
+                if stop in part:
+                    part = part.split(stop, 1)[0]
+            options.append(part.strip())
+
+    return question, options
@@ -1,7 +1,68 @@
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import math
 
+class KVCache:
+    """
+    Per-layer key/value buffers for incremental decoding.
+    Preallocated to max_len, so appending a token is an in-place write
+    instead of a torch.cat over the whole prefix.
+    Also tracks which cached positions are padding (left-padded batches)
+    and how many real tokens each row has, which sets its next position.
+    """
+
+    def __init__(self, num_layers, batch_size, num_heads, head_dim, max_len, device, dtype):
+        shape = (batch_size, num_heads, max_len, head_dim)
+        self.keys = [torch.empty(shape, device=device, dtype=dtype) for _ in range(num_layers)]
+        self.values = [torch.empty(shape, device=device, dtype=dtype) for _ in range(num_layers)]
+        self.valid = torch.zeros(batch_size, max_len, dtype=torch.bool, device=device)
+        self.real_tokens = torch.zeros(batch_size, dtype=torch.long, device=device)
+        self.has_padding = False
+        self.length = 0
+        self.max_len = max_len
+
+    @property
+    def batch_size(self):
+        return self.valid.size(0)
+
+    def append(self, layer, k, v):
+        """Store k/v (batch, heads, new_len, head_dim) after the cached prefix; returns the full prefix"""
+        start, end = self.length, self.length + k.size(2)
+        self.keys[layer][:, :, start:end] = k
+        self.values[layer][:, :, start:end] = v
+        return self.keys[layer][:, :, :end], self.values[layer][:, :, :end]
+
+    def prefix(self):
+        """Compact copies of the cached keys/values (no max_len padding), e.g. to reuse a prompt"""
+        keys = [k[:, :, :self.length].clone() for k in self.keys]
+        values = [v[:, :, :self.length].clone() for v in self.values]
+        return keys, values
+
+    def fill_prefix(self, keys, values):
+        """Start every row from a padding-free prefix taken with prefix() (broadcast over the batch)"""
+        length = keys[0].size(2)
+        for layer, (k, v) in enumerate(zip(keys, values)):
+            self.keys[layer][:, :, :length] = k
+            self.values[layer][:, :, :length] = v
+        self.valid[:, :length] = True
+        self.real_tokens.fill_(length)
+        self.length = length
+
+    def truncate(self, length):
+        """Forget every position from `length` on (e.g. rejected speculative tokens)"""
+        self.valid[:, length:] = False
+        self.real_tokens = self.valid[:, :length].sum(dim=1)
+        self.length = length
+
+    def select(self, rows):
+        """Keep only the given batch rows (e.g. drop finished sequences)"""
+        self.keys = [k.index_select(0, rows) for k in self.keys]
+        self.values = [v.index_select(0, rows) for v in self.values]
+        self.valid = self.valid.index_select(0, rows)
+        self.real_tokens = self.real_tokens.index_select(0, rows)
+
+
 class TinyTransformerLM(nn.Module):
     def __init__(
         self,
@@ -10,10 +71,27 @@ class TinyTransformerLM(nn.Module):
         num_heads=4,
         num_layers=2,
         max_len=128,
-        dropout=0.1
+        dropout=0.1,
+        causal=True
     ):
         super().__init__()
 
+        # Constructor arguments, saved with checkpoints (see from_checkpoint)
+        self.config = {
+            "vocab_size": vocab_size,
+            "embed_dim": embed_dim,
+            "num_heads": num_heads,
+            "num_layers": num_layers,
+            "max_len": max_len,
+            "dropout": dropout,
+            "causal": causal,
+        }
+        self.num_heads = num_heads
+        self.max_len = max_len
+        # causal=False reproduces the original unmasked (bidirectional) model,
+        # which is what checkpoints saved before causal training contain
+        self.causal = causal
+
         self.token_embedding = nn.Embedding(vocab_size, embed_dim)
         self.position_embedding = nn.Embedding(max_len, embed_dim)
 
@@ -33,19 +111,194 @@ class TinyTransformerLM(nn.Module):
 
         self.dropout = nn.Dropout(dropout)
 
-    def forward(self, input_ids):
+        # Built once and sliced per batch; not part of the state dict, so
+        # checkpoints load the same with or without it
+        self.register_buffer(
+            "causal_mask",
+            nn.Transformer.generate_square_subsequent_mask(max_len),
+            persistent=False
+        )
+
+    def forward(self, input_ids, causal=None, attention_mask=None, segment_ids=None):
         """
         input_ids: (batch_size, seq_len)
+        causal: override the model's attention mode (e.g. to evaluate a
+        bidirectional checkpoint the way generation sees it)
+        attention_mask: (batch_size, seq_len), 0 marks right padding that no
+        token may attend to (only matters for bidirectional attention)
+        segment_ids: (batch_size, seq_len) for packed rows (training/batching.py):
+        tokens only attend within their own segment and position ids restart
+        at each segment, so every packed sample is seen as if it were alone
         """
         batch_size, seq_len = input_ids.size()
+        causal = self.causal if causal is None else causal
 
         positions = torch.arange(0, seq_len, device=input_ids.device)
         positions = positions.unsqueeze(0).expand(batch_size, seq_len)
+        if segment_ids is not None:
+            # Offset of each token from the first token of its segment
+            starts = segment_ids != F.pad(segment_ids[:, :-1], (1, 0), value=-1)
+            positions = positions - torch.where(starts, positions, 0).cummax(dim=1).values
 
         x = self.token_embedding(input_ids) + self.position_embedding(positions)
         x = self.dropout(x)
 
-        x = self.transformer(x)
+        padding_mask = None
+        if attention_mask is not None:
+            padding_mask = torch.zeros(attention_mask.shape, dtype=x.dtype, device=x.device)
+            padding_mask = padding_mask.masked_fill(attention_mask == 0, float("-inf"))
+
+        if segment_ids is not None:
+            # Block-diagonal (and causal) mask, one copy per attention head
+            allowed = segment_ids[:, :, None] == segment_ids[:, None, :]
+            if causal:
+                allowed = allowed & (self.causal_mask[:seq_len, :seq_len] == 0)
+            mask = torch.zeros(allowed.shape, dtype=x.dtype, device=x.device).masked_fill(~allowed, float("-inf"))
+            mask = mask.repeat_interleave(self.num_heads, dim=0)
+            x = self.transformer(x, mask=mask, src_key_padding_mask=padding_mask)
+        elif causal:
+            # is_causal lets scaled-dot-product attention pick its fused causal kernels
+            mask = self.causal_mask[:seq_len, :seq_len].to(x.dtype)
+            x = self.transformer(x, mask=mask, src_key_padding_mask=padding_mask, is_causal=True)
+        else:
+            x = self.transformer(x, src_key_padding_mask=padding_mask)
 
         logits = self.lm_head(x)
         return logits
+
+    @property
+    def device(self):
+        """Where the weights live (CompiledLM has the same attribute)"""
+        return self.lm_head.weight.device
+
+    @classmethod
+    def from_checkpoint(cls, path, map_location=None, **overrides):
+        """
+        Rebuild a model from a training checkpoint. Checkpoints without a
+        saved config predate causal training: their sizes are read from the
+        weights and they load as causal=False. The file is memory-mapped, so
+        only the weights are read (not e.g. optimizer state in full checkpoints).
+        """
+        checkpoint = torch.load(path, map_location=map_location, mmap=True, weights_only=True)
+        state_dict = checkpoint["model_state_dict"]
+        config = checkpoint.get("config")
+        if config is None:
+            vocab_size, embed_dim = state_dict["token_embedding.weight"].shape
+            config = {
+                "vocab_size": vocab_size,
+                "embed_dim": embed_dim,
+                "num_layers": len({k.split(".")[2] for k in state_dict if k.startswith("transformer.layers.")}),
+                "max_len": state_dict["position_embedding.weight"].shape[0],
+                "causal": False,
+            }
+        model = cls(**{**config, **overrides})
+        model.load_state_dict(state_dict)
+        return model
+
+    # ================= INCREMENTAL DECODING =================
+    # Each token's keys/values are computed once, when it is fed, and reused
+    # for every later step: a prompt prefill plus one O(prefix) attention per
+    # new token, instead of re-running the whole prefix every step.
+    # This is exactly equivalent to the causal forward pass (causal=True).
+    # Bidirectional models (legacy checkpoints) can't be decoded this way:
+    # every token attends to the ones after it, so cached keys/values go stale.
+
+    def _require_causal(self):
+        if not self.causal:
+            raise ValueError(
+                "This model is bidirectional (causal=False, e.g. a checkpoint saved before causal "
+                "training), so KV-cached decoding would use an attention pattern it was never "
+                "trained with. Retrain it with CAUSAL = True (training/train_structured.py), or "
+                "load it with from_checkpoint(path, causal=True) to decode it causally anyway."
+            )
+
+    def new_cache(self, batch_size, device=None, dtype=None):
+        self._require_causal()
+        embed_dim = self.token_embedding.embedding_dim
+        return KVCache(
+            num_layers=len(self.transformer.layers),
+            batch_size=batch_size,
+            num_heads=self.num_heads,
+            head_dim=embed_dim // self.num_heads,
+            max_len=self.max_len,
+            device=device or self.lm_head.weight.device,
+            dtype=dtype or self.lm_head.weight.dtype
+        )
+
+    def _cached_attention(self, layer, index, x, cache, mask):
+        attn = layer.self_attn
+        batch_size, new_len, embed_dim = x.shape
+        head_dim = embed_dim // self.num_heads
+
+        q, k, v = F.linear(x, attn.in_proj_weight, attn.in_proj_bias).chunk(3, dim=-1)
+        q, k, v = (
+            t.view(batch_size, new_len, self.num_heads, head_dim).transpose(1, 2)
+            for t in (q, k, v)
+        )
+        keys, values = cache.append(index, k, v)
+
+        out = F.scaled_dot_product_attention(q, keys, values, attn_mask=mask)
+        out = out.transpose(1, 2).reshape(batch_size, new_len, embed_dim)
+        return attn.out_proj(out)
+
+    def _cached_layer(self, layer, index, x, cache, mask):
+        # Same computation as nn.TransformerEncoderLayer (post-norm) in eval mode
+        if layer.norm_first:
+            x = x + self._cached_attention(layer, index, layer.norm1(x), cache, mask)
+            return x + layer.linear2(layer.activation(layer.linear1(layer.norm2(x))))
+        x = layer.norm1(x + self._cached_attention(layer, index, x, cache, mask))
+        return layer.norm2(x + layer.linear2(layer.activation(layer.linear1(x))))
+
+    def _cached_mask(self, cache, start, end):
+        """
+        Boolean (batch, 1, new_len, end) attention mask for the new tokens,
+        or None when plain full attention is correct (single step, no padding).
+        """
+        new_len = end - start
+        if new_len == 1 and not cache.has_padding:
+            return None
+        device = cache.valid.device
+        # New tokens see the whole cached prefix and the new tokens before them
+        mask = torch.ones(new_len, end, dtype=torch.bool, device=device).tril(start)
+        if not cache.has_padding:
+            return mask
+        mask = mask & cache.valid[:, None, :end]
+        # A padding query still attends to itself, so no row is fully masked (NaN)
+        own = torch.arange(end, device=device) == torch.arange(start, end, device=device)[:, None]
+        return (mask | own).unsqueeze(1)
+
+    @torch.no_grad()
+    def forward_cached(self, input_ids, cache, attention_mask=None):
+        """
+        Feed new tokens (batch_size, new_len) after those already in `cache`
+        and return their logits (batch_size, new_len, vocab_size).
+        Call with the whole prompt first (prefill), then one token at a time.
+        Causal models only (raises ValueError otherwise).
+        attention_mask (batch_size, new_len): 0 marks padding, e.g. for
+        left-padded prompts of different lengths; padded positions are never
+        attended to and don't advance a row's position ids.
+        """
+        self._require_causal()
+        new_len = input_ids.size(1)
+        start, end = cache.length, cache.length + new_len
+        if end > cache.max_len:
+            raise ValueError(f"Sequence would exceed max_len={cache.max_len}")
+
+        valid = (attention_mask.bool() if attention_mask is not None
+                 else torch.ones_like(input_ids, dtype=torch.bool))
+        cache.valid[:, start:end] = valid
+        cache.has_padding = cache.has_padding or not bool(valid.all())
+
+        # Position = number of real tokens before this one in its row
+        positions = (cache.real_tokens[:, None] + valid.cumsum(dim=1) - 1).clamp(min=0)
+        cache.real_tokens += valid.sum(dim=1)
+        x = self.token_embedding(input_ids) + self.position_embedding(positions)
+
+        mask = self._cached_mask(cache, start, end)
+        for index, layer in enumerate(self.transformer.layers):
+            x = self._cached_layer(layer, index, x, cache, mask)
+        if self.transformer.norm is not None:
+            x = self.transformer.norm(x)
+
+        cache.length = end
+        return self.lm_head(x)
@@ -0,0 +1,58 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+from tokenizers import Tokenizer
+
+from model.tiny_transformer import TinyTransformerLM
+from inference.batch_generate import generate_batch_ids, stop_token_ids, STRUCTURED_STOP_TOKENS
+from inference.constrained import block_prompt
+
+# ================= CONFIG =================
+MAX_LEN = 256
+NEW_TOKENS = 60            # structured blocks are at most ~56 tokens
+BATCH_SIZES = (1, 4, 16, 64)
+LEVELS = ("academic", "reasoning", "emotional")
+
+
+def questions_per_second(model, prompt_ids, stop_ids, pad_id, batch_size, total):
+    prompts = [prompt_ids[i % len(prompt_ids)] for i in range(batch_size)]
+    generator = torch.Generator().manual_seed(0)
+    generate_batch_ids(model, prompts, stop_ids, pad_id, NEW_TOKENS, generator=generator)  # warm-up
+
+    start = time.perf_counter()
+    for _ in range(max(1, total // batch_size)):
+        generate_batch_ids(model, prompts, stop_ids, pad_id, NEW_TOKENS, generator=generator)
+    elapsed = time.perf_counter() - start
+    return max(1, total // batch_size) * batch_size / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Questions/sec of batched generation by batch size")
+    parser.add_argument("--questions", type=int, default=64, help="questions generated per batch size")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    tokenizer = Tokenizer.from_file("tokenizer/tokenizer.json")
+    prompt_ids = [tokenizer.encode(block_prompt(level)).ids for level in LEVELS]
+    pad_id = tokenizer.token_to_id("[PAD]")
+
+    # Random weights: the <END> stop rarely fires, so every row runs NEW_TOKENS
+    # steps and this measures the worst case
+    torch.manual_seed(0)
+    model = TinyTransformerLM(vocab_size=tokenizer.get_vocab_size(), max_len=MAX_LEN)
+    model.eval()
+    stop_ids = stop_token_ids(tokenizer, STRUCTURED_STOP_TOKENS)
+
+    print(f"New tokens: {NEW_TOKENS} | Threads: {torch.get_num_threads()}\n")
+    baseline = None
+    for batch_size in BATCH_SIZES:
+        rate = questions_per_second(model, prompt_ids, stop_ids, pad_id, batch_size, args.questions)
+        baseline = baseline or rate
+        print(f"batch {batch_size:>3}: {rate:8.1f} questions/sec  ({rate / baseline:.1f}x)")
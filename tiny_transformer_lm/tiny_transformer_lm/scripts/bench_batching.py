@@ -0,0 +1,76 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+import torch.nn as nn
+from tokenizers import Tokenizer
+
+from training.dataset import QuestionDataset
+from training.structured_dataset import StructuredDataset
+from training.batching import make_loader, BATCHING_MODES, PackedDataset
+from model.tiny_transformer import TinyTransformerLM
+
+# ================= CONFIG =================
+TOKENIZER_PATH = "tokenizer/tokenizer.json"
+DATASETS = {
+    "questions": (QuestionDataset, "data/final/final_dataset.json", 64, 16),
+    "structured": (StructuredDataset, "data/structured/structured_corpus.txt", 256, 8),
+}
+STEPS = 60
+
+
+def train_tokens_per_second(model, loader, pad_id, steps):
+    """Real (non-[PAD]) target tokens trained per second over `steps` optimizer steps"""
+    criterion = nn.CrossEntropyLoss(ignore_index=pad_id)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=3e-4)
+    model.train()
+
+    batches = iter(loader)
+    real, padded, elapsed = 0, 0, 0.0
+    for step in range(steps + 1):
+        try:
+            x, y, segment_ids = next(batches)
+        except StopIteration:
+            batches = iter(loader)
+            x, y, segment_ids = next(batches)
+        start = time.perf_counter()
+        optimizer.zero_grad()
+        logits = model(x, segment_ids=segment_ids)
+        loss = criterion(logits.reshape(-1, logits.size(-1)), y.reshape(-1))
+        loss.backward()
+        optimizer.step()
+        if step:  # step 0 is warm-up
+            elapsed += time.perf_counter() - start
+            real += (y != pad_id).sum().item()
+            padded += y.numel()
+    return real / elapsed, real / padded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Training tokens/sec by batching mode (pad / bucket / pack)")
+    parser.add_argument("--steps", type=int, default=STEPS)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    vocab_size = Tokenizer.from_file(TOKENIZER_PATH).get_vocab_size()
+    for name, (dataset_cls, path, max_length, batch_size) in DATASETS.items():
+        dataset = dataset_cls(path, TOKENIZER_PATH, max_length=max_length)
+        packed_rows = len(PackedDataset(dataset))
+        print(f"\n{name}: {len(dataset)} samples, max_length {max_length}, batch {batch_size} "
+              f"({packed_rows} packed rows) | Threads: {torch.get_num_threads()}")
+        print(f"{'mode':<8} {'real tok/s':>11} {'speedup':>8} {'real/padded':>12}")
+
+        baseline = None
+        for mode in BATCHING_MODES:
+            torch.manual_seed(0)
+            model = TinyTransformerLM(vocab_size=vocab_size, max_len=max_length, causal=True)
+            loader = make_loader(dataset, batch_size=batch_size, mode=mode)
+            rate, fill = train_tokens_per_second(model, loader, dataset.pad_id, args.steps)
+            baseline = baseline or rate
+            print(f"{mode:<8} {rate:>11.0f} {rate / baseline:>7.1f}x {fill:>11.0%}")
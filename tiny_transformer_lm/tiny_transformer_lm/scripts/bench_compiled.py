@@ -0,0 +1,98 @@
+import sys
+import math
+import time
+import argparse
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+from tokenizers import Tokenizer
+
+from training.structured_dataset import StructuredDataset
+from model.tiny_transformer import TinyTransformerLM
+from inference.compiled_lm import CompiledLM, export_compiled
+from inference.constrained import block_prompt
+from eval_perplexity import split_dataset, CORPUS_PATH, TOKENIZER_PATH, MAX_LENGTH, BATCH_SIZE
+
+# ================= CONFIG =================
+NEW_TOKENS = 100
+REPEATS = 5
+
+
+@torch.no_grad()
+def perplexity(model, loader, pad_id):
+    """Causal held-out perplexity; works for the eager model and CompiledLM"""
+    criterion = nn.CrossEntropyLoss(ignore_index=pad_id, reduction="sum")
+    total_loss, total_tokens = 0.0, 0
+    for x, y in loader:
+        logits = model(x)
+        total_loss += criterion(logits.reshape(-1, logits.size(-1)), y.reshape(-1)).item()
+        total_tokens += (y != pad_id).sum().item()
+    return math.exp(total_loss / total_tokens)
+
+
+@torch.no_grad()
+def greedy_tokens_per_second(model, prompt_ids, new_tokens):
+    def run():
+        cache = model.new_cache(batch_size=1)
+        logits = model.forward_cached(torch.tensor([prompt_ids]), cache)
+        for step in range(new_tokens):
+            next_id = logits[0, -1].argmax().item()
+            if step + 1 < new_tokens:
+                logits = model.forward_cached(torch.tensor([[next_id]]), cache)
+
+    run()  # warm-up (TorchScript optimizes on the first calls)
+    run()
+    best = min(timed(run) for _ in range(REPEATS))
+    return new_tokens / best
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="fp32 checkpoint vs compiled artifacts: perplexity, load time, tokens/sec")
+    parser.add_argument("--checkpoint", required=True)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+    pad_id = tokenizer.token_to_id("[PAD]")
+    dataset = StructuredDataset(CORPUS_PATH, TOKENIZER_PATH, max_length=MAX_LENGTH)
+    _, held_out = split_dataset(dataset)
+    loader = DataLoader(held_out, batch_size=BATCH_SIZE)
+    prompt_ids = tokenizer.encode(block_prompt("academic")).ids
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = TinyTransformerLM.from_checkpoint(args.checkpoint, map_location="cpu")
+        artifacts = {}
+        for name, quantize in (("TorchScript fp32", False), ("TorchScript int8", True)):
+            artifacts[name] = Path(tmp) / f"{quantize}.pt"
+            export_compiled(model, artifacts[name], quantize=quantize)
+
+        loaders = {"eager fp32 (checkpoint)": lambda: TinyTransformerLM.from_checkpoint(args.checkpoint).eval()}
+        loaders.update({name: (lambda path=path: CompiledLM(path)) for name, path in artifacts.items()})
+
+        new_tokens = min(NEW_TOKENS, model.max_len - len(prompt_ids))
+        print(f"Held-out blocks: {len(held_out)} | New tokens: {new_tokens} | Threads: {torch.get_num_threads()}\n")
+        print(f"{'model':<26} {'size MB':>8} {'load ms':>8} {'ppl':>8} {'delta':>8} {'tokens/s':>9}")
+
+        baseline = None
+        for name, load in loaders.items():
+            path = artifacts.get(name, Path(args.checkpoint))
+            load_ms = min(timed(load) for _ in range(REPEATS)) * 1000
+            loaded = load()
+            ppl = perplexity(loaded, loader, pad_id)
+            baseline = baseline or ppl
+            rate = greedy_tokens_per_second(loaded, prompt_ids, new_tokens)
+            size_mb = path.stat().st_size / 1e6
+            print(f"{name:<26} {size_mb:>8.2f} {load_ms:>8.1f} {ppl:>8.3f} {ppl - baseline:>+8.3f} {rate:>9.0f}")
@@ -0,0 +1,75 @@
+import sys
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+import torch.distributed as dist
+from tokenizers import Tokenizer
+from torch.nn.parallel import DistributedDataParallel
+
+from training.structured_dataset import StructuredDataset
+from training.engine import Trainer, configure_threads, make_train_loader
+from training.distributed import spawn
+from model.tiny_transformer import TinyTransformerLM
+
+# ================= CONFIG =================
+CORPUS_PATH = "data/structured/structured_corpus.txt"
+TOKENIZER_PATH = "tokenizer/tokenizer.json"
+MAX_LENGTH = 256
+BATCH_SIZE = 8            # per rank
+WORLD_SIZES = (1, 2, 4, 8)
+
+
+class FirstSamples(torch.utils.data.Dataset):
+    """The first n samples of a tokenized dataset, with the attributes make_loader() uses"""
+
+    def __init__(self, dataset, n):
+        self.dataset = dataset
+        self.corpus, self.pad_id, self.max_length = dataset.corpus, dataset.pad_id, dataset.max_length
+        self.lengths = dataset.lengths[:n]
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, idx):
+        return self.dataset[idx]
+
+
+def run_rank(rank, world_size, samples, results):
+    configure_threads(num_workers=0, world_size=world_size)
+    dataset = FirstSamples(StructuredDataset(CORPUS_PATH, TOKENIZER_PATH, max_length=MAX_LENGTH), samples)
+    loader = make_train_loader(dataset, BATCH_SIZE, mode="bucket", num_workers=0,
+                               num_replicas=world_size, rank=rank)
+
+    vocab_size = Tokenizer.from_file(TOKENIZER_PATH).get_vocab_size()
+    torch.manual_seed(0)
+    model = TinyTransformerLM(vocab_size=vocab_size, max_len=MAX_LENGTH, causal=True)
+    if world_size > 1:
+        model = DistributedDataParallel(model)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=3e-4)
+    trainer = Trainer(model, optimizer, dataset.pad_id, log_every=10 ** 9)
+
+    trainer.train_epoch(loader, epoch=0, epochs=1)  # warm-up
+    loss, tokens_per_second = trainer.train_epoch(loader, epoch=1, epochs=1)
+    if rank == 0:
+        results.put((loss, tokens_per_second, torch.get_num_threads()))
+    if world_size > 1:
+        dist.barrier()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Data-parallel (gloo) training tokens/sec by number of ranks")
+    parser.add_argument("--samples", type=int, default=1024, help="structured blocks per epoch")
+    parser.add_argument("--ranks", type=int, nargs="+", default=WORLD_SIZES)
+    args = parser.parse_args()
+
+    results = torch.multiprocessing.get_context("spawn").SimpleQueue()
+    print(f"{args.samples} blocks per epoch | batch {BATCH_SIZE} per rank | bucket batching\n")
+    print(f"{'ranks':>5} {'threads/rank':>12} {'tokens/s':>9} {'speedup':>8} {'loss':>7}")
+    baseline = None
+    for world_size in args.ranks:
+        spawn(run_rank, world_size, args.samples, results)
+        loss, tokens_per_second, threads = results.get()
+        baseline = baseline or tokens_per_second
+        print(f"{world_size:>5} {threads:>12} {tokens_per_second:>9.0f} {tokens_per_second / baseline:>7.2f}x {loss:>7.3f}")
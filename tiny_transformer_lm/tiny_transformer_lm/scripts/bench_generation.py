@@ -0,0 +1,87 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+from tokenizers import Tokenizer
+
+from model.tiny_transformer import TinyTransformerLM
+
+# ================= CONFIG =================
+MAX_LEN = 256
+NEW_TOKENS = 200
+REPEATS = 5
+
+PROMPT = (
+    "<LEVEL> academic\n"
+    "<QUESTION> "
+    "<OPTION_A> "
+    "<OPTION_B> "
+    "<OPTION_C> "
+    "<OPTION_D> "
+)
+
+# ================= DECODING PATHS =================
+@torch.no_grad()
+def generate_full(model, prompt_ids, new_tokens):
+    """Old path: re-run the whole prefix every step, growing it with torch.cat"""
+    input_ids = torch.tensor([prompt_ids])
+    for _ in range(new_tokens):
+        logits = model(input_ids)
+        next_id = logits[0, -1].argmax().item()
+        input_ids = torch.cat([input_ids, torch.tensor([[next_id]])], dim=1)
+    return input_ids[0].tolist()
+
+
+@torch.no_grad()
+def generate_cached(model, prompt_ids, new_tokens):
+    """Prefill once, then one token per step through the KV cache"""
+    cache = model.new_cache(batch_size=1)
+    logits = model.forward_cached(torch.tensor([prompt_ids]), cache)
+    generated = list(prompt_ids)
+    for step in range(new_tokens):
+        next_id = logits[0, -1].argmax().item()
+        generated.append(next_id)
+        if step + 1 < new_tokens:
+            logits = model.forward_cached(torch.tensor([[next_id]]), cache)
+    return generated
+
+
+def timed(fn, *args):
+    fn(*args)  # warm-up
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-prefix vs KV-cached generation latency")
+    parser.add_argument("--tokens", type=int, default=NEW_TOKENS)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    tokenizer = Tokenizer.from_file("tokenizer/tokenizer.json")
+    prompt_ids = tokenizer.encode(PROMPT).ids
+
+    # Random weights: latency doesn't depend on training
+    torch.manual_seed(0)
+    model = TinyTransformerLM(vocab_size=tokenizer.get_vocab_size(), max_len=MAX_LEN)
+    model.eval()
+
+    new_tokens = min(args.tokens, MAX_LEN - len(prompt_ids))
+    print(f"Prompt: {len(prompt_ids)} tokens | New tokens: {new_tokens} | Threads: {torch.get_num_threads()}\n")
+
+    full = timed(generate_full, model, prompt_ids, new_tokens)
+    cached = timed(generate_cached, model, prompt_ids, new_tokens)
+
+    print(f"Full prefix : {full * 1000:8.1f} ms  ({full / new_tokens * 1000:.2f} ms/token)")
+    print(f"KV cache    : {cached * 1000:8.1f} ms  ({cached / new_tokens * 1000:.2f} ms/token)")
+    print(f"\nSpeedup: {full / cached:.2f}x")
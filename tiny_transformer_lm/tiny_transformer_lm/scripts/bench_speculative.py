@@ -0,0 +1,108 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import torch
+from tokenizers import Tokenizer
+
+from model.tiny_transformer import TinyTransformerLM
+from inference.compiled_lm import load_model
+from inference.batch_generate import sample_next, stop_token_ids, TOP_K
+from inference.constrained import block_prompt
+from inference.speculative import NGramDraft, speculative_generate, MAX_DRAFT
+
+# ================= CONFIG =================
+TOKENIZER_PATH = "tokenizer/tokenizer.json"
+CORPUS_PATH = "data/structured/structured_corpus.txt"
+LEVELS = ("emotional", "reasoning", "academic")
+QUESTIONS = 30
+MAX_NEW_TOKENS = 120
+
+
+@torch.no_grad()
+def plain_generate(model, prompt_ids, stop, max_new_tokens, temperature, generator):
+    """One KV-cached forward pass per new token"""
+    cache = model.new_cache(batch_size=1)
+    logits = model.forward_cached(torch.tensor([prompt_ids]), cache)[:, -1]
+    output = []
+    for step in range(max_new_tokens):
+        next_id = sample_next(logits, temperature, TOP_K, generator)
+        output.append(next_id.item())
+        if output[-1] in stop or step + 1 == max_new_tokens:
+            break
+        logits = model.forward_cached(next_id[:, None], cache)[:, -1]
+    return output
+
+
+def run(fn, prompts):
+    """(new tokens, forward passes, per-question latencies in ms, drafted, accepted)"""
+    tokens = passes = drafted = accepted = 0
+    latencies = []
+    for prompt_ids in prompts:
+        stats = {}
+        start = time.perf_counter()
+        output = fn(prompt_ids, stats)
+        latencies.append((time.perf_counter() - start) * 1000)
+        tokens += len(output)
+        passes += stats.get("forward_passes", len(output))
+        drafted += stats.get("drafted", 0)
+        accepted += stats.get("accepted", 0)
+    return tokens, passes, np.array(latencies), drafted, accepted
+
+
+def report(name, tokens, passes, latencies, drafted, accepted):
+    acceptance = f"{accepted / drafted:6.1%}" if drafted else "     -"
+    print(
+        f"{name:<22} {tokens / len(latencies):7.1f} {passes / len(latencies):8.1f} {acceptance} "
+        f"{tokens / latencies.sum() * 1000:9.0f} {np.percentile(latencies, 50):8.1f} {np.percentile(latencies, 95):8.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plain vs n-gram speculative decoding at batch size 1")
+    parser.add_argument("--checkpoint", default=None, help="trained checkpoint (default: random weights, max_len 256)")
+    parser.add_argument("--artifact", default=None, help="compiled artifact (scripts/export_model.py)")
+    parser.add_argument("--questions", type=int, default=QUESTIONS)
+    parser.add_argument("--max-draft", type=int, default=MAX_DRAFT)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+    if args.checkpoint or args.artifact:
+        model = load_model(args.checkpoint, args.artifact)
+    else:
+        torch.manual_seed(0)
+        model = TinyTransformerLM(vocab_size=tokenizer.get_vocab_size(), max_len=256, causal=True).eval()
+
+    start = time.perf_counter()
+    draft = NGramDraft.from_corpus(CORPUS_PATH, TOKENIZER_PATH)
+    print(f"Draft table: {sum(map(len, draft.tables))} contexts in {time.perf_counter() - start:.2f} s")
+
+    stop = set(stop_token_ids(tokenizer, ("<END>",)))
+    prompts = [tokenizer.encode(block_prompt(LEVELS[i % len(LEVELS)])).ids for i in range(args.questions)]
+    max_new_tokens = min(MAX_NEW_TOKENS, model.max_len - max(map(len, prompts)))
+    print(f"Questions: {args.questions} | Max new tokens: {max_new_tokens} | Threads: {torch.get_num_threads()}\n")
+    print(f"{'':<22} {'tokens':>7} {'passes':>8} {'accept':>6} {'tokens/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+
+    for temperature in (0.0, 0.7):
+        label = "greedy" if temperature <= 0 else f"T={temperature}"
+        generator = torch.Generator().manual_seed(0)
+        plain = lambda ids, stats: plain_generate(model, ids, stop, max_new_tokens, temperature, generator)
+        generator_spec = torch.Generator().manual_seed(0)
+        speculative = lambda ids, stats: speculative_generate(
+            model, ids, draft, stop, max_new_tokens, temperature=temperature, max_draft=args.max_draft,
+            generator=generator_spec, stats=stats
+        )
+
+        plain(prompts[0], {}), speculative(prompts[0], {})  # warm-up
+        plain_result = run(plain, prompts)
+        speculative_result = run(speculative, prompts)
+        report(f"plain {label}", *plain_result)
+        report(f"speculative {label}", *speculative_result)
+        print(f"{'':<22} mean latency speedup: {plain_result[2].mean() / speculative_result[2].mean():.2f}x\n")
@@ -0,0 +1,49 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+from tokenizers import Tokenizer
+
+from training.dataset import QuestionDataset
+from training.engine import Trainer, configure_threads, make_train_loader
+from model.tiny_transformer import TinyTransformerLM
+
+# ================= CONFIG =================
+DATA_PATH = "data/final/final_dataset.json"
+TOKENIZER_PATH = "tokenizer/tokenizer.json"
+MAX_LENGTH = 64
+BATCH_SIZE = 16
+# (batching, loader workers, bf16)
+SETUPS = (
+    ("pad", 0, False),        # the scripts before the shared engine
+    ("bucket", 0, False),
+    ("bucket", 2, False),
+    ("bucket", 2, True),
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Epoch time of the training engine by setup (QuestionDataset)")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    threads = configure_threads(args.threads, num_workers=0)
+    dataset = QuestionDataset(DATA_PATH, TOKENIZER_PATH, max_length=MAX_LENGTH)
+    vocab_size = Tokenizer.from_file(TOKENIZER_PATH).get_vocab_size()
+    print(f"{len(dataset)} questions | batch {BATCH_SIZE} | Threads: {threads}\n")
+    print(f"{'batching':<9} {'workers':>7} {'bf16':>5} {'epoch s':>8} {'tokens/s':>9} {'loss':>7}")
+
+    for mode, workers, bf16 in SETUPS:
+        torch.manual_seed(0)
+        model = TinyTransformerLM(vocab_size=vocab_size, max_len=MAX_LENGTH, causal=True)
+        optimizer = torch.optim.AdamW(model.parameters(), lr=3e-4)
+        trainer = Trainer(model, optimizer, dataset.pad_id, bf16=bf16, log_every=10 ** 9)
+        loader = make_train_loader(dataset, BATCH_SIZE, mode=mode, num_workers=workers)
+
+        start = time.perf_counter()
+        loss, tokens_per_second = trainer.train_epoch(loader, epoch=1, epochs=1)
+        elapsed = time.perf_counter() - start
+        print(f"{mode:<9} {workers:>7} {str(bf16):>5} {elapsed:>8.1f} {tokens_per_second:>9.0f} {loss:>7.3f}")
@@ -0,0 +1,52 @@
+"""
+Shared test setup: seeded tiny models sized to the real tokenizer.
+
+Tests take the make_model / make_trainer fixtures; the __main__ runners
+(and helpers running outside pytest, e.g. spawned ranks) import the
+plain functions: from conftest import make_model, VOCAB_SIZE
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+import torch
+from tokenizers import Tokenizer
+from torch.nn.parallel import DistributedDataParallel
+
+from model.tiny_transformer import TinyTransformerLM
+from training.engine import Trainer
+
+ROOT = Path(__file__).resolve().parent.parent
+TOKENIZER_PATH = str(ROOT / "tokenizer/tokenizer.json")
+CORPUS_PATH = str(ROOT / "data/structured/structured_corpus.txt")
+VOCAB_SIZE = Tokenizer.from_file(TOKENIZER_PATH).get_vocab_size()
+
+
+def make_model(max_len=64, seed=0, **kwargs):
+    """TinyTransformerLM in eval mode, the same weights for the same seed"""
+    torch.manual_seed(seed)
+    return TinyTransformerLM(vocab_size=VOCAB_SIZE, max_len=max_len, **kwargs).eval()
+
+
+def make_trainer(dropout=0.0, optimizer=torch.optim.SGD, lr=0.1, wrap=False, **trainer_kwargs):
+    """
+    Trainer over a seeded max_len 32 model (pad_id 0, no loss logging);
+    wrap=True trains it through DistributedDataParallel
+    """
+    torch.manual_seed(0)
+    model = TinyTransformerLM(vocab_size=VOCAB_SIZE, max_len=32, dropout=dropout)
+    trainer_kwargs.setdefault("log_every", 1000)
+    return Trainer(DistributedDataParallel(model) if wrap else model, optimizer(model.parameters(), lr=lr),
+                   pad_id=0, **trainer_kwargs)
+
+
+@pytest.fixture(name="make_model")
+def make_model_fixture():
+    return make_model
+
+
+@pytest.fixture(name="make_trainer")
+def make_trainer_fixture():
+    return make_trainer
@@ -0,0 +1,67 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+from tokenizers import Tokenizer
+
+from inference.compiled_lm import CompiledLM, load_model
+from evaluation.harness import evaluate, compare, TOKENIZER_PATH, GENERATED_QUESTIONS
+
+# ================= CONFIG =================
+RESULTS_DIR = Path("eval_results")
+
+
+def print_results(results):
+    print(f"Model: {results['model']} | Threads: {results['environment']['threads']}")
+    for key, value in results["perplexity"].items():
+        print(f"  perplexity {key:<11} {value:>10.3f}  ({results['split'][f'{key}_samples']} held-out samples)")
+    speed = results["generation"]
+    if "skipped" in speed:
+        print(f"  generation and parse rate skipped: {speed['skipped']}")
+        return
+    print(f"  prefill tokens/s       {speed['prefill_tokens_per_sec']:>10.0f}")
+    print(f"  decode tokens/s        {speed['decode_tokens_per_sec']:>10.0f}")
+    print(f"  latency p50 / p95 ms   {speed['latency_ms']['p50']:>10.1f} / {speed['latency_ms']['p95']:.1f}"
+          f"  ({speed['questions']} questions, {speed['mean_new_tokens']:.0f} new tokens each)")
+    for key, value in results["parse_rate"].items():
+        print(f"  parse rate {key:<11} {value:>10.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Held-out perplexity, generation speed and parse rate as JSON")
+    parser.add_argument("--checkpoint", required=True)
+    parser.add_argument("--artifact", default=None, help="compiled artifact (scripts/export_model.py) to evaluate instead")
+    parser.add_argument("--questions", type=int, default=GENERATED_QUESTIONS)
+    parser.add_argument("--out", default=None, help=f"results file (default {RESULTS_DIR}/<model>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+    model = load_model(args.checkpoint, args.artifact)
+    # load_model() falls back to the checkpoint (missing or stale artifact), so name what was loaded
+    name = Path(args.artifact if isinstance(model, CompiledLM) else args.checkpoint).name
+    results = evaluate(model, tokenizer, name, questions=args.questions)
+    print_results(results)
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{Path(name).stem}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved {out}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nAgainst {args.baseline} ({baseline['model']}):")
+        regressions = 0
+        for metric, old, new, change, worse in compare(baseline, results):
+            regressions += worse
+            print(f"  {metric:<36} {old:>10.3f} -> {new:>10.3f} {change:>+8.1%}{'  worse' if worse else ''}")
+        print(f"{regressions} metric(s) got worse")
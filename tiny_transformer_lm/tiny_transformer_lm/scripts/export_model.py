@@ -0,0 +1,25 @@
+import sys
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from model.tiny_transformer import TinyTransformerLM
+from inference.compiled_lm import export_compiled
+
+# ================= CONFIG =================
+CHECKPOINT_PATH = "checkpoints_structured/structured_epoch_5.pt"
+ARTIFACT_PATH = "checkpoints_structured/structured_int8.pt"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a checkpoint as an int8 TorchScript inference artifact")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--out", default=ARTIFACT_PATH)
+    parser.add_argument("--no-quantize", action="store_true", help="keep fp32 weights (TorchScript only)")
+    args = parser.parse_args()
+
+    model = TinyTransformerLM.from_checkpoint(args.checkpoint, map_location="cpu")
+    config = export_compiled(model, args.out, quantize=not args.no_quantize, source=args.checkpoint)
+
+    size_mb = Path(args.out).stat().st_size / 1e6
+    print(f"Saved {args.out} ({size_mb:.1f} MB, {'int8' if config['quantized'] else 'fp32'})")
@@ -0,0 +1,65 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+
+from inference.batch_generate import generate_batch_ids, left_pad
+
+PAD_ID = 0
+
+
+@torch.no_grad()
+def greedy_single(model, prompt_ids, stop_ids, max_new_tokens):
+    """Unbatched reference: greedy decoding with the plain causal forward pass"""
+    ids = list(prompt_ids)
+    for _ in range(max_new_tokens):
+        next_id = model(torch.tensor([ids]))[0, -1].argmax().item()
+        ids.append(next_id)
+        if next_id in stop_ids:
+            break
+    return ids[len(prompt_ids):]
+
+
+def test_left_padded_prefill_matches_each_prompt(make_model):
+    model = make_model()
+    prompts = [[5, 6, 7], [9, 10, 11, 12, 13, 14], [20]]
+    input_ids, attention_mask = left_pad(prompts, PAD_ID, "cpu")
+    assert attention_mask.sum(dim=1).tolist() == [3, 6, 1]
+
+    cache = model.new_cache(batch_size=3)
+    logits = model.forward_cached(input_ids, cache, attention_mask)[:, -1]
+    with torch.no_grad():
+        for row, ids in enumerate(prompts):
+            expected = model(torch.tensor([ids]))[0, -1]
+            assert torch.allclose(logits[row], expected, atol=1e-5)
+
+
+def test_batch_matches_single_prompt_generation(make_model):
+    model = make_model()
+    prompts = [[5, 6, 7], [9, 10, 11, 12, 13, 14], [20], [30, 31]]
+    # Stop on tokens the random model actually produces, so rows finish at different steps
+    first = [greedy_single(model, ids, set(), 1)[0] for ids in prompts]
+    stop_ids = first[:2]
+
+    outputs = generate_batch_ids(model, prompts, stop_ids, pad_id=PAD_ID,
+                                 max_new_tokens=20, temperature=0)
+    for ids, out in zip(prompts, outputs):
+        assert out == greedy_single(model, ids, set(stop_ids), 20)
+    # Rows that hit a stop id end with it; the rest ran to max_new_tokens
+    assert all(out[-1] in stop_ids or len(out) == 20 for out in outputs)
+    assert any(len(out) < 20 for out in outputs)
+
+
+def test_max_new_tokens_is_capped_by_max_len(make_model):
+    model = make_model()
+    outputs = generate_batch_ids(model, [[1] * 60, [2, 3]], [], max_new_tokens=50, temperature=0)
+    assert [len(out) for out in outputs] == [4, 4]
+
+
+if __name__ == "__main__":
+    from conftest import make_model
+    test_left_padded_prefill_matches_each_prompt(make_model)
+    test_batch_matches_single_prompt_generation(make_model)
+    test_max_new_tokens_is_capped_by_max_len(make_model)
+    print("Batched generation matches per-prompt decoding")
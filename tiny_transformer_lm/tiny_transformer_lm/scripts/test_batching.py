@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+
+from training.structured_dataset import StructuredDataset
+from training.batching import LengthBucketSampler, PackedDataset, make_loader
+from conftest import TOKENIZER_PATH, CORPUS_PATH
+
+
+def make_dataset():
+    return StructuredDataset(CORPUS_PATH, TOKENIZER_PATH, max_length=128)
+
+
+def test_bucket_sampler_covers_every_sample_once():
+    lengths = torch.randint(1, 100, (1000,)).numpy()
+    sampler = LengthBucketSampler(lengths, batch_size=16, bucket_batches=8)
+    batches = list(sampler)
+    assert len(batches) == len(sampler)
+    assert sorted(i for batch in batches for i in batch) == list(range(1000))
+    # Sorted buckets: each batch spans a narrow range of lengths
+    spread = sum(lengths[b].max() - lengths[b].min() for b in batches) / len(batches)
+    assert spread < 20
+    # A new order every pass
+    assert list(sampler) != batches
+
+
+def test_bucketed_batches_are_trimmed_fixed_batches():
+    dataset = make_dataset()
+    for x, y, segment_ids in make_loader(dataset, batch_size=8, mode="bucket"):
+        break
+    assert segment_ids is None and x.size(1) < 127
+    assert x[:, -1].ne(dataset.pad_id).any()  # trimmed to the longest sample, not further
+    idx = [i for i in range(len(dataset)) if dataset.lengths[i] - 1 <= x.size(1)]
+    fixed_x, fixed_y = dataset[idx[0]]
+    assert fixed_x[x.size(1):].eq(dataset.pad_id).all() and fixed_y[x.size(1):].eq(dataset.pad_id).all()
+
+
+def test_packed_rows_keep_samples_whole_and_apart():
+    dataset = make_dataset()
+    packed = PackedDataset(dataset)
+    assert sorted(i for row in packed.rows for i in row) == list(range(len(dataset)))
+    assert packed.fill_ratio > 0.8
+
+    x, y, segment_ids = packed[0]
+    first, second = packed.rows[0][:2]
+    length = int(dataset.lengths[first])
+    assert x[:length].tolist() == dataset.corpus[first].tolist()
+    assert x[length:length + 5].tolist() == dataset.corpus[second][:5].tolist()
+    # No target across the boundary, positions restart per segment
+    assert y[length - 1] == dataset.pad_id and segment_ids[length] == 1
+
+
+def test_packed_forward_matches_separate_samples(make_model):
+    dataset = make_dataset()
+    packed = PackedDataset(dataset)
+    model = make_model(max_len=128)
+
+    x, _, segment_ids = packed[0]
+    with torch.no_grad():
+        logits = model(x[None], segment_ids=segment_ids[None])[0]
+        start = 0
+        for sample in packed.rows[0]:
+            length = int(dataset.lengths[sample])
+            alone = model(torch.tensor(dataset.corpus[sample], dtype=torch.long)[None])[0]
+            end = min(start + length, x.size(0))
+            assert torch.allclose(logits[start:end], alone[:end - start], atol=1e-5)
+            start += length
+
+
+if __name__ == "__main__":
+    from conftest import make_model
+    test_bucket_sampler_covers_every_sample_once()
+    test_bucketed_batches_are_trimmed_fixed_batches()
+    test_packed_rows_keep_samples_whole_and_apart()
+    test_packed_forward_matches_separate_samples(make_model)
+    print("Bucketed and packed batches match the padded samples")
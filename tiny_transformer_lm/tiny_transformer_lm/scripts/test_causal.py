@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+import torch
+
+from model.tiny_transformer import TinyTransformerLM
+from conftest import VOCAB_SIZE
+
+
+def test_causal_model_ignores_future_tokens(make_model):
+    model = make_model(max_len=32)
+    a = torch.randint(0, VOCAB_SIZE, (2, 16))
+    b = a.clone()
+    b[:, 10:] = torch.randint(0, VOCAB_SIZE, (2, 6))
+
+    with torch.no_grad():
+        la, lb = model(a), model(b)
+        bidirectional = model(a, causal=False), model(b, causal=False)
+
+    assert torch.allclose(la[:, :10], lb[:, :10], atol=1e-5)
+    # The old unmasked mode lets later tokens change earlier predictions
+    assert not torch.allclose(bidirectional[0][:, :10], bidirectional[1][:, :10], atol=1e-3)
+
+
+def test_cached_decoding_matches_causal_forward(make_model):
+    model = make_model(max_len=32, seed=1)
+    input_ids = torch.randint(0, VOCAB_SIZE, (2, 12))
+    with torch.no_grad():
+        expected = model(input_ids)
+    cache = model.new_cache(batch_size=2)
+    steps = [model.forward_cached(input_ids[:, :4], cache)]
+    steps += [model.forward_cached(input_ids[:, i:i + 1], cache) for i in range(4, 12)]
+    assert torch.allclose(torch.cat(steps, dim=1), expected, atol=1e-5)
+
+
+def test_checkpoint_compatibility(make_model):
+    model = make_model(max_len=48, seed=2, num_layers=3)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Checkpoint written before causal training: weights only
+        legacy_path = os.path.join(tmp, "legacy.pt")
+        torch.save({"epoch": 5, "model_state_dict": model.state_dict()}, legacy_path)
+        legacy = TinyTransformerLM.from_checkpoint(legacy_path)
+        assert legacy.causal is False
+        assert legacy.max_len == 48 and len(legacy.transformer.layers) == 3
+
+        # Current checkpoints carry their config
+        path = os.path.join(tmp, "current.pt")
+        torch.save({"model_state_dict": model.state_dict(), "config": model.config}, path)
+        loaded = TinyTransformerLM.from_checkpoint(path)
+        assert loaded.causal is True and loaded.config == model.config
+
+        # Overrides win, e.g. scoring a legacy checkpoint causally
+        assert TinyTransformerLM.from_checkpoint(legacy_path, causal=True).causal is True
+
+        # Cached decoding would silently change a bidirectional model's attention
+        with pytest.raises(ValueError, match="bidirectional"):
+            legacy.new_cache(batch_size=1)
+        with pytest.raises(ValueError, match="bidirectional"):
+            legacy.forward_cached(torch.randint(0, VOCAB_SIZE, (1, 4)), loaded.new_cache(batch_size=1))
+
+    input_ids = torch.randint(0, VOCAB_SIZE, (1, 10))
+    model.eval(), loaded.eval()
+    with torch.no_grad():
+        assert torch.allclose(model(input_ids), loaded(input_ids))
+
+
+if __name__ == "__main__":
+    from conftest import make_model
+    test_causal_model_ignores_future_tokens(make_model)
+    test_cached_decoding_matches_causal_forward(make_model)
+    test_checkpoint_compatibility(make_model)
+    print("Causal mode tests passed")
@@ -0,0 +1,85 @@
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+from torch.utils.data import Dataset
+
+from training.batching import make_loader
+from training.checkpoints import CheckpointManager, load_latest
+from model.tiny_transformer import TinyTransformerLM
+from conftest import VOCAB_SIZE
+
+
+class RandomTokens(Dataset):
+    """Fixed random samples with the attributes make_loader() uses"""
+
+    def __init__(self, samples=24, length=17):
+        self.tokens = torch.randint(9, VOCAB_SIZE, (samples, length), generator=torch.Generator().manual_seed(1))
+        self.pad_id = 0
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __getitem__(self, idx):
+        return self.tokens[idx, :-1], self.tokens[idx, 1:]
+
+
+# Dropout on, so resuming must also restore the RNG state
+ADAMW = dict(dropout=0.1, optimizer=torch.optim.AdamW, lr=1e-3)
+
+
+def test_mid_epoch_resume_matches_uninterrupted_training(make_trainer):
+    loader = make_loader(RandomTokens(), batch_size=4, mode="pad")
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoints = CheckpointManager(tmp, "test", keep_last=10)
+        trainer = make_trainer(checkpoints=checkpoints, save_every=2, **ADAMW)
+        trainer.train_epoch(loader, epoch=1, epochs=2)
+        trainer.train_epoch(loader, epoch=2, epochs=2)
+        checkpoints.wait()
+        uninterrupted = trainer.model.state_dict()
+
+        # Start over from the checkpoint after batch 4 of epoch 1
+        state = torch.load(checkpoints.path(1, 4), weights_only=True)
+        resumed = make_trainer(**ADAMW)
+        epoch, step = resumed.restore(state, steps_per_epoch=len(loader))
+        assert (epoch, step) == (1, 4)
+        resumed.train_epoch(loader, epoch=1, epochs=2, start_step=step)
+        resumed.train_epoch(loader, epoch=2, epochs=2)
+        checkpoints.close()
+
+    for name, value in uninterrupted.items():
+        assert torch.allclose(resumed.model.state_dict()[name], value), name
+
+
+def test_keeps_last_k_and_best_and_weights_only_file(make_trainer):
+    trainer = make_trainer(**ADAMW)
+    model = trainer.model
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoints = CheckpointManager(tmp, "test", keep_last=2)
+        for epoch, loss in enumerate([3.0, 1.0, 2.0, 2.5, 2.7], start=1):
+            checkpoints.save(trainer.state(epoch, 10, loss), epoch, loss=loss)
+        checkpoints.save(trainer.state(6, 4), 6, step=4)
+        checkpoints.wait()
+
+        files = sorted(p.name for p in Path(tmp).glob("*.pt"))
+        assert files == ["test_best_weights.pt", "test_epoch_2.pt", "test_epoch_5.pt", "test_epoch_6_step_4.pt"]
+        assert (load_latest(tmp)["epoch"], load_latest(tmp)["step"]) == (6, 4)
+
+        # A new manager picks up the index, e.g. after a restart
+        assert [e["file"] for e in CheckpointManager(tmp, "test", keep_last=2).entries] == files[1:]
+
+        weights = torch.load(checkpoints.weights_path, weights_only=True)
+        assert weights["epoch"] == 2 and "optimizer_state_dict" not in weights
+        loaded = TinyTransformerLM.from_checkpoint(checkpoints.weights_path)
+        checkpoints.close()
+    for name, value in model.state_dict().items():
+        assert torch.equal(loaded.state_dict()[name], value)
+
+
+if __name__ == "__main__":
+    from conftest import make_trainer
+    test_mid_epoch_resume_matches_uninterrupted_training(make_trainer)
+    test_keeps_last_k_and_best_and_weights_only_file(make_trainer)
+    print("Checkpoints resume exactly and keep the last K plus the best")
@@ -0,0 +1,137 @@
+import os
+import json
+import sys
+import tempfile
+import warnings
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+import torch
+
+from tokenizers import Tokenizer
+
+from model.tiny_transformer import TinyTransformerLM
+from inference.compiled_lm import CompiledLM, export_compiled, load_model
+from inference.batch_generate import generate_batch_ids
+from inference.option_selector import OptionSelector
+from conftest import VOCAB_SIZE
+
+
+def export(model, path, quantize, source=None):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # torch.jit / torch.ao deprecation notices
+        return export_compiled(model, path, quantize=quantize, source=source)
+
+
+def test_fp32_artifact_matches_eager_model(make_model):
+    model = make_model()
+    input_ids = torch.randint(0, VOCAB_SIZE, (2, 20))
+    with torch.no_grad():
+        expected = model(input_ids)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fp32.pt")
+        export(model, path, quantize=False)
+        compiled = CompiledLM(path)
+
+    assert compiled.max_len == 64 and compiled.config["quantized"] is False
+    assert torch.allclose(compiled(input_ids), expected, atol=1e-5)
+
+    # Traced once, valid for any prefill and step length
+    cache = compiled.new_cache(batch_size=2)
+    steps = [compiled.forward_cached(input_ids[:, :9], cache)]
+    steps += [compiled.forward_cached(input_ids[:, i:i + 1], cache) for i in range(9, 20)]
+    assert cache.length == 20
+    assert torch.allclose(torch.cat(steps, dim=1), expected, atol=1e-5)
+
+
+def test_int8_artifact_is_smaller_and_close(make_model):
+    model = make_model()
+    input_ids = torch.randint(0, VOCAB_SIZE, (1, 30))
+    with tempfile.TemporaryDirectory() as tmp:
+        fp32_path, int8_path = os.path.join(tmp, "fp32.pt"), os.path.join(tmp, "int8.pt")
+        export(model, fp32_path, quantize=False)
+        export(model, int8_path, quantize=True)
+        assert os.path.getsize(int8_path) < os.path.getsize(fp32_path) / 2
+
+        compiled = load_model(None, int8_path)
+        assert isinstance(compiled, CompiledLM)
+
+    with torch.no_grad():
+        expected = torch.log_softmax(model(input_ids), dim=-1)
+    quantized = torch.log_softmax(compiled(input_ids), dim=-1)
+    assert (quantized.exp() - expected.exp()).abs().max() < 0.05
+
+
+def test_bidirectional_models_are_not_exported(make_model):
+    with tempfile.TemporaryDirectory() as tmp:
+        with pytest.raises(ValueError):
+            export(make_model(causal=False), os.path.join(tmp, "model.pt"), quantize=True)
+
+
+def test_fp32_artifact_is_a_drop_in_for_padded_batches_and_options(make_model):
+    model = make_model()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fp32.pt")
+        export(model, path, quantize=False)
+        compiled = CompiledLM(path)
+    assert compiled.device == model.device
+
+    # Left-padded prompts of different lengths, rows dropped as they stop
+    prompts = [[5, 6, 7, 8, 9, 10], [11, 12], [13, 14, 15]]
+    stop = [20, 21, 22, 23, 24, 25, 26, 27, 28, 29]
+    expected = generate_batch_ids(model, prompts, stop, max_new_tokens=20, temperature=0)
+    assert generate_batch_ids(compiled, prompts, stop, max_new_tokens=20, temperature=0) == expected
+
+    # OptionSelector: cached question prefix (fill_prefix, padded options) and the full padded pass
+    tokenizer = Tokenizer.from_file(str(Path(__file__).resolve().parent.parent / "tokenizer" / "tokenizer.json"))
+    options = ["I stay calm and try again", "Upset", "I ask a friend for help and make a new plan"]
+    for prefix_cache_bytes in (1 << 20, 0):
+        scores = [
+            OptionSelector(m, tokenizer, "cpu", pad_id=0, prefix_cache_bytes=prefix_cache_bytes)
+            .score_options("How do you feel when a plan fails?", options)
+            for m in (model, compiled)
+        ]
+        assert torch.allclose(scores[0], scores[1], atol=1e-4)
+
+
+def test_old_artifacts_are_rejected(make_model):
+    model = make_model()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "old.pt")
+        export(model, path, quantize=False)
+        module = torch.jit.load(path, _extra_files={"config.json": ""})
+        config = dict(model.config, quantized=False, head_dim=32)  # no artifact_version
+        torch.jit.save(module, path, _extra_files={"config.json": json.dumps(config)})
+        with pytest.raises(ValueError, match="re-export"):
+            CompiledLM(path)
+
+
+def test_stale_artifact_falls_back_to_the_checkpoint(make_model):
+    model = make_model()
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint_path, artifact_path = os.path.join(tmp, "model.pt"), os.path.join(tmp, "int8.pt")
+        torch.save({"model_state_dict": model.state_dict(), "config": model.config}, checkpoint_path)
+        export(model, artifact_path, quantize=True, source=checkpoint_path)
+        assert isinstance(load_model(checkpoint_path, artifact_path), CompiledLM)
+
+        # Training goes on and overwrites the checkpoint; the artifact was not re-exported
+        with torch.no_grad():
+            model.lm_head.bias.add_(1.0)
+        torch.save({"model_state_dict": model.state_dict(), "config": model.config}, checkpoint_path)
+        os.utime(checkpoint_path, ns=(0, 0))
+        loaded = load_model(checkpoint_path, artifact_path)
+        assert isinstance(loaded, TinyTransformerLM)
+        assert torch.equal(loaded.lm_head.bias, model.lm_head.bias)
+
+
+if __name__ == "__main__":
+    from conftest import make_model
+    test_fp32_artifact_matches_eager_model(make_model)
+    test_int8_artifact_is_smaller_and_close(make_model)
+    test_bidirectional_models_are_not_exported(make_model)
+    test_fp32_artifact_is_a_drop_in_for_padded_batches_and_options(make_model)
+    test_old_artifacts_are_rejected(make_model)
+    test_stale_artifact_falls_back_to_the_checkpoint(make_model)
+    print("Compiled artifacts match the eager model")
@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+from tokenizers import Tokenizer
+
+from model.tiny_transformer import TinyTransformerLM
+from inference.batch_generate import generate_batch
+from inference.constrained import StructuredGrammar, block_prompt, SEGMENTS, SEGMENT_CAPS
+from inference.structured_blocks import parse_block
+
+TOKENIZER_PATH = Path(__file__).resolve().parent.parent / "tokenizer" / "tokenizer.json"
+
+
+def test_untrained_model_writes_well_formed_blocks():
+    tokenizer = Tokenizer.from_file(str(TOKENIZER_PATH))
+    torch.manual_seed(0)
+    model = TinyTransformerLM(vocab_size=tokenizer.get_vocab_size()).eval()
+    prompts = [block_prompt(level) for level in ("academic", "reasoning", "emotional")] * 4
+
+    blocks = generate_batch(model, tokenizer, prompts, constrained=True, max_new_tokens=100,
+                            generator=torch.Generator().manual_seed(0))
+    for block in blocks:
+        assert block.endswith("<END>")
+        question, options = parse_block(block)
+        assert question and len(options) == 4 and all(options)
+
+        tokens = tokenizer.encode(block).tokens
+        tag_positions = [tokens.index(tag) for tag in SEGMENTS + ("<END>",)]
+        assert tag_positions == sorted(tag_positions)
+        for tag, start, end in zip(SEGMENTS, tag_positions, tag_positions[1:]):
+            assert 1 <= end - start - 1 <= SEGMENT_CAPS[tag]
+
+
+def test_grammar_forces_next_tag_at_cap():
+    tokenizer = Tokenizer.from_file(str(TOKENIZER_PATH))
+    option_d = tokenizer.token_to_id("<OPTION_D>")
+    end = tokenizer.token_to_id("<END>")
+    word = tokenizer.token_to_id("calm")
+
+    # Prompt ends inside <OPTION_D> with one token short of the cap
+    prompt = tokenizer.encode(block_prompt("emotional")).ids + [word, 4, word, 5, word, 6, word, option_d]
+    prompt += [word] * (SEGMENT_CAPS["<OPTION_D>"] - 1)
+    grammar = StructuredGrammar(tokenizer, [prompt])
+
+    logits = torch.zeros(1, tokenizer.get_vocab_size())
+    allowed = torch.isfinite(grammar.mask_logits(logits))[0]
+    assert allowed[word] and allowed[end] and not allowed[option_d]
+
+    grammar.advance(torch.tensor([word]))
+    allowed = torch.isfinite(grammar.mask_logits(logits))[0]
+    assert allowed.nonzero().flatten().tolist() == [end]
+
+    grammar.advance(torch.tensor([end]))
+    assert grammar.done.all()
+
+
+if __name__ == "__main__":
+    test_untrained_model_writes_well_formed_blocks()
+    test_grammar_forces_next_tag_at_cap()
+    print("Constrained decoding keeps every block well-formed")
@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+
+from training.distributed import spawn
+from conftest import VOCAB_SIZE, make_trainer  # plain function: spawned ranks run outside pytest
+
+
+def batches(rows):
+    """Unpadded (input, target, segments) batches over the given rows of a fixed token table"""
+    tokens = torch.randint(9, VOCAB_SIZE, (8, 17), generator=torch.Generator().manual_seed(1))[rows]
+    return [(tokens[i:i + 2, :-1], tokens[i:i + 2, 1:], None) for i in range(0, len(tokens), 2)]
+
+
+def train_rank(rank, world_size, out_path):
+    # Rank r trains on every world_size-th row of each global batch of 4
+    rows = [i for i in range(8) if i % world_size == rank]
+    trainer = make_trainer(wrap=True)
+    loss, _ = trainer.train_epoch(batches(rows), epoch=1, epochs=1)
+    if rank == 0:
+        torch.save({"state_dict": trainer.model.module.state_dict(), "loss": loss}, out_path)
+
+
+def test_two_ranks_match_one_process_on_the_full_batches():
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = os.path.join(tmp, "rank0.pt")
+        spawn(train_rank, 2, out_path)
+        distributed = torch.load(out_path)
+
+    # The same global batches (rows 0,2,1,3 then 4,6,5,7) in one process
+    trainer = make_trainer()
+    order = [0, 2, 1, 3, 4, 6, 5, 7]
+    tokens = torch.randint(9, VOCAB_SIZE, (8, 17), generator=torch.Generator().manual_seed(1))[order]
+    loss, _ = trainer.train_epoch(
+        [(tokens[i:i + 4, :-1], tokens[i:i + 4, 1:], None) for i in (0, 4)], epoch=1, epochs=1
+    )
+
+    assert abs(distributed["loss"] - loss) < 1e-5
+    for name, value in trainer.model.state_dict().items():
+        assert torch.allclose(distributed["state_dict"][name], value, atol=1e-5), name
+
+
+if __name__ == "__main__":
+    test_two_ranks_match_one_process_on_the_full_batches()
+    print("Two gloo ranks match single-process training")
@@ -0,0 +1,72 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from training.structured_dataset import StructuredDataset
+from training.engine import make_train_loader, train_split
+from training.batching import split_dataset
+from conftest import TOKENIZER_PATH, CORPUS_PATH, VOCAB_SIZE
+
+
+def batches(batch_size):
+    """Unpadded batches (every microbatch has the same token count)"""
+    generator = torch.Generator().manual_seed(1)
+    tokens = torch.randint(9, VOCAB_SIZE, (8, 17), generator=generator)
+    loader = DataLoader(TensorDataset(tokens[:, :-1], tokens[:, 1:]), batch_size=batch_size)
+    return [(x, y, None) for x, y in loader]
+
+
+def test_grad_accumulation_matches_one_large_batch(make_trainer):
+    large, accumulated = make_trainer(), make_trainer(grad_accum_steps=4)
+    large_loss, _ = large.train_epoch(batches(8), epoch=1, epochs=1)
+    accumulated_loss, _ = accumulated.train_epoch(batches(2), epoch=1, epochs=1)
+
+    assert abs(large_loss - accumulated_loss) < 1e-5
+    for a, b in zip(large.model.parameters(), accumulated.model.parameters()):
+        assert torch.allclose(a, b, atol=1e-5)
+
+
+def test_bf16_training_reduces_loss(make_trainer):
+    trainer = make_trainer(bf16=True)
+    first, _ = trainer.train_epoch(batches(2), epoch=1, epochs=3)
+    for epoch in (2, 3):
+        last, tokens_per_second = trainer.train_epoch(batches(2), epoch=epoch, epochs=3)
+    assert last < first and tokens_per_second > 0
+
+
+def test_worker_loader_yields_the_same_batches():
+    dataset = StructuredDataset(CORPUS_PATH, TOKENIZER_PATH, max_length=128)
+    for mode in ("bucket", "pack"):
+        serial = make_train_loader(dataset, batch_size=8, mode=mode, num_workers=0, shuffle=False)
+        parallel = make_train_loader(dataset, batch_size=8, mode=mode, num_workers=2, shuffle=False)
+        for (a, b) in zip(serial, parallel):
+            assert all(
+                (x is None and y is None) or torch.equal(x, y)
+                for x, y in zip(a, b)
+            )
+
+
+def test_training_split_leaves_out_validation():
+    dataset = StructuredDataset(CORPUS_PATH, TOKENIZER_PATH, max_length=128)
+    train, validation = train_split(dataset), split_dataset(dataset)[1]
+    assert len(train) + len(validation) == len(dataset)
+    assert set(train.indices).isdisjoint(validation.indices)
+
+    loader = make_train_loader(train, batch_size=8, mode="pad", num_workers=0, shuffle=False)
+    inputs = torch.cat([x for x, _, _ in loader])
+    expected = torch.stack([dataset[int(i)][0] for i in train.indices])
+    assert torch.equal(inputs, expected)
+    packed = make_train_loader(train, batch_size=8, mode="pack", num_workers=0, shuffle=False)
+    assert packed.dataset.lengths.sum() == dataset.lengths[train.indices].sum()
+
+
+if __name__ == "__main__":
+    from conftest import make_trainer
+    test_grad_accumulation_matches_one_large_batch(make_trainer)
+    test_bf16_training_reduces_loss(make_trainer)
+    test_worker_loader_yields_the_same_batches()
+    test_training_split_leaves_out_validation()
+    print("Training engine checks passed")
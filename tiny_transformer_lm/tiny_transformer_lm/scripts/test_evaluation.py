@@ -0,0 +1,79 @@
+import sys
+import json
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+from tokenizers import Tokenizer
+from torch.utils.data import DataLoader
+
+from training.structured_dataset import StructuredDataset
+from evaluation.harness import split_dataset, perplexity, evaluate, compare, is_complete_block
+from conftest import TOKENIZER_PATH, CORPUS_PATH
+
+
+def test_split_is_deterministic_and_disjoint():
+    dataset = StructuredDataset(CORPUS_PATH, TOKENIZER_PATH, max_length=64)
+    train, validation = split_dataset(dataset)
+    assert len(train) + len(validation) == len(dataset)
+    assert set(train.indices).isdisjoint(validation.indices)
+    assert validation.indices.tolist() == split_dataset(dataset)[1].indices.tolist()
+    assert torch.equal(validation[1][0], dataset[10][0])
+
+
+def test_bucketed_perplexity_matches_fixed_padding(make_model):
+    dataset = StructuredDataset(CORPUS_PATH, TOKENIZER_PATH, max_length=64)
+    _, validation = split_dataset(dataset)
+    model = make_model()
+
+    total_loss, total_tokens = 0.0, 0
+    with torch.no_grad():
+        for x, y in DataLoader(validation, batch_size=16):
+            logits = model(x)
+            total_loss += torch.nn.functional.cross_entropy(
+                logits.reshape(-1, logits.size(-1)), y.reshape(-1), ignore_index=0, reduction="sum"
+            ).item()
+            total_tokens += (y != 0).sum().item()
+    expected = torch.tensor(total_loss / total_tokens).exp().item()
+    assert abs(perplexity(model, validation) - expected) / expected < 1e-4
+
+
+def test_evaluate_writes_json_and_compare_flags_regressions(make_model):
+    tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+    # max_len 128 leaves room for every segment at its grammar cap
+    results = evaluate(make_model(max_len=128), tokenizer, "random", questions=3)
+    results = json.loads(json.dumps(results))  # JSON-ready
+    assert set(results["perplexity"]) == {"questions", "structured"}
+    assert results["generation"]["latency_ms"]["p95"] >= results["generation"]["latency_ms"]["p50"] > 0
+    assert results["parse_rate"]["constrained"] == 1.0  # the grammar guarantees the format
+
+    worse = json.loads(json.dumps(results))
+    worse["perplexity"]["structured"] *= 2
+    rows = {metric: flagged for metric, _, _, _, flagged in compare(results, worse)}
+    assert rows["perplexity.structured"] and not rows["perplexity.questions"]
+
+
+def test_bidirectional_model_keeps_perplexity_and_skips_generation(make_model):
+    tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+    results = json.loads(json.dumps(evaluate(make_model(causal=False), tokenizer, "legacy", questions=3)))
+    assert set(results["perplexity"]) == {"questions", "structured"}
+    assert "skipped" in results["generation"] and "skipped" in results["parse_rate"]
+
+    # Compared against a causal run, only the perplexities line up
+    current = evaluate(make_model(), tokenizer, "causal", questions=3)
+    assert [row[0] for row in compare(results, current)] == ["perplexity.questions", "perplexity.structured"]
+
+
+def test_complete_blocks():
+    assert is_complete_block("<LEVEL> academic <QUESTION> why? <OPTION_A> a <OPTION_B> b <OPTION_C> c <OPTION_D> d <END>")
+    assert not is_complete_block("<LEVEL> academic <QUESTION> why? <OPTION_A> a <OPTION_B> b <END>")
+
+
+if __name__ == "__main__":
+    from conftest import make_model
+    test_split_is_deterministic_and_disjoint()
+    test_bucketed_perplexity_matches_fixed_padding(make_model)
+    test_evaluate_writes_json_and_compare_flags_regressions(make_model)
+    test_bidirectional_model_keeps_perplexity_and_skips_generation(make_model)
+    test_complete_blocks()
+    print("Evaluation harness checks passed")
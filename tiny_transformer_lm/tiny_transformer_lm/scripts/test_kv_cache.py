@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+import torch
+import torch.nn as nn
+
+from conftest import VOCAB_SIZE
+
+
+@torch.no_grad()
+def causal_reference(model, input_ids):
+    """Full forward pass with a causal mask: what the KV cache must reproduce"""
+    seq_len = input_ids.size(1)
+    x = model.token_embedding(input_ids) + model.position_embedding(torch.arange(seq_len))
+    mask = nn.Transformer.generate_square_subsequent_mask(seq_len)
+    return model.lm_head(model.transformer(x, mask=mask, is_causal=True))
+
+
+def test_step_by_step_matches_full_pass(make_model):
+    model = make_model()
+    input_ids = torch.randint(0, VOCAB_SIZE, (3, 24))
+    expected = causal_reference(model, input_ids)
+
+    cache = model.new_cache(batch_size=3)
+    logits = [model.forward_cached(input_ids[:, :6], cache)]  # prefill
+    for i in range(6, 24):
+        logits.append(model.forward_cached(input_ids[:, i:i + 1], cache))
+
+    assert cache.length == 24
+    assert torch.allclose(torch.cat(logits, dim=1), expected, atol=1e-5)
+
+
+def test_chunked_prefill_matches_full_pass(make_model):
+    model = make_model()
+    input_ids = torch.randint(0, VOCAB_SIZE, (2, 20))
+    expected = causal_reference(model, input_ids)
+
+    cache = model.new_cache(batch_size=2)
+    chunks = [model.forward_cached(input_ids[:, a:b], cache) for a, b in ((0, 7), (7, 15), (15, 20))]
+    assert torch.allclose(torch.cat(chunks, dim=1), expected, atol=1e-5)
+
+
+def test_cache_overflow_raises(make_model):
+    model = make_model(max_len=8)
+    cache = model.new_cache(batch_size=1)
+    model.forward_cached(torch.randint(0, VOCAB_SIZE, (1, 8)), cache)
+    with pytest.raises(ValueError):
+        model.forward_cached(torch.randint(0, VOCAB_SIZE, (1, 1)), cache)
+
+
+if __name__ == "__main__":
+    from conftest import make_model
+    test_step_by_step_matches_full_pass(make_model)
+    test_chunked_prefill_matches_full_pass(make_model)
+    test_cache_overflow_raises(make_model)
+    print("KV cache matches the causal full pass")
@@ -0,0 +1,99 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+import torch.nn.functional as F
+from tokenizers import Tokenizer
+
+from model.tiny_transformer import TinyTransformerLM
+from inference.option_selector import OptionSelector, PrefixCache
+
+TOKENIZER_PATH = Path(__file__).resolve().parent.parent / "tokenizer" / "tokenizer.json"
+
+QUESTION = "How do you feel when a plan fails?"
+OPTIONS = [
+    {"text": "I stay calm and try again"},
+    {"text": "Upset"},
+    {"text": "I ask a friend for help and make a new plan"},
+    {"text": "I give up"},
+]
+
+
+def make_selector(causal=True, **kwargs):
+    torch.manual_seed(0)
+    tokenizer = Tokenizer.from_file(str(TOKENIZER_PATH))
+    model = TinyTransformerLM(vocab_size=tokenizer.get_vocab_size(), causal=causal).eval()
+    return OptionSelector(model, tokenizer, "cpu", pad_id=tokenizer.token_to_id("[PAD]"), **kwargs)
+
+
+@torch.no_grad()
+def reference_score(selector, question, option_text):
+    """One unpadded forward pass per option, summing the option tokens' log-probs"""
+    question_len = len(selector.tokenizer.encode(question).ids)
+    ids = torch.tensor([selector.tokenizer.encode(question + " " + option_text).ids])
+    log_probs = F.log_softmax(selector.model(ids[:, :-1]), dim=-1)
+    return sum(
+        log_probs[0, i, ids[0, i + 1]].item()
+        for i in range(question_len - 1, ids.size(1) - 1)
+    )
+
+
+def test_batched_scores_match_per_option_passes():
+    for causal, prefix_cache_bytes in ((True, 0), (True, 1 << 20), (False, 1 << 20)):
+        selector = make_selector(causal, prefix_cache_bytes=prefix_cache_bytes)
+        texts = [opt["text"] for opt in OPTIONS]
+        scores = selector.score_options(QUESTION, texts)
+        expected = torch.tensor([reference_score(selector, QUESTION, t) for t in texts])
+        assert torch.allclose(scores, expected, atol=1e-4)
+
+        lengths = torch.tensor([len(selector.tokenizer.encode(t).ids) for t in texts])
+        normalized = selector.score_options(QUESTION, texts, normalize=True)
+        assert torch.allclose(normalized, expected / lengths, atol=1e-4)
+
+
+def test_select_best_uses_one_forward_pass():
+    selector = make_selector(prefix_cache_bytes=0)
+    calls = []
+    selector.model.register_forward_hook(lambda *args: calls.append(1))
+
+    best = selector.select_best(QUESTION, OPTIONS, top_k=2)
+    assert len(calls) == 1
+
+    scores = [reference_score(selector, QUESTION, opt["text"]) for opt in OPTIONS]
+    ranked = sorted(range(len(OPTIONS)), key=lambda i: scores[i], reverse=True)
+    assert best == [OPTIONS[i] for i in ranked[:2]]
+
+
+def test_repeated_question_reuses_prefix():
+    selector = make_selector()
+    texts = [opt["text"] for opt in OPTIONS]
+    first = selector.score_options(QUESTION, texts)
+    second = selector.score_options(QUESTION, texts[::-1])
+    assert torch.allclose(first, second.flip(0), atol=1e-5)
+    assert (selector.prefix_cache.hits, selector.prefix_cache.misses) == (1, 1)
+
+
+def test_prefix_cache_evicts_least_recently_used():
+    def entry(tokens):
+        return [torch.zeros(1, 1, tokens, 4)], [torch.zeros(1, 1, tokens, 4)], torch.zeros(4)
+
+    size = PrefixCache.entry_bytes(entry(2))
+    cache = PrefixCache(max_bytes=2 * size)
+    cache.put((1,), entry(2))
+    cache.put((2,), entry(2))
+    assert cache.get((1,)) is not None   # (2,) is now least recently used
+    cache.put((3,), entry(2))
+
+    assert list(cache.entries) == [(1,), (3,)]
+    assert cache.nbytes == 2 * size
+    cache.put((4,), entry(100))          # larger than the whole budget: not cached
+    assert (4,) not in cache.entries
+
+
+if __name__ == "__main__":
+    test_batched_scores_match_per_option_passes()
+    test_select_best_uses_one_forward_pass()
+    test_repeated_question_reuses_prefix()
+    test_prefix_cache_evicts_least_recently_used()
+    print("Batched option scoring matches per-option passes")
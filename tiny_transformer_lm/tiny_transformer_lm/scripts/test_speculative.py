@@ -0,0 +1,88 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+from tokenizers import Tokenizer
+
+from inference.batch_generate import generate_batch_ids, stop_token_ids
+from inference.constrained import StructuredGrammar, block_prompt
+from inference.speculative import NGramDraft, speculative_generate, verify_token
+from inference.structured_blocks import parse_block
+from conftest import TOKENIZER_PATH, CORPUS_PATH, VOCAB_SIZE
+
+
+def test_draft_uses_longest_context():
+    draft = NGramDraft.from_sequences([[1, 2, 3, 4], [1, 2, 3, 4], [9, 3, 5], [9, 3, 5], [7, 3, 5]], min_count=2)
+    assert draft.next_token([2, 3]) == 4      # the 2-token context beats "3 -> 5"
+    assert draft.next_token([8, 3]) == 5
+    assert draft.next_token([6]) is None
+    assert draft.propose([1], 8) == [2, 3, 4]
+
+
+def test_verify_token_samples_the_target_distribution():
+    probs = torch.tensor([0.1, 0.6, 0.3])
+    generator = torch.Generator().manual_seed(0)
+    counts = torch.zeros(3)
+    for _ in range(20000):
+        _, token = verify_token(probs, 2, generator)
+        counts[token] += 1
+    assert torch.allclose(counts / counts.sum(), probs, atol=0.015)
+
+
+def test_truncated_cache_continues_like_a_fresh_one(make_model):
+    model = make_model(max_len=128)
+    input_ids = torch.randint(0, VOCAB_SIZE, (1, 20))
+    with torch.no_grad():
+        expected = model(input_ids)
+
+        cache = model.new_cache(batch_size=1)
+        model.forward_cached(input_ids[:, :12], cache)
+        model.forward_cached(torch.randint(0, VOCAB_SIZE, (1, 5)), cache)  # rejected drafts
+        cache.truncate(12)
+        logits = model.forward_cached(input_ids[:, 12:], cache)
+
+    assert cache.length == 20
+    assert torch.allclose(logits, expected[:, 12:], atol=1e-5)
+
+
+def test_greedy_output_matches_plain_decoding(make_model):
+    tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+    model = make_model(max_len=128)
+    draft = NGramDraft.from_corpus(CORPUS_PATH, TOKENIZER_PATH)
+    stop = stop_token_ids(tokenizer, ("<END>",))
+
+    for level in ("emotional", "academic"):
+        prompt_ids = tokenizer.encode(block_prompt(level)).ids
+        expected = generate_batch_ids(model, [prompt_ids], stop, max_new_tokens=60, temperature=0)[0]
+        stats = {}
+        output = speculative_generate(model, prompt_ids, draft, stop, max_new_tokens=60, temperature=0, stats=stats)
+        assert output == expected
+        assert stats["forward_passes"] <= len(output) + 1
+
+
+def test_sampling_respects_the_grammar(make_model):
+    tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+    model = make_model(max_len=128)
+    draft = NGramDraft.from_corpus(CORPUS_PATH, TOKENIZER_PATH)
+    stop = stop_token_ids(tokenizer, ("<END>",))
+    generator = torch.Generator().manual_seed(0)
+
+    for level in ("emotional", "reasoning", "academic"):
+        prompt_ids = tokenizer.encode(block_prompt(level)).ids
+        grammar = StructuredGrammar(tokenizer, [prompt_ids])
+        output = speculative_generate(model, prompt_ids, draft, stop, max_new_tokens=120,
+                                      generator=generator, grammar=grammar)
+        assert output[-1] in stop and stop[0] not in output[:-1]
+        question, options = parse_block(tokenizer.decode(prompt_ids + output, skip_special_tokens=False))
+        assert question and len(options) == 4 and all(options)
+
+
+if __name__ == "__main__":
+    from conftest import make_model
+    test_draft_uses_longest_context()
+    test_verify_token_samples_the_target_distribution()
+    test_truncated_cache_continues_like_a_fresh_one(make_model)
+    test_greedy_output_matches_plain_decoding(make_model)
+    test_sampling_respects_the_grammar(make_model)
+    print("Speculative decoding matches plain decoding")
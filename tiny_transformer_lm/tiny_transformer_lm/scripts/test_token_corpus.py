@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import torch
+from tokenizers import Tokenizer
+
+from training.token_corpus import load_token_corpus, read_blocks, read_questions
+from training.dataset import QuestionDataset
+from training.structured_dataset import StructuredDataset
+
+ROOT = Path(__file__).resolve().parent.parent
+TOKENIZER_PATH = str(ROOT / "tokenizer/tokenizer.json")
+QUESTIONS_PATH = str(ROOT / "data/final/final_dataset.json")
+CORPUS_PATH = str(ROOT / "data/structured/structured_corpus.txt")
+
+
+def tokenize_on_the_fly(text, tokenizer, max_length):
+    """What the datasets did per sample before pre-tokenization"""
+    ids = tokenizer.encode(text).ids[:max_length]
+    ids += [tokenizer.token_to_id("[PAD]")] * (max_length - len(ids))
+    return torch.tensor(ids[:-1]), torch.tensor(ids[1:])
+
+
+def test_corpus_samples_match_tokenizer():
+    tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+    texts = read_blocks(CORPUS_PATH)
+    corpus = load_token_corpus(CORPUS_PATH, TOKENIZER_PATH, read_blocks)
+    assert len(corpus) == len(texts)
+    for idx in (0, 1, len(texts) // 2, len(texts) - 1):
+        assert corpus[idx].tolist() == tokenizer.encode(texts[idx]).ids
+
+
+def test_datasets_match_on_the_fly_tokenization():
+    tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+    for dataset, texts, max_length in (
+        (QuestionDataset(QUESTIONS_PATH, TOKENIZER_PATH, max_length=16), read_questions(QUESTIONS_PATH), 16),
+        (StructuredDataset(CORPUS_PATH, TOKENIZER_PATH, max_length=128), read_blocks(CORPUS_PATH), 128),
+    ):
+        assert len(dataset) == len(texts)
+        for idx in (0, len(texts) - 1):
+            x, y = dataset[idx]
+            expected_x, expected_y = tokenize_on_the_fly(texts[idx], tokenizer, max_length)
+            assert x.dtype == torch.long and torch.equal(x, expected_x) and torch.equal(y, expected_y)
+
+
+def test_corpus_is_rebuilt_when_source_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "corpus.txt")
+        shutil.copy(CORPUS_PATH, source)
+        out_dir = os.path.join(tmp, "tokenized")
+
+        first = load_token_corpus(source, TOKENIZER_PATH, read_blocks, out_dir=out_dir)
+        samples = len(first)
+        with open(source, "a", encoding="utf-8") as f:
+            f.write("\n\n<LEVEL> academic\n<QUESTION> one more?\n")
+
+        second = load_token_corpus(source, TOKENIZER_PATH, read_blocks, out_dir=out_dir)
+        assert len(second) == samples + 1
+        with open(os.path.join(out_dir, "corpus.json"), encoding="utf-8") as f:
+            assert json.load(f)["samples"] == samples + 1
+
+
+if __name__ == "__main__":
+    test_corpus_samples_match_tokenizer()
+    test_datasets_match_on_the_fly_tokenization()
+    test_corpus_is_rebuilt_when_source_changes()
+    print("Token corpora match on-the-fly tokenization")
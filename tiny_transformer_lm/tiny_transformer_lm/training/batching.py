@@ -0,0 +1,209 @@
+"""
+Batching that spends less compute on [PAD].
+
+Both datasets pad every sample to max_length (64 / 256), while most
+samples are far shorter. Two alternatives to the default DataLoader:
+
+    bucket  LengthBucketSampler groups samples of similar length and
+            PadCollate cuts each batch down to its own longest sample
+    pack    PackedDataset concatenates samples into full max_length rows;
+            segment ids keep attention (and position ids) inside each
+            sample, and the target crossing a sample boundary is ignored
+
+split_dataset() holds out every HOLDOUT_EVERY-th sample for validation
+(evaluation/harness.py); the training scripts only see the rest.
+
+make_loader() builds the DataLoader for a mode. Every batch is
+(input_ids, target_ids, segment_ids), segment_ids None unless packed,
+for model(input_ids, segment_ids=segment_ids).
+"""
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset, DistributedSampler, Sampler
+
+# ================= CONFIG =================
+BATCHING_MODES = ("pad", "bucket", "pack")
+BUCKET_BATCHES = 50       # batches per sorted bucket: larger = tighter lengths, less randomness
+PACK_SEED = 0
+HOLDOUT_EVERY = 10        # every 10th sample is validation, never trained on
+
+
+class LengthBucketSampler(Sampler):
+    """
+    Batch sampler: shuffle, cut into buckets of BUCKET_BATCHES batches, sort
+    each bucket by length and split it into batches, then shuffle the batches.
+    Batches hold samples of similar length without a fixed length order.
+    With num_replicas > 1 (distributed training) every rank builds the same
+    batches from the same seed and takes every num_replicas-th one; the
+    leftover batches are dropped so all ranks run the same number of steps.
+    """
+
+    def __init__(self, lengths, batch_size, shuffle=True, bucket_batches=BUCKET_BATCHES, drop_last=False, seed=0,
+                 num_replicas=1, rank=0):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.bucket_size = batch_size * bucket_batches
+        self.drop_last = drop_last
+        self.seed = seed
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        """Seed the next pass (same idea as DistributedSampler.set_epoch); passes advance it by one"""
+        self.epoch = epoch
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        self.epoch += 1
+        order = rng.permutation(len(self.lengths)) if self.shuffle else np.arange(len(self.lengths))
+
+        batches = []
+        for start in range(0, len(order), self.bucket_size):
+            bucket = order[start:start + self.bucket_size]
+            bucket = bucket[np.argsort(self.lengths[bucket], kind="stable")]
+            batches += [bucket[i:i + self.batch_size] for i in range(0, len(bucket), self.batch_size)]
+        if self.drop_last:
+            batches = [batch for batch in batches if len(batch) == self.batch_size]
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        batches = batches[self.rank:len(self) * self.num_replicas:self.num_replicas]
+        return iter([batch.tolist() for batch in batches])
+
+    def __len__(self):
+        if self.drop_last:
+            batches = len(self.lengths) // self.batch_size
+        else:
+            batches = -(-len(self.lengths) // self.batch_size)
+        return batches // self.num_replicas
+
+class PadCollate:
+    """
+    Stack (input_ids, target_ids) samples padded to the dataset's max_length
+    and drop the columns that are padding in every row (samples are right
+    padded, so a batch ends up as wide as its longest sample).
+    trim=False keeps the full max_length width.
+    """
+
+    def __init__(self, pad_id, trim=True):
+        self.pad_id = pad_id
+        self.trim = trim
+
+    def __call__(self, batch):
+        input_ids = torch.stack([x for x, _ in batch])
+        target_ids = torch.stack([y for _, y in batch])
+        if not self.trim:
+            return input_ids, target_ids, None
+        width = max(int((input_ids != self.pad_id).sum(dim=1).max()), 1)
+        return input_ids[:, :width], target_ids[:, :width], None
+
+
+class SampleSubset(Dataset):
+    """
+    Some samples of a tokenized dataset (e.g. a validation split), keeping
+    the attributes the loaders here use (corpus, lengths, pad_id, max_length)
+    """
+
+    def __init__(self, dataset, indices):
+        self.dataset = dataset
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.corpus = [dataset.corpus[i] for i in self.indices]
+        self.lengths = dataset.lengths[self.indices]
+        self.pad_id = dataset.pad_id
+        self.max_length = dataset.max_length
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        return self.dataset[int(self.indices[idx])]
+
+
+def split_dataset(dataset, every=HOLDOUT_EVERY):
+    """(train, validation) subsets; the same samples every time"""
+    held_out = [i for i in range(len(dataset)) if i % every == 0]
+    train = [i for i in range(len(dataset)) if i % every != 0]
+    return SampleSubset(dataset, train), SampleSubset(dataset, held_out)
+
+
+class PackedDataset(Dataset):
+    """
+    A tokenized dataset (QuestionDataset / StructuredDataset) packed into
+    rows of max_length tokens. Samples keep their truncation to max_length
+    and are placed whole, in a seeded shuffled order, each into the current
+    row if it fits and a new row otherwise. Items are
+    (input_ids, target_ids, segment_ids), all (max_length - 1,).
+    """
+
+    def __init__(self, dataset, seed=PACK_SEED):
+        self.corpus = dataset.corpus
+        self.max_length = dataset.max_length
+        self.pad_id = dataset.pad_id
+        self.lengths = dataset.lengths
+
+        order = np.random.default_rng(seed).permutation(len(self.lengths))
+        self.rows, row, used = [], [], 0
+        for idx in order:
+            if used + self.lengths[idx] > self.max_length:
+                self.rows.append(row)
+                row, used = [], 0
+            row.append(idx)
+            used += self.lengths[idx]
+        if row:
+            self.rows.append(row)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def fill_ratio(self):
+        """Share of packed tokens that are real (not [PAD])"""
+        return float(self.lengths.sum()) / (len(self.rows) * self.max_length)
+
+    def __getitem__(self, idx):
+        tokens = np.full(self.max_length, self.pad_id, dtype=np.int64)
+        # Trailing padding is one more segment, so it only attends to itself
+        segments = np.full(self.max_length, len(self.rows[idx]), dtype=np.int64)
+        start = 0
+        for segment, sample in enumerate(self.rows[idx]):
+            length = self.lengths[sample]
+            tokens[start:start + length] = self.corpus[sample][:length]
+            segments[start:start + length] = segment
+            start += length
+
+        input_ids = torch.from_numpy(tokens[:-1])
+        target_ids = torch.from_numpy(tokens[1:]).clone()
+        segment_ids = torch.from_numpy(segments[:-1])
+        # The last token of a sample must not learn to predict the next sample
+        target_ids[segments[1:] != segments[:-1]] = self.pad_id
+        return input_ids, target_ids, segment_ids
+
+
+def make_loader(dataset, batch_size, mode="bucket", shuffle=True, num_replicas=1, rank=0, **loader_kwargs):
+    """
+    DataLoader over a QuestionDataset / StructuredDataset for one of
+    BATCHING_MODES; batches are (input_ids, target_ids, segment_ids).
+    num_replicas / rank shard the data for distributed training
+    (DistributedSampler, or the sharded LengthBucketSampler for "bucket").
+    The batch order is a function of the sampler's epoch (set_epoch).
+    """
+    if mode not in BATCHING_MODES:
+        raise ValueError(f"Unknown batching mode {mode!r}, expected one of {BATCHING_MODES}")
+    # Worker seeds from a private generator: starting an epoch leaves the
+    # global torch RNG (dropout) untouched, so resumed training replays it
+    loader_kwargs.setdefault("generator", torch.Generator())
+    if mode == "bucket":
+        sampler = LengthBucketSampler(dataset.lengths, batch_size, shuffle=shuffle,
+                                      num_replicas=num_replicas, rank=rank)
+        return DataLoader(dataset, batch_sampler=sampler, collate_fn=PadCollate(dataset.pad_id), **loader_kwargs)
+
+    if mode == "pack":
+        dataset, collate = PackedDataset(dataset), None
+    else:
+        collate = PadCollate(dataset.pad_id, trim=False)
+    # Also for one process: its order depends only on set_epoch(), so a resumed epoch replays it
+    sampler = DistributedSampler(dataset, num_replicas=num_replicas, rank=rank, shuffle=shuffle,
+                                 drop_last=num_replicas > 1)
+    return DataLoader(dataset, batch_size=batch_size, sampler=sampler, collate_fn=collate, **loader_kwargs)
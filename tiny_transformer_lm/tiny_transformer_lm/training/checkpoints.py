@@ -0,0 +1,180 @@
+"""
+Checkpoints that don't stall training and can be resumed from.
+
+CheckpointManager.save() copies the state to CPU memory on the training
+thread (cheap) and writes it from a background thread, one save in
+flight at a time. Each checkpoint holds the model, optimizer, the epoch
+and the number of batches done in it, and every RNG state, so training
+resumes mid-epoch exactly where it stopped (batch order is a function of
+the epoch, see training/batching.py). Only the last K checkpoints and the
+best (lowest loss) end-of-epoch one are kept; checkpoints.json indexes them.
+
+Besides full checkpoints, the best one is also written weights-only
+(<prefix>_best_weights.pt) for inference, which loads it memory-mapped
+(TinyTransformerLM.from_checkpoint).
+"""
+
+import os
+import json
+import queue
+import random
+import threading
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# ================= CONFIG =================
+KEEP_LAST = 3
+INDEX_FILE = "checkpoints.json"
+
+
+def rng_state():
+    """Python, numpy and torch RNG states, as tensors and ints only (loads with weights_only=True)"""
+    kind, keys, pos, has_gauss, cached = np.random.get_state()
+    return {
+        "python": random.getstate(),
+        "numpy": {"keys": torch.from_numpy(keys.astype(np.int64)), "pos": pos,
+                  "has_gauss": has_gauss, "cached_gaussian": cached},
+        "torch": torch.get_rng_state(),
+    }
+
+
+def set_rng_state(state):
+    version, internal, gauss = state["python"]
+    random.setstate((version, tuple(internal), gauss))
+    numpy_state = state["numpy"]
+    np.random.set_state((
+        "MT19937", numpy_state["keys"].numpy().astype(np.uint32), numpy_state["pos"],
+        numpy_state["has_gauss"], numpy_state["cached_gaussian"],
+    ))
+    torch.set_rng_state(state["torch"])
+
+
+def snapshot(obj):
+    """Copy of a (nested) state dict with every tensor cloned to CPU, safe to write while training goes on"""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {key: snapshot(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot(value) for value in obj)
+    return obj
+
+
+def _atomic_save(obj, path):
+    tmp_path = f"{path}.tmp"
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _atomic_save_json(obj, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_index(directory):
+    index_path = Path(directory) / INDEX_FILE
+    if not index_path.exists():
+        return []
+    with open(index_path, "r", encoding="utf-8") as f:
+        return [e for e in json.load(f) if (Path(directory) / e["file"]).exists()]
+
+
+def load_latest(directory, map_location="cpu"):
+    """The most recent checkpoint a CheckpointManager wrote to `directory`, or None"""
+    entries = _read_index(directory)
+    if not entries:
+        return None
+    return torch.load(Path(directory) / entries[-1]["file"], map_location=map_location, weights_only=True)
+
+
+class CheckpointManager:
+    """
+    Asynchronous checkpoints in `directory`, named <prefix>_epoch_<epoch>.pt
+    at the end of an epoch and <prefix>_epoch_<epoch>_step_<step>.pt within one.
+    """
+
+    def __init__(self, directory, prefix, keep_last=KEEP_LAST):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.keep_last = keep_last
+
+        self.entries = _read_index(self.directory)
+
+        self._queue = queue.Queue(maxsize=1)
+        self._error = None
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def path(self, epoch, step=None):
+        name = f"{self.prefix}_epoch_{epoch}" + (f"_step_{step}" if step is not None else "")
+        return self.directory / f"{name}.pt"
+
+    @property
+    def weights_path(self):
+        return self.directory / f"{self.prefix}_best_weights.pt"
+
+    def save(self, state, epoch, step=None, loss=None):
+        """
+        Queue `state` (Trainer.state()) for writing. step=None marks the end
+        of the epoch; only those checkpoints compete for best (lowest loss).
+        Blocks only while the previous save is still being written.
+        """
+        self._raise_error()
+        entry = {"file": self.path(epoch, step).name, "epoch": epoch, "step": step, "loss": loss}
+        self._queue.put((snapshot(state), entry))
+
+    def wait(self):
+        """Block until every queued checkpoint is on disk"""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        self.wait()
+        self._queue.put(None)
+        self._thread.join()
+
+    def load_latest(self, map_location="cpu"):
+        self.wait()
+        return load_latest(self.directory, map_location)
+
+    def _best(self):
+        scored = [e for e in self.entries if e["step"] is None and e["loss"] is not None]
+        return min(scored, key=lambda e: e["loss"]) if scored else None
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Writing a checkpoint failed") from error
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as error:  # surfaced on the next save() / wait()
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def _write(self, state, entry):
+        _atomic_save(state, self.directory / entry["file"])
+        self.entries = [e for e in self.entries if e["file"] != entry["file"]] + [entry]
+
+        best = self._best()
+        if best is entry:
+            _atomic_save({key: state[key] for key in ("model_state_dict", "config", "epoch", "loss")}, self.weights_path)
+
+        # Keep the last keep_last checkpoints plus the best one
+        keep = self.entries[max(len(self.entries) - self.keep_last, 0):] + ([best] if best else [])
+        for old in [e for e in self.entries if e not in keep]:
+            (self.directory / old["file"]).unlink(missing_ok=True)
+        self.entries = [e for e in self.entries if e in keep]
+
+        _atomic_save_json(self.entries, self.directory / INDEX_FILE)
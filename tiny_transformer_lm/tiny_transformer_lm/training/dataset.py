@@ -1,33 +1,30 @@
-import json
+import numpy as np
 import torch
 from torch.utils.data import Dataset
-from tokenizers import Tokenizer
-from pathlib import Path
+
+from training.token_corpus import load_token_corpus, read_questions
 
 class QuestionDataset(Dataset):
     def __init__(self, data_path, tokenizer_path, max_length=64):
-        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        # Tokenized once into data/tokenized/ and memory-mapped (training/token_corpus.py)
+        self.corpus = load_token_corpus(data_path, tokenizer_path, read_questions)
         self.max_length = max_length
-
-        with open(data_path, "r", encoding="utf-8") as f:
-            self.data = json.load(f)
-
-        self.texts = [item["question"] for item in self.data]
+        self.pad_id = self.corpus.pad_id
+        # Tokens per sample after truncation (length bucketing, training/batching.py)
+        self.lengths = np.minimum(np.diff(self.corpus.offsets), max_length)
 
     def __len__(self):
-        return len(self.texts)
+        return len(self.corpus)
 
     def __getitem__(self, idx):
-        encoding = self.tokenizer.encode(self.texts[idx])
-
-        ids = encoding.ids[: self.max_length]
+        ids = self.corpus[idx][: self.max_length]
 
         # Pad if needed
-        pad_id = self.tokenizer.token_to_id("[PAD]")
-        if len(ids) < self.max_length:
-            ids += [pad_id] * (self.max_length - len(ids))
+        padded = np.full(self.max_length, self.pad_id, dtype=np.int64)
+        padded[: len(ids)] = ids
+        padded = torch.from_numpy(padded)
 
-        input_ids = torch.tensor(ids[:-1], dtype=torch.long)
-        target_ids = torch.tensor(ids[1:], dtype=torch.long)
+        input_ids = padded[:-1]
+        target_ids = padded[1:]
 
         return input_ids, target_ids
@@ -0,0 +1,77 @@
+"""
+Data-parallel training over local CPU processes (torch.distributed, gloo).
+
+Every rank holds a full model copy and trains on its own shard of the
+batches; DistributedDataParallel averages gradients across ranks after
+each backward, so all copies stay identical.
+
+    torchrun --standalone --nproc_per_node=4 training/train_structured.py
+
+Without torchrun (WORLD_SIZE unset) training runs as a single process.
+spawn() starts ranks from Python instead, e.g. for scripts/bench_ddp.py.
+"""
+
+import os
+import socket
+from contextlib import contextmanager
+
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+BACKEND = "gloo"
+
+
+def init_distributed():
+    """Join the process group torchrun describes in the environment; returns (rank, world_size)"""
+    world_size = int(os.environ.get("WORLD_SIZE", 1))
+    if world_size == 1:
+        return 0, 1
+    if not dist.is_initialized():
+        dist.init_process_group(BACKEND)
+    return dist.get_rank(), world_size
+
+
+def is_main_process():
+    return not dist.is_initialized() or dist.get_rank() == 0
+
+
+@contextmanager
+def main_process_first():
+    """Rank 0 runs the block before the others (e.g. to build the token corpus once)"""
+    if dist.is_initialized() and dist.get_rank() != 0:
+        dist.barrier()
+    yield
+    if dist.is_initialized() and dist.get_rank() == 0:
+        dist.barrier()
+
+
+def all_reduce_sum(tensor):
+    """Sum a tensor over all ranks in place (no-op in a single process)"""
+    if dist.is_initialized():
+        dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tensor
+
+
+def cleanup():
+    if dist.is_initialized():
+        dist.destroy_process_group()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _spawned(rank, fn, world_size, port, args):
+    os.environ.update(MASTER_ADDR="127.0.0.1", MASTER_PORT=str(port), RANK=str(rank), WORLD_SIZE=str(world_size))
+    init_distributed()
+    try:
+        fn(rank, world_size, *args)
+    finally:
+        cleanup()
+
+
+def spawn(fn, world_size, *args):
+    """Run fn(rank, world_size, *args) in world_size local processes joined in one process group"""
+    mp.spawn(_spawned, args=(fn, world_size, _free_port(), args), nprocs=world_size, join=True)
@@ -0,0 +1,203 @@
+"""
+Training loop shared by train.py and train_structured.py, tuned for
+many-core CPU boxes without a GPU:
+
+- intra-op threads for the model, one inter-op thread (the model has no
+  parallel branches to schedule), single-threaded loader workers so the
+  two never oversubscribe the cores
+- training only on split_dataset()'s train samples, so the validation
+  split evaluation/harness.py reports on stays held out
+- multi-process data loading with prefetching and persistent workers
+- optional bf16 autocast (fast on CPUs with AVX512-BF16 / AMX)
+- loss summed on-device; .item() only every log_every steps
+- gradient accumulation, for large effective batches at small memory
+- data parallel over local processes when the model is wrapped in
+  DistributedDataParallel (training/distributed.py)
+- periodic asynchronous checkpoints and mid-epoch resume
+  (training/checkpoints.py)
+"""
+
+import os
+import sys
+import time
+from itertools import islice
+from contextlib import nullcontext
+
+import torch
+import torch.nn as nn
+from torch.nn.parallel import DistributedDataParallel
+
+from training.batching import make_loader, split_dataset
+from training.distributed import all_reduce_sum, is_main_process
+from training.checkpoints import rng_state, set_rng_state
+
+# ================= CONFIG =================
+NUM_WORKERS = 2           # loader processes; 0 = load in the training process
+PREFETCH_FACTOR = 4       # batches queued per worker
+LOG_EVERY = 100           # steps between loss logs (each one is a host sync)
+
+
+def available_cpus():
+    """CPUs this process may run on (respects taskset / container limits)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def configure_threads(intra_op=None, inter_op=1, num_workers=NUM_WORKERS, world_size=1):
+    """
+    Set torch's thread pools before any parallel work starts (inter-op
+    threads can only be set once). intra_op defaults to this process's
+    share of the CPUs (world_size training processes) minus its loader
+    workers. Returns the intra-op thread count.
+    """
+    if intra_op is None:
+        intra_op = max(1, available_cpus() // world_size - num_workers)
+    torch.set_num_threads(intra_op)
+    try:
+        torch.set_num_interop_threads(inter_op)
+    except RuntimeError:
+        pass  # already set, or parallel work already ran in this process
+    return intra_op
+
+
+def _single_threaded_worker(worker_id):
+    torch.set_num_threads(1)
+
+
+def train_split(dataset):
+    """The samples the training scripts learn from: all but the held-out validation split"""
+    return split_dataset(dataset)[0]
+
+
+def make_train_loader(dataset, batch_size, mode="bucket", num_workers=NUM_WORKERS,
+                      prefetch_factor=PREFETCH_FACTOR, device=torch.device("cpu"), **loader_kwargs):
+    """make_loader() (training/batching.py) with worker processes, prefetching and pinned memory for CUDA"""
+    if num_workers > 0:
+        loader_kwargs.update(
+            num_workers=num_workers,
+            prefetch_factor=prefetch_factor,
+            persistent_workers=True,
+            worker_init_fn=_single_threaded_worker,
+        )
+        # The training scripts run at import time, so workers must be forked,
+        # never spawned (a spawned worker would re-import and re-run them)
+        if sys.platform.startswith("linux"):
+            loader_kwargs.setdefault("multiprocessing_context", "fork")
+    return make_loader(dataset, batch_size, mode=mode, pin_memory=device.type == "cuda", **loader_kwargs)
+
+
+class Trainer:
+    """
+    One model/optimizer pair trained epoch by epoch on
+    (input_ids, target_ids, segment_ids) batches from make_train_loader().
+    grad_accum_steps batches make one optimizer step; the loss is averaged
+    over them, so the update matches one batch grad_accum_steps times larger.
+    The model may be a DistributedDataParallel wrapper: gradients are then
+    only synchronized on the batches that step the optimizer, and the epoch
+    loss and token counts cover all ranks.
+    With a CheckpointManager and save_every, a checkpoint is saved every
+    save_every batches (rank 0 only); train_epoch(start_step=...) resumes one.
+    """
+
+    def __init__(self, model, optimizer, pad_id, device=torch.device("cpu"),
+                 grad_accum_steps=1, bf16=False, log_every=LOG_EVERY, checkpoints=None, save_every=None):
+        self.model = model
+        self.optimizer = optimizer
+        self.criterion = nn.CrossEntropyLoss(ignore_index=pad_id)
+        self.pad_id = pad_id
+        self.device = device
+        self.grad_accum_steps = grad_accum_steps
+        self.bf16 = bf16
+        self.log_every = log_every
+        self.checkpoints = checkpoints
+        self.save_every = save_every
+
+    @property
+    def module(self):
+        """The model itself, also when wrapped in DistributedDataParallel"""
+        return getattr(self.model, "module", self.model)
+
+    def state(self, epoch, step, loss=None):
+        """Everything needed to resume after `step` batches of `epoch`"""
+        return {
+            "epoch": epoch,
+            "step": step,
+            "model_state_dict": self.module.state_dict(),
+            "config": self.module.config,
+            "optimizer_state_dict": self.optimizer.state_dict(),
+            "loss": loss,
+            "rng_state": rng_state(),
+        }
+
+    def restore(self, state, steps_per_epoch):
+        """Load a state(); returns the (epoch, start_step) to continue from"""
+        self.module.load_state_dict(state["model_state_dict"])
+        self.optimizer.load_state_dict(state["optimizer_state_dict"])
+        set_rng_state(state["rng_state"])
+        if state["step"] >= steps_per_epoch:
+            return state["epoch"] + 1, 0
+        return state["epoch"], state["step"]
+
+    def autocast(self):
+        if not self.bf16:
+            return nullcontext()
+        return torch.autocast(device_type=self.device.type, dtype=torch.bfloat16)
+
+    def _to_device(self, tensor):
+        if tensor is None:
+            return None
+        return tensor.to(self.device, non_blocking=True)
+
+    def train_epoch(self, loader, epoch, epochs, start_step=0):
+        """
+        Train on every batch of `loader` from start_step on (batches before
+        it are drawn in the same order and skipped); returns
+        (average loss, real tokens per second)
+        """
+        self.model.train()
+        self.optimizer.zero_grad(set_to_none=True)
+        for sampler in (getattr(loader, "sampler", None), getattr(loader, "batch_sampler", None)):
+            if hasattr(sampler, "set_epoch"):
+                sampler.set_epoch(epoch)
+        distributed = isinstance(self.model, DistributedDataParallel)
+        total_loss = torch.zeros((), device=self.device)
+        tokens = torch.zeros((), dtype=torch.long, device=self.device)
+        start = time.perf_counter()
+
+        steps = len(loader)
+        for step, (x, y, segment_ids) in enumerate(islice(loader, start_step, None), start=start_step):
+            x, y, segment_ids = self._to_device(x), self._to_device(y), self._to_device(segment_ids)
+
+            update = (step + 1) % self.grad_accum_steps == 0 or step + 1 == steps
+            no_sync = self.model.no_sync() if distributed and not update else nullcontext()
+            with no_sync:
+                with self.autocast():
+                    logits = self.model(x, segment_ids=segment_ids)
+                    loss = self.criterion(logits.reshape(-1, logits.size(-1)), y.reshape(-1))
+                (loss / self.grad_accum_steps).backward()
+
+            total_loss += loss.detach()
+            tokens += (y != self.pad_id).sum()
+
+            if update:
+                self.optimizer.step()
+                self.optimizer.zero_grad(set_to_none=True)
+                if self.save_every and (step + 1) % self.save_every == 0 and step + 1 < steps:
+                    self._save(epoch, step + 1)
+
+            if step % self.log_every == 0 and is_main_process():
+                print(
+                    f"Epoch [{epoch}/{epochs}] "
+                    f"Step {step} "
+                    f"Loss: {loss.item():.4f}"
+                )
+
+        elapsed = time.perf_counter() - start
+        totals = torch.stack([total_loss.float(), tokens.float(), torch.tensor(float(steps - start_step), device=self.device)])
+        totals = all_reduce_sum(totals)
+        return (totals[0] / totals[2]).item(), totals[1].item() / elapsed
+
+    def _save(self, epoch, step):
+        if self.checkpoints is not None and is_main_process():
+            self.checkpoints.save(self.state(epoch, step), epoch, step)
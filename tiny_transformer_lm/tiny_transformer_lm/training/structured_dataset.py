@@ -1,35 +1,30 @@
+import numpy as np
 import torch
 from torch.utils.data import Dataset
-from tokenizers import Tokenizer
-from pathlib import Path
+
+from training.token_corpus import load_token_corpus, read_blocks
 
 class StructuredDataset(Dataset):
     def __init__(self, corpus_path, tokenizer_path, max_length=256):
-        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        # Blocks split by double newline, tokenized once into data/tokenized/
+        # and memory-mapped (training/token_corpus.py)
+        self.corpus = load_token_corpus(corpus_path, tokenizer_path, read_blocks)
         self.max_length = max_length
-
-        with open(corpus_path, "r", encoding="utf-8") as f:
-            raw_text = f.read()
-
-        # Split blocks by double newline
-        self.samples = [
-            block.strip()
-            for block in raw_text.split("\n\n")
-            if block.strip()
-        ]
+        self.pad_id = self.corpus.pad_id
+        # Tokens per sample after truncation (length bucketing, training/batching.py)
+        self.lengths = np.minimum(np.diff(self.corpus.offsets), max_length)
 
     def __len__(self):
-        return len(self.samples)
+        return len(self.corpus)
 
     def __getitem__(self, idx):
-        encoding = self.tokenizer.encode(self.samples[idx])
-        ids = encoding.ids[: self.max_length]
+        ids = self.corpus[idx][: self.max_length]
 
-        pad_id = self.tokenizer.token_to_id("[PAD]")
-        if len(ids) < self.max_length:
-            ids += [pad_id] * (self.max_length - len(ids))
+        padded = np.full(self.max_length, self.pad_id, dtype=np.int64)
+        padded[: len(ids)] = ids
+        padded = torch.from_numpy(padded)
 
-        input_ids = torch.tensor(ids[:-1], dtype=torch.long)
-        target_ids = torch.tensor(ids[1:], dtype=torch.long)
+        input_ids = padded[:-1]
+        target_ids = padded[1:]
 
         return input_ids, target_ids
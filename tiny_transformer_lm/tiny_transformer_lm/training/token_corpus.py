@@ -0,0 +1,132 @@
+"""
+Pre-tokenized corpora for the training datasets.
+
+Each corpus is tokenized once (encode_batch, parallel in the tokenizers
+library) into a flat uint16 token file plus an offsets index:
+
+    data/tokenized/<name>.tokens       uint16, every sample's ids back to back
+    data/tokenized/<name>.offsets.npy  int64, sample i = tokens[offsets[i]:offsets[i + 1]]
+    data/tokenized/<name>.json         pad id, vocab size and source stamps
+
+Datasets read both through np.memmap, so nothing is tokenized during
+training and memory stays flat whatever the corpus size. The files are
+rebuilt automatically when the source or the tokenizer changes.
+
+Usage:
+    python training/token_corpus.py    # (re)build both training corpora
+"""
+
+import os
+import json
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+from tokenizers import Tokenizer
+
+TOKENIZED_DIR = "data/tokenized"
+TOKEN_DTYPE = np.uint16
+OFFSET_DTYPE = np.int64
+
+
+def read_questions(path):
+    """final_dataset.json -> question texts (QuestionDataset samples)"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [item["question"] for item in json.load(f)]
+
+
+def read_blocks(path):
+    """structured_corpus.txt -> blocks split on blank lines (StructuredDataset samples)"""
+    with open(path, "r", encoding="utf-8") as f:
+        raw_text = f.read()
+    return [block.strip() for block in raw_text.split("\n\n") if block.strip()]
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return {"name": Path(path).name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def corpus_paths(name, out_dir=TOKENIZED_DIR):
+    base = Path(out_dir) / name
+    return base.with_suffix(".tokens"), base.with_suffix(".offsets.npy"), base.with_suffix(".json")
+
+
+def build_token_corpus(texts, tokenizer_path, name, out_dir=TOKENIZED_DIR, sources=()):
+    """Tokenize `texts` once and write the token/offset files; returns the meta dict"""
+    tokenizer = Tokenizer.from_file(str(tokenizer_path))
+    vocab_size = tokenizer.get_vocab_size()
+    if vocab_size > np.iinfo(TOKEN_DTYPE).max + 1:
+        raise ValueError(f"Vocabulary of {vocab_size} does not fit in {np.dtype(TOKEN_DTYPE).name}")
+
+    encodings = tokenizer.encode_batch(texts)
+    lengths = np.fromiter((len(e.ids) for e in encodings), dtype=OFFSET_DTYPE, count=len(encodings))
+    offsets = np.zeros(len(encodings) + 1, dtype=OFFSET_DTYPE)
+    np.cumsum(lengths, out=offsets[1:])
+
+    tokens_path, offsets_path, meta_path = corpus_paths(name, out_dir)
+    tokens_path.parent.mkdir(parents=True, exist_ok=True)
+    ids = chain.from_iterable(encoding.ids for encoding in encodings)
+    np.fromiter(ids, dtype=TOKEN_DTYPE, count=int(offsets[-1])).tofile(f"{tokens_path}.tmp")
+
+    with open(f"{offsets_path}.tmp", "wb") as f:
+        np.save(f, offsets)
+    meta = {
+        "samples": len(encodings),
+        "tokens": int(offsets[-1]),
+        "vocab_size": vocab_size,
+        "pad_id": tokenizer.token_to_id("[PAD]"),
+        "sources": [_stamp(path) for path in (*sources, tokenizer_path)],
+    }
+    with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    # Meta last: a corpus is only valid once all three files are in place
+    os.replace(f"{tokens_path}.tmp", tokens_path)
+    os.replace(f"{offsets_path}.tmp", offsets_path)
+    os.replace(f"{meta_path}.tmp", meta_path)
+    return meta
+
+
+class TokenCorpus:
+    """Memory-mapped samples of a built corpus: corpus[i] is a uint16 array view"""
+
+    def __init__(self, name, out_dir=TOKENIZED_DIR):
+        tokens_path, offsets_path, meta_path = corpus_paths(name, out_dir)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.tokens = np.memmap(tokens_path, dtype=TOKEN_DTYPE, mode="r")
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+        self.pad_id = self.meta["pad_id"]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        return self.tokens[self.offsets[idx]:self.offsets[idx + 1]]
+
+
+def load_token_corpus(source_path, tokenizer_path, read_texts, out_dir=TOKENIZED_DIR):
+    """
+    The pre-tokenized corpus for source_path, built first when it is missing
+    or older than the source or tokenizer.
+    """
+    name = Path(source_path).stem
+    meta_path = corpus_paths(name, out_dir)[2]
+    stamps = [_stamp(path) for path in (source_path, tokenizer_path)]
+    if meta_path.exists():
+        with open(meta_path, "r", encoding="utf-8") as f:
+            if json.load(f)["sources"] == stamps:
+                return TokenCorpus(name, out_dir)
+    build_token_corpus(read_texts(source_path), tokenizer_path, name, out_dir, sources=[source_path])
+    return TokenCorpus(name, out_dir)
+
+
+if __name__ == "__main__":
+    TOKENIZER_PATH = "tokenizer/tokenizer.json"
+    for source, read_texts in (
+        ("data/final/final_dataset.json", read_questions),
+        ("data/structured/structured_corpus.txt", read_blocks),
+    ):
+        meta = build_token_corpus(read_texts(source), TOKENIZER_PATH, Path(source).stem, sources=[source])
+        print(f"{source}: {meta['samples']} samples, {meta['tokens']} tokens -> {TOKENIZED_DIR}/")
@@ -3,11 +3,11 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 import torch
-from torch.utils.data import DataLoader
-import torch.nn as nn
 import torch.optim as optim
 
 from training.dataset import QuestionDataset
+from training.engine import Trainer, configure_threads, make_train_loader, train_split
+from training.checkpoints import CheckpointManager, load_latest
 from model.tiny_transformer import TinyTransformerLM
 from tokenizers import Tokenizer
 
@@ -16,12 +16,22 @@ BATCH_SIZE = 16
 EPOCHS = 5                # You can increase to 8–10 later
 LR = 3e-4
 MAX_LENGTH = 64
+BATCHING = "bucket"       # "pad", "bucket" or "pack" (see training/batching.py)
+CAUSAL = True             # False = old bidirectional objective (sees future tokens)
+GRAD_ACCUM_STEPS = 1      # batches per optimizer step (effective batch = BATCH_SIZE * GRAD_ACCUM_STEPS)
+BF16 = False              # bf16 autocast (fast on CPUs with AVX512-BF16 / AMX)
+NUM_WORKERS = 2           # data loading processes
+THREADS = None            # intra-op threads; None = the CPUs not used by NUM_WORKERS
+SAVE_EVERY = 500          # batches between mid-epoch checkpoints (None = end of epoch only)
+KEEP_LAST = 3             # checkpoints kept besides the best one
+RESUME = True             # continue from the latest checkpoint in CHECKPOINT_DIR
 
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+configure_threads(THREADS, num_workers=NUM_WORKERS)
+
 # ================= PATHS =================
 CHECKPOINT_DIR = Path("checkpoints")
-CHECKPOINT_DIR.mkdir(exist_ok=True)
 
 # ================= LOAD TOKENIZER =================
 tokenizer = Tokenizer.from_file("tokenizer/tokenizer.json")
@@ -35,58 +45,37 @@ dataset = QuestionDataset(
     max_length=MAX_LENGTH
 )
 
-loader = DataLoader(dataset, batch_size=BATCH_SIZE, shuffle=True)
+# Every 10th sample is held out for evaluation (evaluation/harness.py)
+train_set = train_split(dataset)
+loader = make_train_loader(train_set, batch_size=BATCH_SIZE, mode=BATCHING, num_workers=NUM_WORKERS, device=DEVICE)
 
 # ================= MODEL =================
-model = TinyTransformerLM(vocab_size=vocab_size)
+model = TinyTransformerLM(vocab_size=vocab_size, causal=CAUSAL)
 model.to(DEVICE)
 
 # ================= TRAINING SETUP =================
-criterion = nn.CrossEntropyLoss(ignore_index=pad_id)
 optimizer = optim.AdamW(model.parameters(), lr=LR)
+checkpoints = CheckpointManager(CHECKPOINT_DIR, "tiny_transformer", keep_last=KEEP_LAST)
+trainer = Trainer(
+    model, optimizer, pad_id, device=DEVICE, grad_accum_steps=GRAD_ACCUM_STEPS, bf16=BF16,
+    checkpoints=checkpoints, save_every=SAVE_EVERY
+)
 
-# ================= TRAIN LOOP =================
-for epoch in range(1, EPOCHS + 1):
-    model.train()
-    total_loss = 0.0
-
-    for step, (x, y) in enumerate(loader):
-        x = x.to(DEVICE)
-        y = y.to(DEVICE)
-
-        optimizer.zero_grad()
-        logits = model(x)
-
-        loss = criterion(
-            logits.view(-1, vocab_size),
-            y.view(-1)
-        )
-
-        loss.backward()
-        optimizer.step()
-
-        total_loss += loss.item()
-
-        if step % 100 == 0:
-            print(
-                f"Epoch [{epoch}/{EPOCHS}] "
-                f"Step {step} "
-                f"Loss: {loss.item():.4f}"
-            )
+start_epoch, start_step = 1, 0
+state = load_latest(CHECKPOINT_DIR, map_location=DEVICE) if RESUME else None
+if state is not None:
+    start_epoch, start_step = trainer.restore(state, steps_per_epoch=len(loader))
+    print(f"Resuming at epoch {start_epoch}, batch {start_step}")
 
-    avg_loss = total_loss / len(loader)
-    print(f"\n✅ Epoch {epoch} completed | Avg Loss: {avg_loss:.4f}\n")
+# ================= TRAIN LOOP =================
+for epoch in range(start_epoch, EPOCHS + 1):
+    avg_loss, tokens_per_second = trainer.train_epoch(loader, epoch, EPOCHS, start_step=start_step)
+    start_step = 0
+    print(f"\n✅ Epoch {epoch} completed | Avg Loss: {avg_loss:.4f} | {tokens_per_second:.0f} tokens/s\n")
 
     # ================= SAVE CHECKPOINT =================
-    checkpoint_path = CHECKPOINT_DIR / f"tiny_transformer_epoch_{epoch}.pt"
-    torch.save(
-        {
-            "epoch": epoch,
-            "model_state_dict": model.state_dict(),
-            "optimizer_state_dict": optimizer.state_dict(),
-            "loss": avg_loss
-        },
-        checkpoint_path
-    )
+    # Written in the background; tiny_transformer_epoch_<epoch>.pt as before
+    checkpoints.save(trainer.state(epoch, len(loader), avg_loss), epoch, loss=avg_loss)
+    print(f"💾 Saving checkpoint: {checkpoints.path(epoch)}")
 
-    print(f"💾 Saved checkpoint: {checkpoint_path}")
+checkpoints.close()
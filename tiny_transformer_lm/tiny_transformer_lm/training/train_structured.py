@@ -3,94 +3,109 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 import torch
-import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import DataLoader
+from torch.nn.parallel import DistributedDataParallel
 
 from training.structured_dataset import StructuredDataset
+from training.engine import Trainer, configure_threads, make_train_loader, train_split
+from training.checkpoints import CheckpointManager, load_latest
+from training.distributed import init_distributed, is_main_process, main_process_first, cleanup
 from model.tiny_transformer import TinyTransformerLM
 from tokenizers import Tokenizer
 
 # ================= CONFIG =================
-BATCH_SIZE = 8            # structured sequences are long
+BATCH_SIZE = 8            # structured sequences are long (per process when distributed)
 EPOCHS = 5                # DRY RUN FIRST
 LR = 3e-4
 MAX_LENGTH = 256
+BATCHING = "bucket"       # "pad", "bucket" or "pack" (see training/batching.py)
+CAUSAL = True             # False = old bidirectional objective (sees future tokens)
+GRAD_ACCUM_STEPS = 1      # batches per optimizer step (effective batch = BATCH_SIZE * GRAD_ACCUM_STEPS)
+BF16 = False              # bf16 autocast (fast on CPUs with AVX512-BF16 / AMX)
+NUM_WORKERS = 2           # data loading processes
+THREADS = None            # intra-op threads; None = the CPUs not used by NUM_WORKERS
+SAVE_EVERY = 500          # batches between mid-epoch checkpoints (None = end of epoch only)
+KEEP_LAST = 3             # checkpoints kept besides the best one
+RESUME = True             # continue from the latest checkpoint in CHECKPOINT_DIR
 
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+# ================= DISTRIBUTED =================
+# torchrun --standalone --nproc_per_node=N training/train_structured.py
+# runs N data-parallel CPU processes (gloo); plain python runs one
+RANK, WORLD_SIZE = init_distributed()
+if WORLD_SIZE > 1:
+    DEVICE = torch.device("cpu")
+
+configure_threads(THREADS, num_workers=NUM_WORKERS, world_size=WORLD_SIZE)
+
 # ================= PATHS =================
 CORPUS_PATH = "data/structured/structured_corpus.txt"
 TOKENIZER_PATH = "tokenizer/tokenizer.json"
 CHECKPOINT_DIR = Path("checkpoints_structured")
-CHECKPOINT_DIR.mkdir(exist_ok=True)
 
 # ================= LOAD TOKENIZER =================
 tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
 vocab_size = tokenizer.get_vocab_size()
 pad_id = tokenizer.token_to_id("[PAD]")
 
-print("Vocab size:", vocab_size)
+if is_main_process():
+    print("Vocab size:", vocab_size, "| Processes:", WORLD_SIZE)
 
 # ================= DATASET =================
-dataset = StructuredDataset(
-    corpus_path=CORPUS_PATH,
-    tokenizer_path=TOKENIZER_PATH,
-    max_length=MAX_LENGTH
-)
+with main_process_first():
+    dataset = StructuredDataset(
+        corpus_path=CORPUS_PATH,
+        tokenizer_path=TOKENIZER_PATH,
+        max_length=MAX_LENGTH
+    )
 
-loader = DataLoader(dataset, batch_size=BATCH_SIZE, shuffle=True)
+# Every 10th block is held out for evaluation (evaluation/harness.py, scripts/eval_perplexity.py)
+train_set = train_split(dataset)
+loader = make_train_loader(
+    train_set, batch_size=BATCH_SIZE, mode=BATCHING, num_workers=NUM_WORKERS, device=DEVICE,
+    num_replicas=WORLD_SIZE, rank=RANK
+)
 
 # ================= MODEL =================
+torch.manual_seed(0)      # same initial weights on every rank
 model = TinyTransformerLM(
     vocab_size=vocab_size,
-    max_len=MAX_LENGTH
+    max_len=MAX_LENGTH,
+    causal=CAUSAL
 ).to(DEVICE)
+# Gradients are averaged across processes; `model` stays the unwrapped module for saving
+train_model = DistributedDataParallel(model) if WORLD_SIZE > 1 else model
 
 # ================= TRAINING SETUP =================
-criterion = nn.CrossEntropyLoss(ignore_index=pad_id)
 optimizer = optim.AdamW(model.parameters(), lr=LR)
+# Only rank 0 writes checkpoints
+checkpoints = CheckpointManager(CHECKPOINT_DIR, "structured", keep_last=KEEP_LAST) if is_main_process() else None
+trainer = Trainer(
+    train_model, optimizer, pad_id, device=DEVICE, grad_accum_steps=GRAD_ACCUM_STEPS, bf16=BF16,
+    checkpoints=checkpoints, save_every=SAVE_EVERY
+)
 
-# ================= TRAIN LOOP =================
-for epoch in range(1, EPOCHS + 1):
-    model.train()
-    total_loss = 0.0
-
-    for step, (x, y) in enumerate(loader):
-        x = x.to(DEVICE)
-        y = y.to(DEVICE)
-
-        optimizer.zero_grad()
-        logits = model(x)
-
-        loss = criterion(
-            logits.view(-1, vocab_size),
-            y.view(-1)
-        )
-
-        loss.backward()
-        optimizer.step()
-
-        total_loss += loss.item()
-
-        if step % 100 == 0:
-            print(
-                f"Epoch [{epoch}/{EPOCHS}] "
-                f"Step {step} "
-                f"Loss: {loss.item():.4f}"
-            )
-
-    avg_loss = total_loss / len(loader)
-    print(f"\n✅ Epoch {epoch} completed | Avg Loss: {avg_loss:.4f}\n")
-
-    ckpt_path = CHECKPOINT_DIR / f"structured_epoch_{epoch}.pt"
-    torch.save(
-        {
-            "epoch": epoch,
-            "model_state_dict": model.state_dict(),
-            "loss": avg_loss
-        },
-        ckpt_path
-    )
+start_epoch, start_step = 1, 0
+state = load_latest(CHECKPOINT_DIR, map_location=DEVICE) if RESUME else None
+if state is not None:
+    # Every rank loads the same checkpoint, so the copies stay identical
+    start_epoch, start_step = trainer.restore(state, steps_per_epoch=len(loader))
+    if is_main_process():
+        print(f"Resuming at epoch {start_epoch}, batch {start_step}")
 
-    print(f"💾 Saved checkpoint: {ckpt_path}")
+# ================= TRAIN LOOP =================
+for epoch in range(start_epoch, EPOCHS + 1):
+    avg_loss, tokens_per_second = trainer.train_epoch(loader, epoch, EPOCHS, start_step=start_step)
+    start_step = 0
+    if not is_main_process():
+        continue
+    print(f"\n✅ Epoch {epoch} completed | Avg Loss: {avg_loss:.4f} | {tokens_per_second:.0f} tokens/s\n")
+
+    # Written in the background; structured_epoch_<epoch>.pt as before
+    checkpoints.save(trainer.state(epoch, len(loader), avg_loss), epoch, loss=avg_loss)
+    print(f"💾 Saving checkpoint: {checkpoints.path(epoch)}")
+
+if checkpoints is not None:
+    checkpoints.close()
+cleanup()